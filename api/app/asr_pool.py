@@ -0,0 +1,148 @@
+"""Parallel transcription of whole recordings for ``POST /transcribe``.
+
+A recording is decoded once to 16 kHz PCM and cut into chunks of about
+``asr_chunk_s`` seconds, each cut placed at the quietest point of the preceding
+``asr_chunk_search_s`` seconds so words are not split. Chunks that are silence
+throughout are skipped. The rest run concurrently on the ``asr`` executor, which
+matches the Whisper model's ``num_workers`` (``asr_workers``), at most that many
+per recording at a time. Their segments are shifted by the chunk offset and stitched
+back in order.
+
+``TranscriptionPool`` is the admission control: ``asr_max_jobs`` recordings are
+transcribed at once, ``asr_max_queued_jobs`` more may wait, and beyond that the
+request fails fast with ``ExecutorBusy`` (503).
+"""
+import asyncio, time
+from typing import List, Tuple
+import numpy as np
+from .settings import settings
+from .models import get_registry
+from .executors import run_in, ExecutorBusy
+from .vad import SAMPLE_RATE, frame_size, frame_db
+
+def decode_audio(path: str) -> np.ndarray:
+    from faster_whisper import decode_audio as _decode
+    return _decode(path, sampling_rate=SAMPLE_RATE)
+
+def split_at_silence(audio: np.ndarray) -> List[Tuple[int, int]]:
+    """``(start, end)`` sample spans of at most ``asr_chunk_s`` seconds, cut in pauses."""
+    size = frame_size()
+    db = frame_db(audio, size)
+    per_s = SAMPLE_RATE / size
+    target = max(int(settings.asr_chunk_s * per_s), 1)
+    search = min(max(int(settings.asr_chunk_search_s * per_s), 1), target - 1) if target > 1 else 0
+    smooth = max(int(0.3 * per_s), 1)  # ~300 ms, so a cut lands in a pause and not a plosive gap
+    level = np.convolve(db, np.ones(smooth) / smooth, mode="same") if len(db) else db
+    cuts, pos = [0], 0
+    while len(db) - pos > target:
+        lo = pos + target - search
+        pos = lo + int(np.argmin(level[lo:pos + target]))
+        cuts.append(pos)
+    spans = [(cuts[i] * size, cuts[i + 1] * size) for i in range(len(cuts) - 1)]
+    spans.append((cuts[-1] * size, len(audio)))
+    # Silent chunks cost a full decode and tend to make Whisper hallucinate
+    return [(a, b) for a, b in spans
+            if b > a and (b - a < size or frame_db(audio[a:b], size).max(initial=-120.0) > settings.asr_vad_threshold_db)]
+
+def transcribe_chunk(audio: np.ndarray, offset_s: float) -> dict:
+    t0 = time.perf_counter()
+    segments, _ = get_registry().get("asr").transcribe(audio)
+    # faster-whisper decodes lazily, so the segment generator must be consumed here too
+    segments = [{"start": round(seg.start + offset_s, 2), "end": round(seg.end + offset_s, 2), "text": seg.text.strip()}
+                for seg in segments]
+    return {"segments": segments, "decode_s": round(time.perf_counter() - t0, 3)}
+
+class TranscriptionPool:
+    """Admission control plus chunked, parallel transcription (see module docstring)."""
+
+    def __init__(self, max_jobs: int, max_queued: int):
+        self.max_jobs = max(max_jobs, 1)
+        self.max_queued = max_queued
+        self.running = 0
+        self.waiting = 0
+        self._slots = None
+        self.stats = {"completed": 0, "failed": 0, "rejected": 0, "audio_s_total": 0.0, "wall_s_total": 0.0}
+
+    async def transcribe_file(self, path: str) -> dict:
+        if self.running + self.waiting >= self.max_jobs + self.max_queued:
+            self.stats["rejected"] += 1
+            raise ExecutorBusy(f"Transcription queue is full ({self.running + self.waiting} recordings), try again later")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_jobs)
+        self.waiting += 1
+        t0 = time.perf_counter()
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            result = await self._transcribe(path, time.perf_counter() - t0)
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        finally:
+            self.running -= 1
+            self._slots.release()
+        self.stats["completed"] += 1
+        self.stats["audio_s_total"] += result["duration"]
+        self.stats["wall_s_total"] += result["timings"]["total_s"]
+        return result
+
+    async def _transcribe(self, path: str, queued_s: float) -> dict:
+        t0 = time.perf_counter()
+        audio = await run_in("io", decode_audio, path)
+        decoded = time.perf_counter()
+        spans = await run_in("io", split_at_silence, audio)
+        inflight = asyncio.Semaphore(max(settings.asr_workers, 1))
+
+        async def one(span):
+            a, b = span
+            async with inflight:
+                started = time.perf_counter()
+                while True:
+                    try:
+                        out = await run_in("asr", transcribe_chunk, audio[a:b], a / SAMPLE_RATE)
+                        break
+                    except ExecutorBusy:  # live sessions/other jobs hold the executor; keep our place
+                        await asyncio.sleep(0.2)
+                out.update({"start": round(a / SAMPLE_RATE, 2), "end": round(b / SAMPLE_RATE, 2),
+                            "wait_s": round(time.perf_counter() - started - out["decode_s"], 3)})
+                return out
+
+        chunks = await asyncio.gather(*[one(span) for span in spans])
+        segments = [seg for chunk in chunks for seg in chunk["segments"]]
+        duration = len(audio) / SAMPLE_RATE
+        total = time.perf_counter() - t0
+        return {
+            "text": " ".join(seg["text"] for seg in segments if seg["text"]).strip(),
+            "duration": round(duration, 2),
+            "segments": segments,
+            "chunks": [{k: c[k] for k in ("start", "end", "decode_s", "wait_s")} for c in chunks],
+            "timings": {
+                "queued_s": round(queued_s, 3),
+                "audio_decode_s": round(decoded - t0, 3),
+                "transcribe_s": round(total - (decoded - t0), 3),
+                "total_s": round(total, 3),
+                "realtime_factor": round(total / duration, 3) if duration else 0.0,
+            },
+        }
+
+    def snapshot(self) -> dict:
+        done = self.stats["audio_s_total"]
+        return {
+            "running": self.running,
+            "waiting": self.waiting,
+            "max_jobs": self.max_jobs,
+            "max_queued": self.max_queued,
+            **self.stats,
+            "realtime_factor_avg": round(self.stats["wall_s_total"] / done, 3) if done else 0.0,
+        }
+
+_pool = None
+
+def get_transcription_pool() -> TranscriptionPool:
+    global _pool
+    if _pool is None:
+        _pool = TranscriptionPool(settings.asr_max_jobs, settings.asr_max_queued_jobs)
+    return _pool
@@ -0,0 +1,267 @@
+"""Real-time transcription sessions for ``ws /transcribe/stream``.
+
+A session receives 16-bit mono PCM (or an Opus stream, decoded by an ``ffmpeg``
+subprocess), segments it with the energy VAD and asks the shared scheduler for:
+
+- a *partial* transcript of the utterance in progress every
+  ``asr_stream_partial_interval`` seconds (greedy decoding, best effort), and
+- a *final* transcript, with start/end times, when the utterance closes.
+
+There is one Whisper model per process. ``TranscriptionScheduler`` is the only
+path from sessions to it: finals are served first in arrival order, each session
+has at most one partial pending (a newer one replaces it), the work itself runs on
+the bounded ``asr`` executor, and ``asr_stream_max_sessions`` caps how many
+sessions may share the model at all.
+"""
+import asyncio, itertools, json
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Optional
+import numpy as np
+from .settings import settings
+from .models import get_registry
+from .executors import run_in, ExecutorBusy
+from .vad import Segmenter, SAMPLE_RATE, pcm16_to_float, resample
+
+def transcribe_pcm(audio: np.ndarray, final: bool = True, prompt: Optional[str] = None) -> str:
+    """Transcribe 16 kHz float32 audio; partials use greedy decoding without timestamps."""
+    segments, _ = get_registry().get("asr").transcribe(
+        audio,
+        beam_size=5 if final else 1,
+        without_timestamps=not final,
+        condition_on_previous_text=False,
+        initial_prompt=prompt or None,
+    )
+    return " ".join(seg.text.strip() for seg in segments).strip()
+
+class TranscriptionScheduler:
+    """Shares the single Whisper model between streaming sessions (see module docstring)."""
+
+    def __init__(self, max_sessions: int, workers: int):
+        self.max_sessions = max_sessions
+        self.workers = workers
+        self.sessions = 0
+        self._finals = deque()
+        self._partials: "OrderedDict[int, tuple]" = OrderedDict()
+        self._wake: Optional[asyncio.Event] = None
+        self._tasks = []
+        self._ids = itertools.count(1)
+        self.stats = {"sessions_rejected": 0, "finals": 0, "partials": 0, "partials_dropped": 0,
+                      "busy_retries": 0, "final_s_total": 0.0, "partial_s_total": 0.0}
+
+    def open_session(self) -> Optional[int]:
+        """Session id, or None when ``max_sessions`` are already streaming."""
+        if self.sessions >= self.max_sessions:
+            self.stats["sessions_rejected"] += 1
+            return None
+        self.sessions += 1
+        return next(self._ids)
+
+    def close_session(self, sid: int):
+        self.sessions -= 1
+        pending = self._partials.pop(sid, None)
+        if pending and not pending[0].done():
+            pending[0].set_result(None)
+
+    def _start(self):
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def transcribe(self, sid: int, audio: np.ndarray, final: bool, prompt: Optional[str] = None) -> Optional[str]:
+        """Queue ``audio`` and await its text; partials resolve to None when superseded or dropped."""
+        self._start()
+        fut = asyncio.get_running_loop().create_future()
+        if final:
+            self._finals.append((fut, audio, prompt))
+        else:
+            old = self._partials.pop(sid, None)
+            if old and not old[0].done():
+                self.stats["partials_dropped"] += 1
+                old[0].set_result(None)
+            self._partials[sid] = (fut, audio, prompt)
+        self._wake.set()
+        return await fut
+
+    def _next(self):
+        if self._finals:
+            return True, self._finals.popleft()
+        if self._partials:
+            return False, self._partials.popitem(last=False)[1]
+        return None, None
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            final, job = self._next()
+            if job is None:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            fut, audio, prompt = job
+            if fut.done():
+                continue
+            t0 = loop.time()
+            try:
+                text = await run_in("asr", transcribe_pcm, audio, final, prompt)
+            except ExecutorBusy:
+                # /transcribe uploads filled the executor: finals wait their turn, partials are skipped
+                self.stats["busy_retries" if final else "partials_dropped"] += 1
+                if final:
+                    self._finals.appendleft(job)
+                    await asyncio.sleep(0.1)
+                else:
+                    fut.set_result(None)
+                continue
+            except Exception as e:
+                if not fut.done():
+                    fut.set_exception(e)
+                continue
+            kind = "final" if final else "partial"
+            self.stats[f"{kind}s"] += 1
+            self.stats[f"{kind}_s_total"] += loop.time() - t0
+            if not fut.done():
+                fut.set_result(text)
+
+    def snapshot(self) -> dict:
+        return {
+            "sessions": self.sessions,
+            "max_sessions": self.max_sessions,
+            "queued_finals": len(self._finals),
+            "queued_partials": len(self._partials),
+            **self.stats,
+        }
+
+_scheduler = None
+
+def get_stream_scheduler() -> TranscriptionScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = TranscriptionScheduler(settings.asr_stream_max_sessions, max(settings.asr_workers, 1))
+    return _scheduler
+
+class OpusDecoder:
+    """Decodes an Ogg/WebM Opus byte stream (e.g. browser MediaRecorder chunks) to 16 kHz PCM via ffmpeg."""
+
+    def __init__(self, on_pcm: Callable[[bytes], Awaitable[None]]):
+        self.on_pcm = on_pcm
+        self.proc = None
+        self._reader = None
+
+    async def start(self):
+        self.proc = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+            "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1",
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE)
+        self._reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        while True:
+            data = await self.proc.stdout.read(SAMPLE_RATE // 5 * 2)  # ~200 ms
+            if not data:
+                break
+            await self.on_pcm(data)
+
+    async def write(self, data: bytes):
+        self.proc.stdin.write(data)
+        await self.proc.stdin.drain()
+
+    async def close(self):
+        """End of input: let ffmpeg drain, then wait for the remaining PCM."""
+        if self.proc is None:
+            return
+        try:
+            self.proc.stdin.close()
+            await asyncio.wait_for(self._reader, timeout=10)
+        except Exception:
+            self.proc.kill()
+        await self.proc.wait()
+
+class StreamSession:
+    """One websocket's audio: VAD, partial scheduling and in-order delivery of finals."""
+
+    def __init__(self, sid: int, scheduler: TranscriptionScheduler, send: Callable[[dict], Awaitable[None]],
+                 sample_rate: int = SAMPLE_RATE):
+        self.sid = sid
+        self.scheduler = scheduler
+        self.send = send
+        self.sample_rate = sample_rate
+        self.segmenter = Segmenter()
+        self.context = ""  # tail of the transcript so far, used as Whisper's prompt
+        self._pending = 0
+        self._finals: asyncio.Queue = asyncio.Queue(maxsize=max(settings.asr_stream_max_pending, 1))
+        self._odd_byte = b""
+        self._partial: Optional[asyncio.Task] = None
+        self._last_partial = 0.0
+        self._sender = asyncio.create_task(self._send_finals())
+
+    async def feed_pcm(self, data: bytes):
+        data = self._odd_byte + data
+        cut = len(data) - len(data) % 2
+        self._odd_byte = data[cut:]
+        audio = resample(pcm16_to_float(data[:cut]), self.sample_rate)
+        for utterance in self.segmenter.feed(audio):
+            await self._queue_final(utterance)
+        self._maybe_partial()
+
+    async def _queue_final(self, utterance: tuple):
+        # Blocks (and so stops reading the socket) once asr_stream_max_pending finals are queued
+        self._pending += 1
+        await self._finals.put(utterance)
+
+    def _maybe_partial(self):
+        loop = asyncio.get_running_loop()
+        audio = self.segmenter.current()
+        if (audio is None or self._pending or (self._partial and not self._partial.done())
+                or len(audio) < SAMPLE_RATE // 2
+                or loop.time() - self._last_partial < settings.asr_stream_partial_interval):
+            return
+        self._last_partial = loop.time()
+        self._partial = asyncio.create_task(self._send_partial(self.segmenter.utterances, audio))
+
+    async def _send_partial(self, index: int, audio: np.ndarray):
+        start = self.segmenter.current_start()
+        text = await self.scheduler.transcribe(self.sid, audio, final=False, prompt=self.context)
+        # Skip it if the utterance has closed meanwhile: its final supersedes it
+        if text and index == self.segmenter.utterances and not self._pending:
+            await self.send({"type": "partial", "text": text, "start": round(start, 2)})
+
+    async def _send_finals(self):
+        while True:
+            utterance = await self._finals.get()
+            if utterance is None:
+                return
+            start, end, audio = utterance
+            try:
+                text = await self.scheduler.transcribe(self.sid, audio, final=True, prompt=self.context)
+            except Exception as e:
+                text = None
+                print(f"❌ Error transcribing stream segment: {str(e)}")
+                await self.send({"type": "error", "error": str(e), "start": round(start, 2)})
+            finally:
+                self._pending -= 1
+            if text:
+                self.context = (self.context + " " + text)[-200:]
+                await self.send({"type": "final", "text": text, "start": round(start, 2), "end": round(end, 2)})
+
+    async def finish(self):
+        """End of stream: transcribe the open utterance, deliver every final, then ``done``."""
+        last = self.segmenter.flush()
+        if last is not None and len(last[2]):
+            await self._queue_final(last)
+        await self._finals.put(None)
+        await self._sender
+        await self.send({"type": "done"})
+
+    def cancel(self):
+        for task in (self._sender, self._partial):
+            if task is not None and not task.done():
+                task.cancel()
+
+def parse_control(text: str) -> dict:
+    """Text frames carry JSON control messages, e.g. ``{"type": "stop"}``."""
+    try:
+        msg = json.loads(text)
+        return msg if isinstance(msg, dict) else {}
+    except ValueError:
+        return {"type": text.strip().lower()}
@@ -0,0 +1,184 @@
+"""Token-aware chunking of parsed pages for the text embedder.
+
+Sizes are measured with the embedding model's own tokenizer. Each chunk targets
+``chunk_tokens`` tokens, carries up to ``chunk_overlap`` tokens of trailing context
+from the previous chunk, and never exceeds ``chunk_max_tokens`` (capped further by
+the model's ``max_seq_length``), so the embedder never truncates silently.
+
+Headings start a new chunk, lead every chunk cut from the text below them on the
+same page, and become the ``section`` of those chunks (carried over to later pages).
+A block counts as a heading only with a numbered title ("2.3 Dosage"), an ALL-CAPS
+line, or font cues from the parser (larger than the page's body text, or all bold);
+lines leading with quantities ("500 mg twice daily") never do. Nothing is dropped:
+a page of headings alone (a table, a list of drug names) still yields its chunk.
+Blocks are kept whole when they fit; longer ones are split at sentence boundaries
+and, as a last resort, at token boundaries. Chunks stay within one page, which keeps
+citations exact and makes a page the unit of incremental re-ingest.
+
+Chunk ids are content hashes of page number and text (``{doc_id}:{sha}``), so
+re-chunking an unchanged page yields the same ids whatever changed around it.
+``chunk_max_per_doc`` bounds the vector count of a single document.
+"""
+import hashlib, re
+from typing import List, Optional, Union
+from .settings import settings
+from .models import get_registry
+
+_SENTENCE = re.compile(r"(?<=[.!?;:])\s+(?=[A-Z0-9(\[])")
+_NUMBERED = re.compile(r"^(\d{1,2}(\.\d{1,2})*\.?|[IVX]{1,4}\.|[A-Z]\.)\s+[A-Z][A-Za-z]")
+_QUANTITY = re.compile(r"\d\s*(mg|mcg|µg|ug|g|kg|ml|l|iu|units?|%|mmol|meq|hours?|hrs?|h|days?|weeks?|times)\b", re.I)
+
+def is_heading(text: str, size: Optional[float] = None, body_size: Optional[float] = None, bold: bool = False) -> bool:
+    """Numbered titles, ALL-CAPS lines, or short lines set larger than the body text or in bold."""
+    text = text.strip()
+    if not text or "\n" in text or len(text) > 100:
+        return False
+    words = text.split()
+    if len(words) > 12 or text[-1] in ".,;:?!" or _QUANTITY.search(text):
+        return False
+    if _NUMBERED.match(text):
+        return True
+    if text[0].isdigit():  # "500 ...", "2-3 ..." are values, not titles
+        return False
+    if sum(c.isalpha() for c in text) >= 4 and text.isupper():
+        return True
+    if not text[0].isupper() or len(words) > 8:
+        return False
+    return bool((size and body_size and size >= body_size * 1.15) or bold)
+
+def _body_size(blocks: List[dict]) -> Optional[float]:
+    """Most common font size on the page, weighted by text length."""
+    weights = {}
+    for b in blocks:
+        if b.get("size"):
+            weights[b["size"]] = weights.get(b["size"], 0) + len(b["text"])
+    return max(weights, key=weights.get) if weights else None
+
+class Chunker:
+    def __init__(self, tokenizer=None, max_seq_length: Optional[int] = None):
+        if tokenizer is None:
+            model = get_registry().get("text")
+            tokenizer, max_seq_length = model.tokenizer, getattr(model, "max_seq_length", None)
+        self.tokenizer = tokenizer
+        # Leave room for the special tokens ([CLS]/[SEP] or <s></s>) the embedder adds
+        limit = (max_seq_length or settings.chunk_max_tokens) - 2
+        self.max_tokens = max(min(settings.chunk_max_tokens, limit), 16)
+        self.target = min(settings.chunk_tokens, self.max_tokens)
+        self.overlap = min(settings.chunk_overlap, self.target // 2)
+
+    def _ids(self, texts: List[str]) -> List[List[int]]:
+        if not texts:
+            return []
+        return self.tokenizer(texts, add_special_tokens=False)["input_ids"]
+
+    def count(self, text: str) -> int:
+        return len(self._ids([text])[0])
+
+    def _split(self, text: str, n_tokens: int) -> List[tuple]:
+        """(text, tokens) units of at most ``max_tokens``: the block, its sentences or token windows."""
+        if n_tokens <= self.target:
+            return [(text, n_tokens)]
+        units = []
+        sentences = [s for s in _SENTENCE.split(text) if s.strip()]
+        for sent, ids in zip(sentences, self._ids(sentences)):
+            if len(ids) <= self.max_tokens:
+                units.append((sent, len(ids)))
+                continue
+            step = self.target
+            for i in range(0, len(ids), step):
+                piece = self.tokenizer.decode(ids[i:i + step])
+                units.append((piece, len(ids[i:i + step])))
+        return units
+
+    def chunk_page(self, doc_id: str, page: int, blocks: List[Union[str, dict]], section: Optional[str] = None):
+        """Chunks of one page; returns ``(chunks, section)`` so headings carry over to the next page.
+
+        ``blocks`` are strings or parser blocks (``{"text", "size", "bold"}``), whose font
+        cues help tell headings from body text.
+        """
+        blocks = [b if isinstance(b, dict) else {"text": b} for b in blocks]
+        blocks = [b for b in blocks if b.get("text") and b["text"].strip()]
+        body_size = _body_size(blocks)
+        texts = [b["text"].strip() for b in blocks]
+        chunks: List[dict] = []
+        current: List[tuple] = []  # (text, tokens) units of the chunk being built
+        size = 0
+        lead = 0  # leading units of ``current`` that are headings, not body text
+        fresh = 0  # units in ``current`` that no emitted chunk contains yet
+        fresh_body = 0  # ...of which body text
+        prefix: List[tuple] = []  # heading that opens every later chunk cut from this page
+
+        def emit(keep_overlap: bool):
+            nonlocal current, size, lead, fresh, fresh_body
+            if not fresh:
+                return
+            chunks.append(self._make(doc_id, page, section, "\n\n".join(t for t, _ in current)))
+            tail, tail_size = [], 0
+            if keep_overlap and self.overlap:
+                for unit in reversed(current[lead:]):
+                    if tail_size + unit[1] > self.overlap:
+                        break
+                    tail.insert(0, unit)
+                    tail_size += unit[1]
+            current, lead = prefix + tail, len(prefix)
+            size = sum(n for _, n in current)
+            fresh = fresh_body = 0
+
+        for b, text, ids in zip(blocks, texts, self._ids(texts)):
+            if is_heading(text, b.get("size"), body_size, bool(b.get("bold"))):
+                if fresh_body:
+                    emit(keep_overlap=False)
+                if not fresh:  # only the previous heading prefix / overlap: superseded
+                    current, size, lead = [], 0, 0
+                elif size + len(ids) > self.max_tokens:  # a long run of headings (a table header row)
+                    emit(keep_overlap=False)
+                    current, size, lead = [], 0, 0
+                # Consecutive headings stay together and open the next chunk
+                current.append((text, len(ids)))
+                size += len(ids)
+                lead = len(current)
+                fresh += 1
+                section, prefix = text, [(text, len(ids))]
+                continue
+            for unit in self._split(text, len(ids)):
+                if size + unit[1] > self.target and size > 0:
+                    if fresh_body:
+                        emit(keep_overlap=True)
+                        if size + unit[1] > self.target:  # overlap + unit would overflow: keep just the heading
+                            current, lead = list(prefix), len(prefix)
+                            size = sum(n for _, n in current)
+                    if size + unit[1] > self.max_tokens:  # not even the heading fits beside this unit
+                        emit(keep_overlap=False)
+                        current, size, lead = [], 0, 0
+                current.append(unit)
+                size += unit[1]
+                fresh += 1
+                fresh_body += 1
+        # A tail of pure overlap (or heading prefix) is already covered by the previous chunk
+        if fresh:
+            emit(keep_overlap=False)
+        return self._dedupe(chunks), section
+
+    def _make(self, doc_id: str, page: int, section: Optional[str], text: str) -> dict:
+        n = self.count(text)
+        if n > self.max_tokens:  # separators pushed it over; trim at a token boundary
+            text = self.tokenizer.decode(self._ids([text])[0][:self.max_tokens])
+            n = self.max_tokens
+        return {"doc_id": doc_id, "page": page, "section": section or "", "text": text, "tokens": n}
+
+    @staticmethod
+    def _dedupe(chunks: List[dict]) -> List[dict]:
+        seen = {}
+        for c in chunks:
+            h = hashlib.sha256(f"{c['page']}\x00{c['text']}".encode("utf-8")).hexdigest()[:20]
+            seen[h] = seen.get(h, 0) + 1
+            c["id"] = f"{c['doc_id']}:{h}" + (f"#{seen[h]}" if seen[h] > 1 else "")
+        return chunks
+
+_chunker = None
+
+def get_chunker() -> Chunker:
+    global _chunker
+    if _chunker is None:
+        _chunker = Chunker()
+    return _chunker
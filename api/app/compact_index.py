@@ -0,0 +1,383 @@
+"""Compact on-disk vector index: quantized memory-mapped vectors + a SQLite metadata table.
+
+Layout of ``{vector_dir}/{name}/``::
+
+    codes.bin    N x D int8 (or fp16) vectors scanned by the approximate first pass
+    scales.bin   N float32 per-row int8 scales (1.0 for fp16)
+    norms.bin    N float32 squared norms of the original vectors
+    vectors.bin  N x D float32 originals, only touched to re-score the top candidates
+    meta.sqlite  rows(row, id, document, metadata JSON, alive) + info(dim, dtype, generation)
+
+Rows are append-only; upserting an existing id tombstones its old row, and ``save``
+rewrites the files without dead rows once they exceed ``compact_vacuum_ratio``. A
+vacuum writes the next generation of files (``codes.{generation}.bin``...) and flips
+``info.generation`` in the same transaction that renumbers the rows, so readers see
+either the old files and row numbers or the new ones, never a mix.
+Everything is memory-mapped, so resident memory stays near the size of the codes
+actually scanned (a quarter of float32 for int8) instead of the whole float matrix.
+"""
+import json, os, re, sqlite3, threading
+from contextlib import contextmanager
+from typing import List, Optional
+from .settings import settings
+from .vectorstore import VectorStore
+
+_OPS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+_KEY = re.compile(r"^[A-Za-z0-9_]+$")
+
+def _where_sql(where: Optional[dict], params: list) -> str:
+    """Translate a Chroma-style ``where`` filter into SQL over the JSON metadata column."""
+    if not where:
+        return "1"
+    parts = []
+    for key, cond in where.items():
+        if key in ("$and", "$or"):
+            joined = f" {key[1:].upper()} ".join(_where_sql(c, params) for c in cond)
+            parts.append(f"({joined or '1'})")
+            continue
+        if not _KEY.match(key):
+            raise ValueError(f"Unsupported metadata key in filter: {key!r}")
+        field = f"json_extract(metadata, '$.{key}')"
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+        for op, value in cond.items():
+            if op in ("$in", "$nin"):
+                params.extend(value)
+                marks = ",".join("?" * len(value)) or "NULL"
+                parts.append(f"{field} {'IN' if op == '$in' else 'NOT IN'} ({marks})")
+            elif op in _OPS:
+                params.append(value)
+                parts.append(f"{field} {_OPS[op]} ?")
+            else:
+                raise ValueError(f"Unsupported filter operator: {op}")
+    return " AND ".join(parts) or "1"
+
+class CompactStore(VectorStore):
+    """``VectorStore`` backed by quantized memory-mapped vectors (``vector_backend=compact``).
+
+    Queries scan the int8/fp16 codes in blocks to pick ``k * compact_rescore_factor``
+    candidates, then re-score those exactly against the float32 originals.
+    """
+
+    def __init__(self, name: str, directory: str, dtype: Optional[str] = None):
+        self.name = name
+        self._dir = os.path.join(directory, name)
+        os.makedirs(self._dir, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(self._dir, "meta.sqlite"), check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS rows (
+                row INTEGER PRIMARY KEY, id TEXT NOT NULL, document TEXT,
+                metadata TEXT NOT NULL DEFAULT '{}', alive INTEGER NOT NULL DEFAULT 1);
+            CREATE UNIQUE INDEX IF NOT EXISTS rows_live_id ON rows(id) WHERE alive = 1;
+            CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        stored = self._info("dtype")
+        self.dtype = stored or dtype or settings.compact_dtype
+        if self.dtype not in ("int8", "fp16"):
+            raise ValueError(f"Unknown compact_dtype '{self.dtype}'; expected int8 or fp16")
+        if stored is None:
+            self._db.execute("INSERT OR REPLACE INTO info VALUES ('dtype', ?)", (self.dtype,))
+        self._version = None
+        self._generation = 0
+        self._n = 0
+        self._dim = None
+        self._alive = None
+        self._maps = {}
+        self._refresh()
+
+    # --- bookkeeping ------------------------------------------------------
+
+    def _info(self, key: str):
+        row = self._db.execute("SELECT value FROM info WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _path(self, part: str, generation: Optional[int] = None) -> str:
+        generation = self._generation if generation is None else generation
+        # Generation 0 keeps the names indexes had before vacuum was generational
+        return os.path.join(self._dir, f"{part}.{generation}.bin" if generation else f"{part}.bin")
+
+    @property
+    def _code_dtype(self):
+        import numpy as np
+        return np.int8 if self.dtype == "int8" else np.float16
+
+    def _refresh(self):
+        """Reload row count, tombstones and memmaps when another connection committed."""
+        import numpy as np
+        version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._version:
+            return
+        dim = self._info("dim")
+        self._dim = int(dim) if dim else None
+        self._generation = int(self._info("generation") or 0)
+        self._n = self._db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM rows").fetchone()[0]
+        self._alive = np.zeros(self._n, dtype=bool)
+        live = [r for (r,) in self._db.execute("SELECT row FROM rows WHERE alive = 1")]
+        if live:
+            self._alive[np.asarray(live, dtype=np.int64)] = True
+        self._remap()
+        self._version = version
+
+    def _remap(self):
+        import numpy as np
+        self._maps = {}
+        if not self._n or not self._dim:
+            return
+        n, d = self._n, self._dim
+        self._maps = {
+            "codes": np.memmap(self._path("codes"), dtype=self._code_dtype, mode="r", shape=(n, d)),
+            "scales": np.memmap(self._path("scales"), dtype=np.float32, mode="r", shape=(n,)),
+            "norms": np.memmap(self._path("norms"), dtype=np.float32, mode="r", shape=(n,)),
+            "vectors": np.memmap(self._path("vectors"), dtype=np.float32, mode="r", shape=(n, d)),
+        }
+
+    @contextmanager
+    def _transaction(self):
+        """Hold SQLite's write lock across a change, file writes included.
+
+        ``self._lock`` only serialises threads; the API and RQ workers open the same
+        collection from separate processes, so the row count must be re-read (and the
+        vector files written) only once this process owns the database write lock.
+        """
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            self._version = None
+            self._refresh()
+            yield
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            self._version = None  # in-memory state may be ahead of what was committed
+            raise
+
+    def _write_at(self, part: str, start: int, arr):
+        # Positional write + truncate: rows left behind by a crashed writer are overwritten
+        path = self._path(part)
+        row_bytes = arr.itemsize * (arr.shape[1] if arr.ndim == 2 else 1)
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            f.seek(start * row_bytes)
+            f.write(arr.tobytes())
+            f.truncate()
+
+    def _quantize(self, vecs):
+        import numpy as np
+        if self.dtype == "fp16":
+            return vecs.astype(np.float16), np.ones(len(vecs), dtype=np.float32)
+        scales = np.abs(vecs).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vecs / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    # --- VectorStore ------------------------------------------------------
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        import numpy as np
+        if not ids:
+            return
+        last = {id_: n for n, id_ in enumerate(ids)}  # later duplicates win, as in Chroma
+        order = list(last.values())
+        vecs = np.asarray(embeddings, dtype=np.float32)[order]
+        ids = [ids[n] for n in order]
+        documents = [documents[n] for n in order] if documents is not None else [None] * len(ids)
+        metadatas = [metadatas[n] or {} for n in order] if metadatas is not None else [{}] * len(ids)
+
+        with self._lock, self._transaction():
+            if self._dim is None:
+                self._dim = vecs.shape[1]
+                self._db.execute("INSERT OR REPLACE INTO info VALUES ('dim', ?)", (str(self._dim),))
+            elif vecs.shape[1] != self._dim:
+                raise ValueError(f"Embedding dimension {vecs.shape[1]} does not match collection dimension {self._dim}")
+
+            start = self._n  # MAX(row) + 1, read under the write lock
+            codes, scales = self._quantize(vecs)
+            self._write_at("codes", start, codes)
+            self._write_at("scales", start, scales)
+            self._write_at("norms", start, (vecs * vecs).sum(axis=1).astype(np.float32))
+            self._write_at("vectors", start, vecs)
+
+            old = self._live_rows(ids)
+            self._set_dead(old)
+            self._db.executemany(
+                "INSERT INTO rows (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                [(start + i, id_, documents[i], json.dumps(metadatas[i])) for i, id_ in enumerate(ids)],
+            )
+
+            self._n = start + len(ids)
+            self._alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+            if old:
+                self._alive[np.asarray(old, dtype=np.int64)] = False
+            self._remap()
+
+    def _live_rows(self, ids) -> List[int]:
+        out = []
+        for i in range(0, len(ids), 500):
+            part = ids[i:i + 500]
+            out += [r for (r,) in self._db.execute(
+                f"SELECT row FROM rows WHERE alive = 1 AND id IN ({','.join('?' * len(part))})", part)]
+        return out
+
+    def _set_dead(self, rows: List[int]):
+        self._db.executemany("UPDATE rows SET alive = 0 WHERE row = ?", [(r,) for r in rows])
+
+    def _filtered_rows(self, where):
+        import numpy as np
+        params = []
+        sql = f"SELECT row FROM rows WHERE alive = 1 AND {_where_sql(where, params)}"
+        return np.asarray([r for (r,) in self._db.execute(sql, params)], dtype=np.int64)
+
+    def _first_pass(self, q, want: int, rows=None):
+        """Approximate squared-L2 top-``want`` over the quantized codes, scanned in blocks."""
+        import numpy as np
+        codes, scales, norms = self._maps["codes"], self._maps["scales"], self._maps["norms"]
+        block = settings.compact_scan_block
+        best_rows, best_dist = [], []
+        total = self._n if rows is None else len(rows)
+        for s in range(0, total, block):
+            if rows is None:
+                idx = np.arange(s, min(s + block, total))
+                c, sc, nr = codes[s:s + block], scales[s:s + block], norms[s:s + block]
+                alive = self._alive[s:s + block]
+            else:
+                idx = rows[s:s + block]
+                c, sc, nr = codes[idx], scales[idx], norms[idx]
+                alive = None
+            dist = nr - 2 * (c.astype(np.float32) @ q) * sc
+            if alive is not None:
+                dist = np.where(alive, dist, np.inf)
+            if len(dist) > want:
+                top = np.argpartition(dist, want - 1)[:want]
+                idx, dist = idx[top], dist[top]
+            best_rows.append(idx)
+            best_dist.append(dist)
+        if not best_rows:
+            return np.zeros(0, dtype=np.int64)
+        idx, dist = np.concatenate(best_rows), np.concatenate(best_dist)
+        keep = np.isfinite(dist)
+        idx, dist = idx[keep], dist[keep]
+        if len(dist) > want:
+            top = np.argpartition(dist, want - 1)[:want]
+            idx = idx[top]
+        return idx
+
+    def query(self, embedding, k, where=None):
+        import numpy as np
+        q = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._refresh()
+            if not self._n or k <= 0:
+                return []
+            rows = self._filtered_rows(where) if where else None
+            if rows is not None and not len(rows):
+                return []
+            cand = self._first_pass(q, max(k * settings.compact_rescore_factor, k), rows)
+            if not len(cand):
+                return []
+            cand = np.sort(cand)  # sequential reads from the float file
+            exact = self._maps["vectors"][cand]
+            dist = ((exact - q) ** 2).sum(axis=1)
+            order = np.argsort(dist)[:k]
+            top, top_dist = cand[order], dist[order]
+            found = self._fetch([int(r) for r in top])
+        return [{**found[int(r)], "distance": float(d)} for r, d in zip(top, top_dist) if int(r) in found]
+
+    def _fetch(self, rows: List[int]) -> dict:
+        out = {}
+        for i in range(0, len(rows), 500):
+            part = rows[i:i + 500]
+            for row, id_, doc, meta in self._db.execute(
+                    f"SELECT row, id, document, metadata FROM rows WHERE row IN ({','.join('?' * len(part))})", part):
+                out[row] = {"id": id_, "document": doc, "metadata": json.loads(meta)}
+        return out
+
+    def get(self, ids=None, where=None):
+        with self._lock:
+            params = []
+            sql = f"SELECT id, document, metadata FROM rows WHERE alive = 1 AND {_where_sql(where, params)}"
+            if ids is not None:
+                if not ids:
+                    return []
+                sql += f" AND id IN ({','.join('?' * len(ids))})"
+                params += list(ids)
+            return [{"id": i, "document": d, "metadata": json.loads(m), "distance": None}
+                    for i, d, m in self._db.execute(sql + " ORDER BY row", params)]
+
+    def delete(self, ids=None, where=None):
+        import numpy as np
+        with self._lock, self._transaction():
+            if ids is not None:
+                rows = self._live_rows(list(ids))
+                if where:
+                    allowed = set(self._filtered_rows(where).tolist())
+                    rows = [r for r in rows if r in allowed]
+            else:
+                rows = self._filtered_rows(where).tolist()
+            if not rows:
+                return
+            self._set_dead(rows)
+            self._alive[np.asarray(rows, dtype=np.int64)] = False
+
+    def count(self):
+        return self._db.execute("SELECT COUNT(*) FROM rows WHERE alive = 1").fetchone()[0]
+
+    # --- maintenance ------------------------------------------------------
+
+    def save(self):
+        """Vacuum dead rows once they exceed ``compact_vacuum_ratio`` of the index."""
+        with self._lock:
+            self._refresh()
+            dead = self._n - int(self._alive.sum()) if self._n else 0
+            if dead and dead >= settings.compact_vacuum_ratio * self._n:
+                self.vacuum()
+
+    def vacuum(self):
+        """Rewrite the vector files with live rows only and renumber the metadata table.
+
+        The compacted rows go to the next generation's files; the renumbering and the
+        switch to that generation commit together, and the old files are removed after.
+        """
+        import numpy as np
+        with self._lock:
+            old_generation = new_generation = None
+            try:
+                with self._transaction():
+                    old_generation, new_generation = self._generation, self._generation + 1
+                    keep = np.flatnonzero(self._alive)
+                    for part in ("codes", "scales", "norms", "vectors"):
+                        if part in self._maps:
+                            with open(self._path(part, new_generation), "wb") as f:
+                                for s in range(0, len(keep), settings.compact_scan_block):
+                                    rows = keep[s:s + settings.compact_scan_block]
+                                    f.write(np.ascontiguousarray(self._maps[part][rows]).tobytes())
+                    self._db.execute("DELETE FROM rows WHERE alive = 0")
+                    # Ascending order keeps every target row free by the time it is assigned
+                    self._db.executemany("UPDATE rows SET row = ? WHERE row = ?",
+                                         [(new, int(old)) for new, old in enumerate(keep) if new != old])
+                    self._db.execute("INSERT OR REPLACE INTO info VALUES ('generation', ?)", (str(new_generation),))
+            except BaseException:
+                if new_generation is not None:
+                    self._remove_generation(new_generation)
+                raise
+            self._maps = {}
+            self._remove_generation(old_generation)
+            self._version = None
+            self._refresh()
+            print(f"🧹 Vacuumed vector index {self.name}: {len(keep)} live rows")
+
+    def _remove_generation(self, generation: int):
+        # Processes still mapping these files keep reading them until they notice the new generation
+        for part in ("codes", "scales", "norms", "vectors"):
+            try: os.remove(self._path(part, generation))
+            except FileNotFoundError: pass
+
+    def footprint(self) -> dict:
+        """Bytes on disk per file, for benchmarks and /stats."""
+        out = {}
+        for part in ("codes", "scales", "norms", "vectors"):
+            path = self._path(part)
+            out[part] = os.path.getsize(path) if os.path.exists(path) else 0
+        out["meta"] = sum(os.path.getsize(os.path.join(self._dir, f)) for f in os.listdir(self._dir)
+                          if f.startswith("meta.sqlite"))
+        return out
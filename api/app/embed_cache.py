@@ -0,0 +1,163 @@
+import hashlib, logging, os, re, threading, unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+_ws = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """Canonical form used both as cache key and as encoder input."""
+    return _ws.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+# Passed to every encode call; part of the key, so changing them never serves stale vectors
+ENCODE_KWARGS = {"normalize_embeddings": True}
+
+def encode_options() -> str:
+    """Everything besides the model name and the text that changes the vectors an encode returns."""
+    options = sorted({**ENCODE_KWARGS, "cpu_precision": settings.torch_cpu_precision}.items())
+    return ",".join(f"{k}={v}" for k, v in options)
+
+def cache_key(model_name: str, text: str, options: str = "") -> str:
+    return hashlib.sha256(f"{model_name}\0{options}\0{text}".encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """Content-addressed embedding cache: bounded in-memory LRU + optional Redis/disk tier."""
+
+    def __init__(self, max_items: int, backend: str = "memory"):
+        self.max_items = max_items
+        self.backend = backend
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+        self.stats = {"hits": 0, "persistent_hits": 0, "misses": 0, "evictions": 0, "errors": 0}
+
+    # --- persistent tier -------------------------------------------------
+    def _get_redis(self):
+        if self._redis is None:
+            from redis import Redis
+            self._redis = Redis.from_url(settings.redis_url)
+        return self._redis
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(settings.embed_cache_dir, key[:2], f"{key}.npy")
+
+    def _load_persistent(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        try:
+            if self.backend == "redis":
+                values = self._get_redis().mget([f"emb:{k}" for k in keys])
+                for k, v in zip(keys, values):
+                    if v is not None:
+                        found[k] = np.frombuffer(v, dtype=np.float32)
+            elif self.backend == "disk":
+                for k in keys:
+                    path = self._disk_path(k)
+                    if os.path.exists(path):
+                        found[k] = np.load(path)
+        except Exception as e:
+            self._count("errors")
+            logger.warning(f"Embedding cache read failed ({self.backend}): {e}")
+        return found
+
+    def _store_persistent(self, items: Dict[str, np.ndarray]):
+        try:
+            if self.backend == "redis":
+                pipe = self._get_redis().pipeline(transaction=False)
+                for k, v in items.items():
+                    pipe.set(f"emb:{k}", v.astype(np.float32).tobytes(), ex=settings.embed_cache_ttl or None)
+                pipe.execute()
+            elif self.backend == "disk":
+                for k, v in items.items():
+                    path = self._disk_path(k)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    tmp = f"{path}.{os.getpid()}.tmp"
+                    with open(tmp, "wb") as f:
+                        np.save(f, v.astype(np.float32))
+                    os.replace(tmp, path)
+        except Exception as e:
+            self._count("errors")
+            logger.warning(f"Embedding cache write failed ({self.backend}): {e}")
+
+    def _count(self, stat: str, n: int = 1):
+        # encode runs on several executor threads at once
+        with self._lock:
+            self.stats[stat] += n
+
+    # --- in-memory tier --------------------------------------------------
+    def _remember(self, key: str, vec: np.ndarray):
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_items:
+            self._lru.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def encode(self, model, model_name: str, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+        """Encode ``texts`` with ``model``, only running the model on cache misses."""
+        norm = [normalize_text(t) for t in texts]
+        options = encode_options()
+        keys = [cache_key(model_name, t, options) for t in norm]
+        vecs: Dict[str, np.ndarray] = {}
+
+        with self._lock:
+            for k in keys:
+                if k in self._lru:
+                    self._lru.move_to_end(k)
+                    vecs[k] = self._lru[k]
+            self.stats["hits"] += sum(1 for k in keys if k in vecs)
+
+        missing = [k for k in dict.fromkeys(keys) if k not in vecs]
+        if missing and self.backend != "memory":
+            found = self._load_persistent(missing)
+            vecs.update(found)
+            with self._lock:
+                self.stats["persistent_hits"] += sum(1 for k in keys if k in found)
+                for k, v in found.items():
+                    self._remember(k, v)
+
+        # Encode each distinct missing text once, even if it repeats within the batch
+        todo = {}
+        for k, t in zip(keys, norm):
+            if k not in vecs and k not in todo:
+                todo[k] = t
+        if todo:
+            self._count("misses", sum(1 for k in keys if k in todo))
+            kwargs = dict(ENCODE_KWARGS)
+            if batch_size:
+                kwargs["batch_size"] = batch_size
+            encoded = model.encode(list(todo.values()), **kwargs)
+            fresh = {k: np.asarray(v, dtype=np.float32) for k, v in zip(todo.keys(), encoded)}
+            vecs.update(fresh)
+            with self._lock:
+                for k, v in fresh.items():
+                    self._remember(k, v)
+            if self.backend != "memory":
+                self._store_persistent(fresh)
+
+        return [vecs[k].tolist() for k in keys]
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["persistent_hits"] + self.stats["misses"]
+        return {
+            "backend": self.backend,
+            "items": len(self._lru),
+            "max_items": self.max_items,
+            **self.stats,
+            "hit_rate": round((lookups - self.stats["misses"]) / lookups, 4) if lookups else 0.0,
+        }
+
+_cache = None
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache(settings.embed_cache_size, settings.embed_cache_backend)
+    return _cache
+
+def encode_cached(model, model_name: str, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+    """Drop-in for ``model.encode(texts, normalize_embeddings=True).tolist()`` going through the cache."""
+    if not texts:
+        return []
+    return get_embedding_cache().encode(model, model_name, texts, batch_size=batch_size)
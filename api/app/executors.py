@@ -0,0 +1,98 @@
+import asyncio, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+from .settings import settings
+
+class ExecutorBusy(Exception):
+    """Raised when an executor's queue is full; routes turn it into a 503."""
+
+class BoundedExecutor:
+    """Thread pool with a cap on queued work and queue-depth counters.
+
+    Blocking model/Chroma calls run here instead of on the event loop, so a long
+    encode or transcription never stalls other requests (or /healthz).
+    """
+
+    def __init__(self, name: str, workers: int, max_queue: int):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"medran-{name}")
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0,
+                      "running": 0, "peak_depth": 0, "wait_s_total": 0.0, "run_s_total": 0.0}
+
+    @property
+    def depth(self) -> int:
+        """Tasks submitted but not finished (queued + running)."""
+        return self.stats["submitted"] - self.stats["completed"] - self.stats["failed"]
+
+    async def run(self, fn, *args, **kwargs):
+        with self._lock:
+            if self.depth >= self.workers + self.max_queue:
+                self.stats["rejected"] += 1
+                raise ExecutorBusy(f"{self.name} executor is busy ({self.depth} tasks queued), try again later")
+            self.stats["submitted"] += 1
+            self.stats["peak_depth"] = max(self.stats["peak_depth"], self.depth)
+        submitted = time.perf_counter()
+
+        def _call():
+            started = time.perf_counter()
+            with self._lock:
+                self.stats["running"] += 1
+                self.stats["wait_s_total"] += started - submitted
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self.stats["running"] -= 1
+                    self.stats["run_s_total"] += time.perf_counter() - started
+                    self.stats["completed" if ok else "failed"] += 1
+
+        return await asyncio.get_running_loop().run_in_executor(self._pool, _call)
+
+    def snapshot(self) -> dict:
+        done = self.stats["completed"] + self.stats["failed"]
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "depth": self.depth,
+            "queued": max(self.depth - self.stats["running"], 0),
+            **self.stats,
+            "wait_s_avg": round(self.stats["wait_s_total"] / done, 4) if done else 0.0,
+            "run_s_avg": round(self.stats["run_s_total"] / done, 4) if done else 0.0,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+_executors: Dict[str, BoundedExecutor] = {}
+
+def get_executor(name: str) -> BoundedExecutor:
+    """Executors: ``embed`` (encode), ``vector`` (Chroma), ``asr`` (Whisper), ``io`` (spool files/Redis).
+
+    PDF parsing and OCR run in the RQ ingest worker process, not in the API.
+    """
+    if name not in _executors:
+        workers, max_queue = {
+            "embed": (settings.embed_workers, settings.embed_max_queue),
+            "vector": (settings.vector_workers, settings.vector_max_queue),
+            "asr": (settings.asr_workers, settings.asr_max_queue),
+            "io": (settings.io_workers, settings.io_max_queue),
+        }[name]
+        _executors[name] = BoundedExecutor(name, workers, max_queue)
+    return _executors[name]
+
+async def run_in(name: str, fn, *args, **kwargs):
+    """Run blocking ``fn`` on the named executor and await its result."""
+    return await get_executor(name).run(fn, *args, **kwargs)
+
+def executor_stats() -> dict:
+    return {name: ex.snapshot() for name, ex in _executors.items()}
+
+def shutdown_executors():
+    for ex in _executors.values():
+        ex.shutdown()
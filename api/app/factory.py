@@ -0,0 +1,114 @@
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.middleware.cors import CORSMiddleware
+import asyncio, importlib
+from contextlib import asynccontextmanager
+
+from .settings import settings
+from .models import get_registry
+from .executors import executor_stats, shutdown_executors, ExecutorBusy
+from .readiness import check_readiness, preload_names
+from .uploads import BadUpload, UploadTooLarge
+
+# role -> (router module, models it serves, dependencies checked by /readyz).
+# Routers are imported only for the roles a process serves, so e.g. the chat API
+# never imports the ASR stack and the ASR worker never opens the vector store.
+ROLES = {
+    "chat": (".routes.chat", {"text", "image"}, ["vectors", "llm"]),
+    "ingest": (".routes.ingest", set(), ["redis", "minio"]),
+    "asr": (".routes.asr", {"asr"}, []),
+}
+
+def _parse_roles(roles) -> list:
+    if isinstance(roles, str):
+        roles = roles.split(",")
+    roles = [r.strip() for r in roles if r.strip()]
+    unknown = [r for r in roles if r not in ROLES]
+    if unknown:
+        raise ValueError(f"Unknown API role(s): {', '.join(unknown)}; expected {', '.join(ROLES)}")
+    return roles
+
+async def _unload_idle_models():
+    while True:
+        await asyncio.sleep(max(settings.idle_model_ttl / 4, 30) if settings.idle_model_ttl else 300)
+        try:
+            await asyncio.to_thread(get_registry().unload_idle)
+        except Exception as e:
+            print(f"⚠️ Warning: idle model sweep failed: {str(e)}")
+
+def create_app(roles=None) -> FastAPI:
+    """Build the API for ``roles`` (default ``settings.api_roles``): any of chat, ingest, asr."""
+    roles = _parse_roles(roles if roles is not None else settings.api_roles)
+    role_models = set().union(*(ROLES[r][1] for r in roles))
+    deps = sorted({d for r in roles for d in ROLES[r][2]})
+    preload = [n for n in preload_names() if n in role_models]
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        llm = writer = None
+        if "chat" in roles:
+            from .llm import get_llm_client
+            from .memory import get_memory_writer
+            llm = get_llm_client()
+            await llm.start()
+            writer = get_memory_writer()
+            await writer.start()
+        # Load + warm models in the background: /healthz answers at once, /readyz flips when done
+        preloading = asyncio.create_task(asyncio.to_thread(
+            get_registry().preload, preload, settings.preload_warmup))
+        sweeper = asyncio.create_task(_unload_idle_models())
+        yield
+        sweeper.cancel()
+        preloading.cancel()
+        if writer is not None:
+            await writer.stop()  # flush (or spill) buffered memory before anything else closes
+        if llm is not None:
+            await llm.close()
+        shutdown_executors()
+
+    app = FastAPI(title="MedraN Medical AI Assistant API", lifespan=lifespan)
+
+    # Add CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    @app.get("/healthz")
+    async def health():
+        """Liveness only: the process is up and the event loop is responsive."""
+        return {"ok": True, "roles": roles}
+
+    @app.get("/readyz")
+    async def ready():
+        """Readiness: preloaded models warmed and this role's dependencies reachable."""
+        report = await check_readiness(preload, deps)
+        return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+    @app.get("/models")
+    async def models():
+        return get_registry().snapshot()
+
+    @app.get("/stats/executors")
+    async def executors():
+        return executor_stats()
+
+    @app.exception_handler(ExecutorBusy)
+    async def executor_busy(request, exc: ExecutorBusy):
+        return JSONResponse({"error": str(exc)}, status_code=503, headers={"Retry-After": "1"})
+
+    @app.exception_handler(UploadTooLarge)
+    async def upload_too_large(request, exc: UploadTooLarge):
+        return JSONResponse({"error": str(exc)}, status_code=413)
+
+    @app.exception_handler(BadUpload)
+    async def bad_upload(request, exc: BadUpload):
+        return JSONResponse({"error": str(exc)}, status_code=400)
+
+    for role in roles:
+        app.include_router(importlib.import_module(ROLES[role][0], __package__).router)
+    print(f"🚦 API roles: {', '.join(roles)}")
+    return app
@@ -0,0 +1,109 @@
+"""Image stage of ingest: decode, filter, downsize and batch-embed the figures of a document.
+
+PDFs carry logos, rules and spacer images alongside real figures. Every xref is
+checked against ``image_min_side`` / ``image_min_area`` from its header before it is
+decoded; survivors are deduplicated by a perceptual hash, downsized to
+``image_max_side`` for storage and ``image_embed_side`` for CLIP, and capped at
+``image_max_per_doc``. ``embed_images`` then runs the image encoder on the pixels in
+batches of ``image_embed_batch_size``.
+"""
+import hashlib, io, logging
+from typing import Optional
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+def dhash(img, size: int = 8) -> str:
+    """64-bit difference hash: survives re-encoding and small resizes of the same figure."""
+    from PIL import Image
+    gray = img.convert("L").resize((size + 1, size), Image.BILINEAR)
+    px = list(gray.getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left, right = px[row * (size + 1) + col], px[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:016x}"
+
+class ImageFilter:
+    """Per-document filter state: xrefs and hashes already seen, images kept so far."""
+
+    def __init__(self, max_images: Optional[int] = None):
+        # None: the image_max_per_doc setting (0 there means unlimited); an explicit 0 keeps nothing
+        self.max_images = (settings.image_max_per_doc or None) if max_images is None else max_images
+        self.kept = 0
+        self._xrefs = set()
+        self._hashes = set()
+        self.skipped = {"small": 0, "duplicate": 0, "cap": 0, "error": 0}
+
+    def _skip(self, reason: str):
+        self.skipped[reason] += 1
+        return None
+
+    def admit(self, h: str) -> bool:
+        """Count an image with dHash ``h`` as kept, unless it duplicates one already kept or the cap is hit."""
+        reason = None
+        if self.max_images is not None and self.kept >= self.max_images:
+            reason = "cap"
+        elif h in self._hashes:
+            reason = "duplicate"
+        if reason:
+            self._skip(reason)
+            return False
+        self._hashes.add(h)
+        self.kept += 1
+        return True
+
+    def prepare(self, doc, xref: int, width: int, height: int) -> Optional[dict]:
+        """Decode and downsize one image xref, or return None if it is filtered out."""
+        from PIL import Image
+        import fitz
+        if self.max_images is not None and self.kept >= self.max_images:
+            return self._skip("cap")
+        if min(width, height) < settings.image_min_side or width * height < settings.image_min_area:
+            return self._skip("small")
+        if xref in self._xrefs:  # the same logo/figure object reused on many pages
+            return self._skip("duplicate")
+        self._xrefs.add(xref)
+        try:
+            pix = fitz.Pixmap(doc, xref)
+            if pix.alpha:
+                pix = fitz.Pixmap(pix, 0)
+            if pix.n != 3:  # gray / CMYK -> RGB
+                pix = fitz.Pixmap(fitz.csRGB, pix)
+            img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        except Exception as e:
+            logger.warning(f"Failed to decode image xref {xref}: {e}")
+            return self._skip("error")
+
+        h = dhash(img)
+        if not self.admit(h):
+            return None
+
+        img.thumbnail((settings.image_max_side, settings.image_max_side))
+        stored = io.BytesIO()
+        img.save(stored, format="PNG", optimize=False)
+        stored = stored.getvalue()
+
+        img.thumbnail((settings.image_embed_side, settings.image_embed_side))
+        embed = io.BytesIO()
+        img.save(embed, format="JPEG", quality=90)
+
+        return {
+            "sha": hashlib.sha256(stored).hexdigest()[:16],
+            "dhash": h,
+            "png": stored,
+            "embed": embed.getvalue(),
+            "width": width,
+            "height": height,
+        }
+
+def embed_images(model, imgs: list):
+    """CLIP embeddings of the prepared thumbnails (``img["embed"]`` JPEG bytes), in batches."""
+    from PIL import Image
+    out = []
+    step = settings.image_embed_batch_size
+    for i in range(0, len(imgs), step):
+        batch = [Image.open(io.BytesIO(im["embed"])).convert("RGB") for im in imgs[i:i + step]]
+        out.extend(model.encode(batch, batch_size=step, normalize_embeddings=True).tolist())
+    return out
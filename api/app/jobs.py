@@ -0,0 +1,275 @@
+import hashlib, os, uuid, logging
+from typing import Optional, Dict, Any
+from redis import Redis
+from rq import Queue, Retry, get_current_job
+from rq.job import Job
+from rq.exceptions import NoSuchJobError
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Global variables for lazy loading
+_redis = None
+_ingest_queue = None
+_maintenance_queue = None
+
+def _get_redis():
+    global _redis
+    if _redis is None:
+        _redis = Redis.from_url(settings.redis_url)
+    return _redis
+
+def get_ingest_queue():
+    global _ingest_queue
+    if _ingest_queue is None:
+        _ingest_queue = Queue(settings.ingest_queue, connection=_get_redis(),
+                              default_timeout=settings.ingest_job_timeout)
+    return _ingest_queue
+
+def get_maintenance_queue():
+    global _maintenance_queue
+    if _maintenance_queue is None:
+        _maintenance_queue = Queue(settings.maintenance_queue, connection=_get_redis())
+    return _maintenance_queue
+
+def enqueue_ingest(spooled_path: str, name: str, doc_id: str, file_sha: Optional[str] = None) -> str:
+    """Queue an upload already spooled by the API (see app/uploads.py) for the ingest worker.
+
+    The file is renamed to ``{job_id}.pdf`` in the spool directory. Returns the job id.
+    """
+    job_id = uuid.uuid4().hex
+    path = os.path.join(settings.ingest_spool_dir, f"{job_id}.pdf")
+    os.replace(spooled_path, path)
+
+    retry = None
+    if settings.ingest_max_retries > 0:
+        retry = Retry(max=settings.ingest_max_retries, interval=settings.ingest_retry_interval)
+    get_ingest_queue().enqueue(
+        run_ingest, path, name, doc_id, file_sha,
+        job_id=job_id,
+        retry=retry,
+        job_timeout=settings.ingest_job_timeout,
+        result_ttl=settings.ingest_result_ttl,
+        failure_ttl=settings.ingest_result_ttl,
+        meta={"doc_id": doc_id, "title": name, "stage": "queued", "attempts": 0, "failures": []},
+    )
+    return job_id
+
+def _update(job, **fields):
+    if job is None:
+        return
+    job.meta.update(fields)
+    job.save_meta()
+
+def _rate(batcher):
+    return {"chunks_per_s": batcher.stats()["chunks_per_s"]}
+
+def _record_failure(job, page: Optional[int], stage: str, error: Exception):
+    logger.warning(f"Ingest failure ({stage}, page {page}): {error}")
+    if job is None:
+        return
+    job.meta.setdefault("failures", []).append(
+        {"page": page, "stage": stage, "error": str(error), "attempt": job.meta.get("attempts", 0)}
+    )
+    job.save_meta()
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(settings.upload_chunk_bytes), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def run_ingest(path: str, name: str, doc_id: str, file_sha: Optional[str] = None) -> Dict[str, Any]:
+    """Worker-side ingest: diff page hashes -> parse changed pages -> chunk -> embed/upsert -> drop stale ids.
+
+    The per-title manifest (app/manifest.py) makes this incremental: an identical file is
+    a no-op, and a revision only re-processes pages whose content hash changed.
+    """
+    # Imported here so the API process never loads the parsing/embedding stack for enqueueing
+    import fitz
+    from .parsing import parse_pdf_to_sections
+    from .rag import TextIngestBatcher, upsert_images, image_id, delete_chunks, delete_images
+    from .chunker import get_chunker
+    from .manifest import get_manifest, save_manifest, manifest_lock, page_hashes, diff
+    from .vectorstore import save_all
+
+    job = get_current_job()
+    attempt = (job.meta.get("attempts", 0) + 1) if job else 1
+    _update(job, stage="parsing", attempts=attempt, pages_parsed=0, pages_embedded=0, chunks=0, images=0)
+
+    try:
+        with manifest_lock(name):
+            # MuPDF reads the spooled file on demand; the PDF is never loaded into memory whole
+            file_sha = file_sha or _file_sha256(path)
+            size = os.path.getsize(path)
+            manifest = get_manifest(name)
+            if manifest and manifest.get("file_sha") == file_sha:
+                print(f"⏭️ {name} is unchanged since the last ingest")
+                _update(job, stage="done", pages_total=len(manifest["pages"]))
+                _cleanup(path)
+                return {"doc_id": doc_id, "pages": len(manifest["pages"]), "chunks": 0, "unchanged": True}
+
+            with fitz.open(path, filetype="pdf") as doc:
+                hashes = page_hashes(doc)
+            delta = diff(manifest, hashes)
+            changed, removed = delta["changed"], delta["removed"]
+            print(f"📄 Processing document: {name} ({size} bytes), attempt {attempt}: "
+                  f"{len(changed)}/{len(hashes)} pages changed, {len(removed)} removed")
+
+            def _on_page(done, total):
+                _update(job, pages_total=total, pages_parsed=done)
+
+            old_pages = (manifest or {}).get("pages", {})
+            changed_set = set(changed)
+            pages_out = {str(p): old_pages[str(p)] for p in range(1, len(hashes) + 1)
+                         if p not in changed_set and str(p) in old_pages}
+            # The per-document caps cover the whole document: unchanged pages keep their share
+            kept_images = sum(len(p.get("images", [])) for p in pages_out.values())
+            kept_chunks = sum(len(p["chunks"]) for p in pages_out.values())
+            max_images = max(settings.image_max_per_doc - kept_images, 0) if settings.image_max_per_doc else None
+
+            _update(job, pages_total=len(changed), pages_changed=len(changed))
+            if changed:
+                parsed = parse_pdf_to_sections(path, name, doc_id, progress=_on_page, only_pages=changed,
+                                               max_images=max_images)
+            else:
+                parsed = {"doc_id": doc_id, "title": name, "pages": [], "images": []}
+
+            _update(job, stage="embedding")
+            chunker, section, produced = get_chunker(), None, kept_chunks
+            with TextIngestBatcher() as batcher:
+                for i, page in enumerate(parsed["pages"], start=1):
+                    pno = page["page"]
+                    if pno - 1 not in changed_set:
+                        # Previous page was not re-parsed: continue from the heading it ended under
+                        section = old_pages.get(str(pno - 1), {}).get("section")
+                    chunks, section = chunker.chunk_page(doc_id, pno, page["text_blocks"], section)
+                    if settings.chunk_max_per_doc:
+                        chunks = chunks[:max(settings.chunk_max_per_doc - produced, 0)]
+                    produced += len(chunks)
+                    batcher.add(name, chunks)
+                    pages_out[str(pno)] = {"hash": hashes[pno - 1], "chunks": [c["id"] for c in chunks],
+                                           "images": [], "section": section}
+                    if not batcher.pending:  # a flush just wrote every page so far
+                        _update(job, pages_embedded=i, chunks=batcher.chunks_written, **_rate(batcher))
+            total_chunks = batcher.chunks_written
+            _update(job, pages_embedded=len(parsed["pages"]), chunks=total_chunks, **_rate(batcher))
+
+            print(f"📄 Processed {len(parsed['pages'])} pages, {total_chunks} text chunks "
+                  f"({batcher.stats()['chunks_per_s']} chunks/s, {batcher.flushes} upserts)")
+
+            # Try to process images, but don't fail the entire ingest if it fails
+            _update(job, stage="images")
+            try:
+                upsert_images(parsed["images"])
+                for img in parsed["images"]:
+                    pages_out[str(img["page"])]["images"].append(image_id(img))
+                _update(job, images=len(parsed["images"]))
+                print(f"🖼️ Processed {len(parsed.get('images', []))} images")
+            except Exception as img_error:
+                _record_failure(job, None, "images", img_error)
+
+            # Ids the previous versions of re-processed or removed pages produced and this run didn't
+            _update(job, stage="cleanup")
+            live_chunks = {c for p in pages_out.values() for c in p["chunks"]}
+            live_images = {c for p in pages_out.values() for c in p["images"]}
+            stale_pages = [old_pages[str(p)] for p in changed + removed if str(p) in old_pages]
+            stale_chunks = sorted({c for p in stale_pages for c in p["chunks"]} - live_chunks)
+            stale_images = sorted({c for p in stale_pages for c in p.get("images", [])} - live_images)
+            delete_chunks(stale_chunks)
+            delete_images(stale_images)
+
+            # Work horses exit without running atexit hooks: persist embedded indexes explicitly
+            save_all()
+            save_manifest({"doc_id": doc_id, "title": name, "file_sha": file_sha, "pages": pages_out})
+        _update(job, stage="done")
+        _cleanup(path)
+        return {"doc_id": doc_id, "pages": len(hashes), "chunks": total_chunks,
+                "chunks_per_s": batcher.stats()["chunks_per_s"], "pages_changed": len(changed),
+                "pages_removed": len(removed), "chunks_deleted": len(stale_chunks)}
+
+    except Exception as e:
+        print(f"❌ Ingest error: {str(e)}")
+        _record_failure(job, None, job.meta.get("stage", "unknown") if job else "unknown", e)
+        # Keep the spooled file around while RQ still has retries left for this job
+        if job is None or not job.retries_left:
+            _cleanup(path)
+        raise
+
+def _cleanup(path: str):
+    try: os.remove(path)
+    except Exception: pass
+
+def get_ingest_status(job_id: str) -> Optional[Dict[str, Any]]:
+    """Progress, retry and failure report for an ingest job, or None if it is unknown/expired."""
+    try:
+        job = Job.fetch(job_id, connection=_get_redis())
+    except NoSuchJobError:
+        return None
+
+    meta = job.meta or {}
+    status = job.get_status(refresh=False)
+    error = None
+    if job.exc_info:
+        error = job.exc_info.strip().splitlines()[-1]
+    return {
+        "job_id": job.id,
+        "status": status.value if hasattr(status, "value") else str(status),
+        "doc_id": meta.get("doc_id"),
+        "title": meta.get("title"),
+        "stage": meta.get("stage", "queued"),
+        "pages_total": meta.get("pages_total", 0),
+        "pages_changed": meta.get("pages_changed", 0),
+        "pages_parsed": meta.get("pages_parsed", 0),
+        "pages_embedded": meta.get("pages_embedded", 0),
+        "chunks": meta.get("chunks", 0),
+        "chunks_per_s": meta.get("chunks_per_s", 0.0),
+        "images": meta.get("images", 0),
+        "retries": max(meta.get("attempts", 0) - 1, 0),
+        "retries_left": job.retries_left or 0,
+        "failures": meta.get("failures", []),
+        "error": error,
+        "result": job.result if status == "finished" else None,
+    }
+
+def enqueue_compaction(user_id: str):
+    """Queue memory compaction for one user, unless a compaction for them is already pending."""
+    if settings.vector_backend == "chroma-embedded":
+        # The worker would be a second process writing the API's embedded Chroma files
+        return None
+    job_id = f"compact-{user_id}"
+    try:
+        existing = Job.fetch(job_id, connection=_get_redis())
+        if existing.get_status(refresh=False) in ("queued", "started", "scheduled", "deferred"):
+            return job_id
+    except NoSuchJobError:
+        pass
+    get_maintenance_queue().enqueue(run_compaction, user_id, job_id=job_id,
+                                    result_ttl=settings.ingest_result_ttl, failure_ttl=settings.ingest_result_ttl)
+    return job_id
+
+def run_compaction(user_id: Optional[str] = None) -> list:
+    """Worker-side memory compaction for one user, or every user when ``user_id`` is None."""
+    import asyncio
+    from .memory import compact_user, memory_users
+    from .llm import get_llm_client
+    from .vectorstore import save_all
+
+    async def _run():
+        try:
+            users = [user_id] if user_id else memory_users()
+            reports = []
+            for uid in users:
+                try:
+                    reports.append(await compact_user(uid))
+                except Exception as e:
+                    print(f"❌ Memory compaction failed for {uid}: {str(e)}")
+                    reports.append({"user_id": uid, "error": str(e)})
+            return reports
+        finally:
+            save_all()
+            # The pooled client is bound to this event loop; don't leak it into the next job
+            await get_llm_client().close()
+
+    return asyncio.run(_run())
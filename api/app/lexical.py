@@ -0,0 +1,331 @@
+"""BM25 lexical index over text chunks (SQLite), for exact-term queries and hybrid search.
+
+The ingest worker adds chunks as ``TextIngestBatcher`` flushes them; the API reads
+the same file (``settings.lexical_index_path``, on the volume both containers share).
+
+The index is an inverted index of impact-ordered postings. Each (term, chunk) pair
+stores the chunk's BM25 term-frequency component, quantized to 1-255, under the key
+``(term, impact, chunk)``. A query reads at most ``lexical_max_postings`` of the
+highest-impact postings per term, straight off the B-tree, and adds them up
+weighted by the term's idf. Query cost therefore depends on the number of query
+terms, not on how many chunks contain them: common words like "patient" or "dose"
+cost about the same as a rare ICD code. When a term's list was cut short, the best
+candidates are re-scored from their text for that term. For the same reason, each
+term keeps only its ``lexical_postings_per_term`` highest-impact postings on disk.
+Rankings for common terms are approximate, because a chunk can only become a
+candidate through a term's top postings.
+
+A word made of several tokens (``E11.9``, ``500-mg``) is also indexed as one term,
+so a query for it matches the whole word, not chunks that merely contain ``e11`` and ``9``.
+
+Backfill an existing corpus from the vector store with ``python -m app.lexical rebuild``.
+"""
+import heapq, math, os, re, sqlite3, sys, threading, unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from .settings import settings
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_STOP = frozenset("a an and are as at be by for from has have in is it its of on or that the to was were with".split())
+_K1, _B = 1.2, 0.75
+_SCHEMA = "2"
+
+def _fold(text: str) -> str:
+    text = text.lower()
+    if not text.isascii():
+        text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return text
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens with diacritics removed (as FTS5's unicode61 tokenizer)."""
+    return _WORD.findall(_fold(text))
+
+def _compounds(folded: str):
+    """Whitespace-separated words of several tokens (E11.9, 500-mg), as their tokens joined by a space."""
+    for word in folded.split():
+        if not word.isalnum():
+            parts = _WORD.findall(word)
+            if len(parts) > 1:
+                yield " ".join(parts)
+
+def _terms(text: str) -> Tuple[Counter, int]:
+    """Index terms of ``text`` with their counts, and its length in tokens."""
+    folded = _fold(text)
+    tokens = _WORD.findall(folded)
+    counts = Counter(t for t in tokens if t not in _STOP)
+    counts.update(_compounds(folded))
+    return counts, len(tokens)
+
+def query_terms(query: str) -> List[str]:
+    """Each whitespace-separated query word as an index term, deduplicated, stopwords dropped."""
+    terms = []
+    for word in query.split():
+        term = " ".join(tokenize(word))
+        if term and term not in _STOP and term not in terms:
+            terms.append(term)
+    return terms[:32]
+
+def _norm(length: int, avgdl: float) -> float:
+    return _K1 * (1 - _B + _B * length / avgdl)
+
+def _impact(tf: int, norm: float) -> int:
+    """BM25's saturating tf component, tf * (k1 + 1) / (tf + norm), scaled to 1-255."""
+    return max(1, min(255, round(tf * 255 / (tf + norm))))
+
+def _impacts(counts: Counter, length: int, avgdl: float) -> Dict[str, int]:
+    norm = _norm(length, avgdl)
+    return {term: _impact(tf, norm) for term, tf in counts.items()}
+
+class LexicalIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        db = self._conn()
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS chunk_meta (
+                rowid INTEGER PRIMARY KEY, chunk_id TEXT NOT NULL UNIQUE, doc_id TEXT NOT NULL,
+                title TEXT, page INTEGER, section TEXT, text TEXT, length INTEGER NOT NULL DEFAULT 0,
+                avgdl REAL NOT NULL DEFAULT 1);
+            CREATE INDEX IF NOT EXISTS chunk_meta_doc ON chunk_meta(doc_id);
+            CREATE TABLE IF NOT EXISTS terms (
+                id INTEGER PRIMARY KEY, term TEXT NOT NULL UNIQUE, df INTEGER NOT NULL DEFAULT 0,
+                stored INTEGER NOT NULL DEFAULT 0);  -- stored: upper bound on the term's postings rows
+            CREATE TABLE IF NOT EXISTS postings (
+                term_id INTEGER NOT NULL, impact INTEGER NOT NULL, row INTEGER NOT NULL,
+                PRIMARY KEY (term_id, impact, row)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value);
+        """)
+        db.execute("INSERT OR IGNORE INTO info VALUES ('schema', ?)", (_SCHEMA,))
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread: reads run concurrently in the vector executor
+        db = getattr(self._local, "db", None)
+        if db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA cache_size=-65536")  # 64 MB: posting inserts touch pages all over the B-tree
+            self._local.db = db
+        return db
+
+    @staticmethod
+    def _stats(db) -> tuple:
+        info = dict(db.execute("SELECT key, value FROM info WHERE key IN ('n', 'total_len')"))
+        return int(info.get("n", 0)), int(info.get("total_len", 0))
+
+    @staticmethod
+    def _set_stats(db, n: int, total_len: int):
+        db.executemany("INSERT OR REPLACE INTO info VALUES (?, ?)", [("n", n), ("total_len", total_len)])
+
+    @staticmethod
+    def _term_ids(db, terms) -> Dict[str, int]:
+        terms = list(terms)
+        db.executemany("INSERT OR IGNORE INTO terms (term) VALUES (?)", [(t,) for t in terms])
+        ids = {}
+        for i in range(0, len(terms), 500):
+            part = terms[i:i + 500]
+            ids.update(db.execute(f"SELECT term, id FROM terms WHERE term IN ({','.join('?' * len(part))})", part))
+        return ids
+
+    def add(self, items):
+        """Upsert ``(chunk_id, text, metadata)`` tuples (the TextIngestBatcher pending format)."""
+        if not items:
+            return
+        docs = [(chunk_id, text or "", meta, *_terms(text or "")) for chunk_id, text, meta in items]
+        db = self._conn()
+        with self._write_lock:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete_ids(db, [d[0] for d in docs])
+                n, total = self._stats(db)
+                n, total = n + len(docs), total + sum(d[4] for d in docs)
+                avgdl = max(total / n, 1.0)
+                per_doc = [_impacts(counts, length, avgdl) for *_, counts, length in docs]
+                term_ids = self._term_ids(db, {t for p in per_doc for t in p})
+                postings, df = [], Counter()
+                for (chunk_id, text, meta, _, length), impacts in zip(docs, per_doc):
+                    cur = db.execute(
+                        "INSERT INTO chunk_meta (chunk_id, doc_id, title, page, section, text, length, avgdl) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (chunk_id, meta.get("doc_id"), meta.get("title"), meta.get("page"), meta.get("section") or "",
+                         text, length, avgdl),
+                    )
+                    postings.extend((term_ids[t], impact, cur.lastrowid) for t, impact in impacts.items())
+                    df.update(term_ids[t] for t in impacts)
+                postings.sort()  # B-tree order: far fewer page visits than random inserts
+                db.executemany("INSERT INTO postings (term_id, impact, row) VALUES (?, ?, ?)", postings)
+                db.executemany("UPDATE terms SET df = df + ?, stored = stored + ? WHERE id = ?",
+                               [(c, c, t) for t, c in df.items()])
+                self._prune(db, list(df))
+                self._set_stats(db, n, total)
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+
+    def _prune(self, db, term_ids: List[int]):
+        """Drop all but the ``lexical_postings_per_term`` highest-impact postings of the given terms."""
+        cap = settings.lexical_postings_per_term
+        if not cap:
+            return
+        slack = max(cap // 10, 1)  # prune a term once per ~cap/10 additions, not on every batch
+        over = []
+        for i in range(0, len(term_ids), 500):
+            part = term_ids[i:i + 500]
+            over += [t for (t,) in db.execute(
+                f"SELECT id FROM terms WHERE stored > ? AND id IN ({','.join('?' * len(part))})", [cap + slack, *part])]
+        for tid in over:
+            edge = db.execute("SELECT impact, row FROM postings WHERE term_id = ? "
+                              "ORDER BY impact DESC, row DESC LIMIT 1 OFFSET ?", (tid, cap - 1)).fetchone()
+            if edge is None:  # deletions left fewer than cap; resync the bound
+                db.execute("UPDATE terms SET stored = (SELECT COUNT(*) FROM postings WHERE term_id = ?) WHERE id = ?",
+                           (tid, tid))
+                continue
+            db.execute("DELETE FROM postings WHERE term_id = ? AND (impact < ? OR (impact = ? AND row < ?))",
+                       (tid, edge[0], edge[0], edge[1]))
+            db.execute("UPDATE terms SET stored = ? WHERE id = ?", (cap, tid))
+
+    def _delete_ids(self, db, chunk_ids):
+        n, total = self._stats(db)
+        for i in range(0, len(chunk_ids), 500):
+            part = chunk_ids[i:i + 500]
+            marks = ",".join("?" * len(part))
+            found = db.execute(f"SELECT rowid, text, avgdl FROM chunk_meta WHERE chunk_id IN ({marks})", part).fetchall()
+            if not found:
+                continue
+            # Postings are recomputed from the stored text with the avgdl they were written with
+            per_row = []
+            for row, text, avgdl in found:
+                counts, length = _terms(text or "")
+                per_row.append((row, _impacts(counts, length, avgdl)))
+                n, total = n - 1, total - length
+            term_ids = dict(self._existing_terms(db, {t for _, p in per_row for t in p}))
+            postings, df = [], Counter()
+            for row, impacts in per_row:
+                for term, impact in impacts.items():
+                    if term in term_ids:
+                        postings.append((term_ids[term], impact, row))
+                        df[term_ids[term]] += 1
+            # Pruned postings are simply not found; terms.stored stays an upper bound
+            db.executemany("DELETE FROM postings WHERE term_id = ? AND impact = ? AND row = ?", postings)
+            db.executemany("UPDATE terms SET df = df - ? WHERE id = ?", [(c, t) for t, c in df.items()])
+            rows = [r[0] for r in found]
+            db.execute(f"DELETE FROM chunk_meta WHERE rowid IN ({','.join('?' * len(rows))})", rows)
+        self._set_stats(db, max(n, 0), max(total, 0))
+
+    @staticmethod
+    def _existing_terms(db, terms):
+        terms = list(terms)
+        for i in range(0, len(terms), 500):
+            part = terms[i:i + 500]
+            yield from db.execute(f"SELECT term, id FROM terms WHERE term IN ({','.join('?' * len(part))})", part)
+
+    def delete(self, chunk_ids: Optional[List[str]] = None, doc_id: Optional[str] = None):
+        db = self._conn()
+        with self._write_lock:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                if chunk_ids:
+                    self._delete_ids(db, list(chunk_ids))
+                if doc_id is not None:
+                    ids = [c for (c,) in db.execute("SELECT chunk_id FROM chunk_meta WHERE doc_id = ?", (doc_id,))]
+                    self._delete_ids(db, ids)
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+
+    def search(self, query: str, k: int) -> List[dict]:
+        """Top-``k`` chunks by BM25, in the same hit shape as ``rag._query_text``."""
+        terms = query_terms(query)
+        if not terms or k <= 0:
+            return []
+        db = self._conn()
+        n, _ = self._stats(db)
+        if not n:
+            return []
+        scores: Dict[int, float] = {}
+        weights, partial = {}, {}
+        limit = settings.lexical_max_postings
+        for term, tid, df in db.execute(
+                f"SELECT term, id, df FROM terms WHERE term IN ({','.join('?' * len(terms))})", terms):
+            if df <= 0:
+                continue
+            # score = idf * tf * (k1 + 1) / (tf + norm), and impact is the last factor scaled to 255
+            weight = weights[term] = math.log(1 + (n - df + 0.5) / (df + 0.5)) * (_K1 + 1) / 255
+            # Bounded read: the term's highest-impact postings, in index order
+            rows = db.execute("SELECT impact, row FROM postings WHERE term_id = ? "
+                              "ORDER BY impact DESC, row DESC LIMIT ?", (tid, limit)).fetchall()
+            for impact, row in rows:
+                scores[row] = scores.get(row, 0.0) + impact * weight
+            if len(rows) < df:  # cut short (or pruned): other chunks may contain the term too
+                partial[term] = {row for _, row in rows}
+        if not scores:
+            return []
+
+        pool = heapq.nlargest(max(k * 10, 100) if partial else k, scores, key=scores.get)
+        found = {r[0]: r for r in db.execute(
+            f"SELECT rowid, chunk_id, doc_id, title, page, section, text, length, avgdl "
+            f"FROM chunk_meta WHERE rowid IN ({','.join('?' * len(pool))})", pool)}
+        # Fill in what the cut-short lists left out, from each candidate's own text
+        for row, (*_, text, length, avgdl) in found.items():
+            missing = [t for t, seen in partial.items() if row not in seen]
+            if missing:
+                folded = _fold(text or "")
+                tokens, compounds = _WORD.findall(folded), None
+                norm = _norm(length, avgdl)
+                for term in missing:
+                    if " " in term:
+                        compounds = list(_compounds(folded)) if compounds is None else compounds
+                        tf = compounds.count(term)
+                    else:
+                        tf = tokens.count(term)
+                    if tf:
+                        scores[row] += _impact(tf, norm) * weights[term]
+        best = heapq.nlargest(k, found, key=scores.get)
+        return [{"chunk_id": cid, "doc_id": doc_id, "title": title, "page": page, "section": section,
+                 "snippet": (text or "")[:600], "score": scores[row]}
+                for row, cid, doc_id, title, page, section, text, _, _ in (found[r] for r in best)]
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM chunk_meta").fetchone()[0]
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_lexical_index() -> LexicalIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = LexicalIndex(settings.lexical_index_path)
+    return _index
+
+def rrf(*rankings, k: int = None, limit: int = None) -> List[dict]:
+    """Reciprocal-rank fusion of ranked hit lists, keyed by ``chunk_id``; ``score`` becomes the fused score."""
+    k = settings.rrf_k if k is None else k
+    fused, hits = {}, {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking):
+            key = hit.get("chunk_id") or (hit["doc_id"], hit["page"], hit["snippet"][:80])
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank + 1)
+            hits.setdefault(key, hit)
+    order = sorted(fused, key=lambda key: -fused[key])[:limit]
+    return [{**hits[key], "score": fused[key]} for key in order]
+
+def rebuild(batch: int = 5000):
+    """Re-index every chunk currently in the ``text_chunks`` vector store."""
+    from .vectorstore import get_store
+    index = get_lexical_index()
+    records = get_store("text_chunks").get()
+    for i in range(0, len(records), batch):
+        index.add([(r["id"], r["document"] or "", r["metadata"]) for r in records[i:i + batch]])
+    print(f"🔤 Lexical index rebuilt: {index.count()} chunks")
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["rebuild"]:
+        rebuild()
+    else:
+        print("usage: python -m app.lexical rebuild")
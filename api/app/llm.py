@@ -0,0 +1,145 @@
+import asyncio, random, time
+from contextlib import asynccontextmanager
+from typing import Optional
+import httpx
+from .settings import settings
+
+RETRY_STATUS = {429, 503}
+
+class LLMClient:
+    """Application-scoped, keep-alive HTTP client for the OpenAI-compatible backend.
+
+    Caps concurrent in-flight requests with a semaphore and retries 429/503 with
+    jittered exponential backoff (honouring ``Retry-After``).
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sem = asyncio.Semaphore(settings.llm_max_concurrency)
+        self.stats = {"requests": 0, "in_flight": 0, "peak_in_flight": 0, "waiting": 0,
+                      "wait_s_total": 0.0, "wait_s_max": 0.0, "retries": 0, "errors": 0}
+
+    @staticmethod
+    def _build_client() -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=settings.openai_base_url,
+            timeout=httpx.Timeout(settings.llm_timeout, connect=10.0),
+            limits=httpx.Limits(max_connections=settings.llm_max_connections,
+                                max_keepalive_connections=settings.llm_max_connections,
+                                keepalive_expiry=60.0),
+            headers=_headers(),
+        )
+
+    async def start(self):
+        if self._client is None:
+            self._client = self._build_client()
+            print(f"🔌 LLM client pool ready ({settings.llm_max_connections} connections, "
+                  f"{settings.llm_max_concurrency} concurrent requests)")
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            # Outside the FastAPI lifespan (worker jobs, scripts): the same pool, created on first use
+            self._client = self._build_client()
+        return self._client
+
+    @asynccontextmanager
+    async def _slot(self):
+        self.stats["waiting"] += 1
+        t0 = time.monotonic()
+        try:
+            await self._sem.acquire()
+        finally:
+            self.stats["waiting"] -= 1
+        waited = time.monotonic() - t0
+        self.stats["wait_s_total"] += waited
+        self.stats["wait_s_max"] = max(self.stats["wait_s_max"], waited)
+        self.stats["requests"] += 1
+        self.stats["in_flight"] += 1
+        self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.stats["in_flight"])
+        try:
+            yield
+        finally:
+            self.stats["in_flight"] -= 1
+            self._sem.release()
+
+    async def _backoff(self, attempt: int, response: Optional[httpx.Response]):
+        self.stats["retries"] += 1
+        delay = random.uniform(0, min(settings.llm_retry_max_delay, settings.llm_retry_base_delay * 2 ** attempt))
+        if response is not None:
+            try:
+                delay = max(delay, float(response.headers.get("retry-after", 0)))
+            except ValueError:
+                pass
+        await asyncio.sleep(min(delay, settings.llm_retry_max_delay))
+
+    async def post_json(self, path: str, payload: dict) -> dict:
+        """POST and return the decoded JSON body, retrying 429/503 up to ``llm_max_retries`` times."""
+        async with self._slot():
+            for attempt in range(settings.llm_max_retries + 1):
+                try:
+                    r = await self.client.post(path, json=payload)
+                except httpx.TransportError:
+                    self.stats["errors"] += 1
+                    raise
+                if r.status_code in RETRY_STATUS and attempt < settings.llm_max_retries:
+                    await self._backoff(attempt, r)
+                    continue
+                if r.is_error:
+                    self.stats["errors"] += 1
+                r.raise_for_status()
+                return r.json()
+
+    @asynccontextmanager
+    async def stream(self, path: str, payload: dict):
+        """Open a streaming POST; 429/503 are retried before any body has been consumed."""
+        async with self._slot():
+            for attempt in range(settings.llm_max_retries + 1):
+                try:
+                    async with self.client.stream("POST", path, json=payload) as r:
+                        if r.status_code in RETRY_STATUS and attempt < settings.llm_max_retries:
+                            await r.aread()
+                            await self._backoff(attempt, r)
+                            continue
+                        if r.is_error:
+                            self.stats["errors"] += 1
+                            await r.aread()
+                        r.raise_for_status()
+                        yield r
+                        return
+                except httpx.TransportError:  # connect failures and connections dropped mid-stream
+                    self.stats["errors"] += 1
+                    raise
+
+    def snapshot(self) -> dict:
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        idle = sum(1 for c in connections if getattr(c, "is_idle", lambda: False)())
+        return {
+            **self.stats,
+            "wait_s_avg": round(self.stats["wait_s_total"] / self.stats["requests"], 4) if self.stats["requests"] else 0.0,
+            "max_concurrency": settings.llm_max_concurrency,
+            "max_connections": settings.llm_max_connections,
+            "pool_connections": len(connections),
+            "pool_idle": idle,
+            "pool_utilization": round((len(connections) - idle) / settings.llm_max_connections, 4),
+        }
+
+def _headers():
+    headers = {"Content-Type": "application/json"}
+    if settings.openai_api_key:
+        headers["Authorization"] = f"Bearer {settings.openai_api_key}"
+    return headers
+
+_llm_client = None
+
+def get_llm_client() -> LLMClient:
+    global _llm_client
+    if _llm_client is None:
+        _llm_client = LLMClient()
+    return _llm_client
@@ -0,0 +1,64 @@
+"""Per-title ingest manifests for incremental, idempotent re-ingest.
+
+A document's identity is its title: ``doc_id_for(title)`` is stable across revisions,
+and Redis keeps one manifest per title with the hash of the last ingested file and,
+per page, a content hash plus the chunk and image ids that page produced::
+
+    {"doc_id", "title", "file_sha", "pages": {"1": {"hash", "chunks", "images", "section"}}, "updated"}
+
+Uploading the same file again is answered from the manifest without queuing work;
+for a revision the worker re-processes only pages whose hash changed and deletes the
+ids the old versions of those pages (and any removed pages) left behind.
+"""
+import hashlib, json, time
+from typing import Dict, List, Optional
+from .settings import settings
+
+def _key(title: str) -> str:
+    return f"medran:manifest:{hashlib.sha256(title.encode('utf-8')).hexdigest()[:32]}"
+
+def doc_id_for(title: str) -> str:
+    """Stable document id for a title, so revisions replace rather than duplicate it."""
+    return hashlib.sha256(f"doc\x00{title}".encode("utf-8")).hexdigest()[:16]
+
+def get_manifest(title: str) -> Optional[dict]:
+    from .jobs import _get_redis
+    raw = _get_redis().get(_key(title))
+    return json.loads(raw) if raw else None
+
+def save_manifest(manifest: dict):
+    from .jobs import _get_redis
+    manifest["updated"] = time.time()
+    _get_redis().set(_key(manifest["title"]), json.dumps(manifest))
+
+def manifest_lock(title: str):
+    """Serialise ingests of the same title (a revision uploaded while the previous one runs)."""
+    from .jobs import _get_redis
+    return _get_redis().lock(f"{_key(title)}:lock", timeout=settings.ingest_job_timeout,
+                             blocking_timeout=settings.ingest_job_timeout)
+
+def page_hashes(doc) -> List[str]:
+    """Content hash per page from the page's content streams and embedded image streams.
+
+    Much cheaper than parsing: nothing is rendered, OCR'd or decoded.
+    """
+    hashes = []
+    for pno in range(doc.page_count):
+        page = doc.load_page(pno)
+        h = hashlib.sha256()
+        h.update(repr(tuple(page.rect)).encode())
+        h.update(page.read_contents() or b"")
+        for img in page.get_images(full=True):
+            try:
+                h.update(doc.xref_stream_raw(img[0]) or b"")
+            except Exception:
+                h.update(str(img).encode())
+        hashes.append(h.hexdigest()[:32])
+    return hashes
+
+def diff(manifest: Optional[dict], hashes: List[str]) -> Dict[str, list]:
+    """1-based page numbers that changed (or are new) and that disappeared since ``manifest``."""
+    old = (manifest or {}).get("pages", {})
+    changed = [p for p, h in enumerate(hashes, start=1) if old.get(str(p), {}).get("hash") != h]
+    removed = [int(p) for p in old if int(p) > len(hashes)]
+    return {"changed": changed, "removed": sorted(removed)}
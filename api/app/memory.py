@@ -1,44 +1,299 @@
-import chromadb, time
-from sentence_transformers import SentenceTransformer
+import asyncio, json, os, threading, time, uuid
 from .settings import settings
-
-_client = None
-_mem_embed = None
-
-def _get_client():
-    global _client
-    if _client is None:
-        _host = settings.chroma_url.split("//")[1].split(":")[0]
-        _port = int(settings.chroma_url.split(":")[-1])
-        _client = chromadb.HttpClient(host=_host, port=_port)
-    return _client
+from .models import get_registry
+from .embed_cache import encode_cached
+from .vectorstore import VectorStore, get_store, list_stores
 
 def _get_embed_model():
-    global _mem_embed
-    if _mem_embed is None:
-        _mem_embed = SentenceTransformer(settings.embedding_model)
-    return _mem_embed
+    # Same shared instance (and device) as rag's text embedder
+    return get_registry().get("text")
 
 def _mem_col(user_id: str):
-    return _get_client().get_or_create_collection(f"mem_{user_id}")
+    # get_store caches the handle, so the collection lookup happens once per user
+    return get_store(f"mem_{user_id}")
 
-def remember(user_id: str, role: str, text: str):
-    col = _mem_col(user_id)
+def _turn(user_id: str, role: str, text: str) -> dict:
     ts = time.time()
-    doc = f"[{role} @ {ts:.0f}] {text}"
-    emb = _get_embed_model().encode([doc], normalize_embeddings=True).tolist()[0]
-    col.upsert(
-        ids=[f"{user_id}:{ts:.0f}"],
-        embeddings=[emb],
-        documents=[doc],
-        metadatas=[{"user_id": user_id, "role": role, "ts": ts}],
-    )
+    return {
+        # time_ns + random suffix: turns written in the same second no longer overwrite each other
+        "id": f"{user_id}:{time.time_ns()}:{uuid.uuid4().hex[:8]}",
+        "user_id": user_id,
+        "role": role,
+        "ts": ts,
+        "doc": f"[{role} @ {ts:.0f}] {text}",
+    }
+
+def _write_turns(turns: list):
+    """One encode for every buffered turn, then one upsert per user collection."""
+    embs = encode_cached(_get_embed_model(), settings.embedding_model, [t["doc"] for t in turns],
+                         batch_size=settings.embed_batch_size)
+    by_user = {}
+    for t, emb in zip(turns, embs):
+        by_user.setdefault(t["user_id"], []).append((t, emb))
+    for user_id, items in by_user.items():
+        _mem_col(user_id).upsert(
+            ids=[t["id"] for t, _ in items],
+            embeddings=[e for _, e in items],
+            documents=[t["doc"] for t, _ in items],
+            metadatas=[{"user_id": t["user_id"], "role": t["role"], "ts": t["ts"], "kind": "turn"} for t, _ in items],
+        )
+
+class MemoryWriter:
+    """Write-behind buffer for conversation turns.
+
+    ``remember`` only appends to the buffer; a background task flushes it when
+    ``memory_batch_size`` turns are pending or every ``memory_flush_interval`` seconds,
+    batching turns from all users. Failed flushes put turns back in the buffer, and
+    whatever cannot be written at shutdown is spilled to ``memory_spool_path`` and
+    replayed on the next start.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = None
+        self._loop = None
+        self._task = None
+        self._since_compaction = {}
+        self.stats = {"buffered": 0, "written": 0, "flushes": 0, "failures": 0, "spilled": 0, "restored": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def add(self, turn: dict):
+        with self._lock:
+            self._buffer.append(turn)
+            self.stats["buffered"] += 1
+            full = len(self._buffer) >= settings.memory_batch_size
+        if full and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def flush(self) -> int:
+        """Write everything buffered so far (blocking). Returns the number of turns written."""
+        with self._flush_lock:
+            with self._lock:
+                turns, self._buffer = self._buffer, []
+            if not turns:
+                return 0
+            try:
+                _write_turns(turns)
+            except Exception:
+                self.stats["failures"] += 1
+                with self._lock:
+                    # Keep order and cap growth while the vector store is unavailable
+                    self._buffer = (turns + self._buffer)[-settings.memory_max_buffer:]
+                raise
+            self.stats["written"] += len(turns)
+            self.stats["flushes"] += 1
+            self._maybe_schedule_compaction(turns)
+            return len(turns)
+
+    def _maybe_schedule_compaction(self, turns: list):
+        for t in turns:
+            self._since_compaction[t["user_id"]] = self._since_compaction.get(t["user_id"], 0) + 1
+        due = [u for u, c in self._since_compaction.items() if c >= settings.memory_compact_every]
+        for user_id in due:
+            try:
+                from .jobs import enqueue_compaction
+                enqueue_compaction(user_id)
+                self._since_compaction[user_id] = 0
+            except Exception as e:
+                print(f"⚠️ Warning: could not schedule memory compaction for {user_id}: {str(e)}")
+
+    async def _run(self):
+        from .executors import run_in
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.memory_flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await run_in("embed", self.flush)
+            except Exception as e:
+                print(f"⚠️ Warning: memory flush failed, will retry: {str(e)}")
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._restore()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await asyncio.to_thread(self.flush)
+        except Exception as e:
+            print(f"⚠️ Warning: final memory flush failed: {str(e)}")
+        self._spill()
+
+    def _spill(self):
+        with self._lock:
+            turns, self._buffer = self._buffer, []
+        if not turns:
+            return
+        os.makedirs(os.path.dirname(settings.memory_spool_path) or ".", exist_ok=True)
+        with open(settings.memory_spool_path, "a") as f:
+            for t in turns:
+                f.write(json.dumps(t) + "\n")
+        self.stats["spilled"] += len(turns)
+        print(f"💾 Spilled {len(turns)} unwritten memory turns to {settings.memory_spool_path}")
+
+    def _restore(self):
+        path = settings.memory_spool_path
+        if not os.path.exists(path):
+            return
+        claimed = f"{path}.{os.getpid()}"
+        try:
+            os.replace(path, claimed)  # claim it so concurrent workers don't replay it twice
+        except OSError:
+            return
+        with open(claimed) as f:
+            turns = [json.loads(line) for line in f if line.strip()]
+        with self._lock:
+            self._buffer = turns + self._buffer
+        os.remove(claimed)
+        self.stats["restored"] += len(turns)
+        print(f"♻️ Restored {len(turns)} memory turns from spool")
+
+    def snapshot(self) -> dict:
+        return {"pending": len(self._buffer), "running": self.running, **self.stats}
 
-def recall(user_id: str, query: str, n: int = 6):
+_writer = None
+
+def get_memory_writer() -> MemoryWriter:
+    global _writer
+    if _writer is None:
+        _writer = MemoryWriter()
+    return _writer
+
+def remember(user_id: str, role: str, text: str):
+    """Queue a turn for the write-behind buffer (written synchronously if no writer is running)."""
+    turn = _turn(user_id, role, text)
+    writer = get_memory_writer()
+    if writer.running:
+        writer.add(turn)
+    else:
+        _write_turns([turn])
+
+def recall(user_id: str, query: str, n: int = 6, qvec=None):
+    """Top-``n`` memory entries for ``query``; pass ``qvec`` to reuse an existing query vector.
+
+    Candidates are re-ranked so recent turns and compacted summaries win ties
+    against old raw turns (see ``memory_recency_*`` / ``memory_summary_weight``).
+    """
     col = _mem_col(user_id)
-    q = _get_embed_model().encode([query], normalize_embeddings=True).tolist()
+    q = [qvec] if qvec is not None else encode_cached(_get_embed_model(), settings.embedding_model, [query])
     try:
-        res = col.query(query_embeddings=q, n_results=n)
+        results = col.query(q[0], n * settings.memory_recall_oversample)
     except Exception:
         return []
-    return res.get("documents", [[]])[0] or []
+    now = time.time()
+    scored = []
+    for r in results:
+        doc, meta, dist = r["document"], r["metadata"], r["distance"]
+        age_days = max(now - float(meta.get("ts", now)), 0.0) / 86400
+        score = VectorStore.similarity(dist)
+        score += settings.memory_recency_weight * 0.5 ** (age_days / settings.memory_recency_half_life_days)
+        if meta.get("kind") == "summary":
+            score += settings.memory_summary_weight
+        scored.append((score, doc))
+    scored.sort(key=lambda x: -x[0])
+    return [doc for _, doc in scored[:n]]
+
+# --- compaction & retention ----------------------------------------------
+
+def _period(ts: float) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(ts))
+
+async def _summarize(docs: list, label: str) -> str:
+    from .rag import call_llm
+    return await call_llm(
+        f"Condense this conversation history ({label}) into a short memory note: key facts about the user, "
+        "clinical questions asked, answers given and any decisions. Keep names, drugs, doses and dates.",
+        docs,
+    )
+
+def _upsert_summaries(col, user_id: str, summaries: list):
+    embs = encode_cached(_get_embed_model(), settings.embedding_model, [s["doc"] for s in summaries])
+    col.upsert(
+        [s["id"] for s in summaries],
+        embs,
+        documents=[s["doc"] for s in summaries],
+        metadatas=[{"user_id": user_id, "role": "summary", "kind": "summary", "ts": s["ts"],
+                    "period": s["period"], "turns": s["turns"]} for s in summaries],
+    )
+
+async def compact_user(user_id: str) -> dict:
+    """Roll old raw turns of one user into per-day summary entries and enforce caps/TTLs.
+
+    Raw turns older than ``memory_raw_ttl_days``, or beyond the newest
+    ``memory_keep_recent_turns`` once there are more than ``memory_max_raw_turns``, are
+    summarized with ``call_llm`` (one entry per day) and deleted. If summaries exceed
+    ``memory_max_summaries`` the oldest half is merged into a single entry.
+    """
+    col = await asyncio.to_thread(_mem_col, user_id)
+    got = await asyncio.to_thread(col.get)
+    entries = [{"id": r["id"], "doc": r["document"], "meta": r["metadata"]} for r in got]
+    raw = sorted([e for e in entries if e["meta"].get("kind") != "summary"], key=lambda e: e["meta"].get("ts", 0))
+    summaries = sorted([e for e in entries if e["meta"].get("kind") == "summary"], key=lambda e: e["meta"].get("ts", 0))
+
+    cutoff = time.time() - settings.memory_raw_ttl_days * 86400
+    roll = {e["id"]: e for e in raw if e["meta"].get("ts", 0) < cutoff}
+    if len(raw) > settings.memory_max_raw_turns:
+        for e in raw[:len(raw) - settings.memory_keep_recent_turns]:
+            roll[e["id"]] = e
+    rolled = sorted(roll.values(), key=lambda e: e["meta"].get("ts", 0))
+
+    created = []
+    by_day = {}
+    for e in rolled:
+        by_day.setdefault(_period(e["meta"].get("ts", 0)), []).append(e)
+    for day, items in by_day.items():
+        note = await _summarize([e["doc"] for e in items], day)
+        created.append({
+            "id": f"{user_id}:summary:{day}:{uuid.uuid4().hex[:8]}",
+            "doc": f"[summary {day}, {len(items)} turns] {note}",
+            "ts": float(items[-1]["meta"].get("ts", 0)),
+            "period": day,
+            "turns": len(items),
+        })
+
+    merged = []
+    if len(summaries) + len(created) > settings.memory_max_summaries and len(summaries) > 1:
+        merged = summaries[:max(len(summaries) // 2, 2)]
+        first, last = merged[0]["meta"].get("period", "?"), merged[-1]["meta"].get("period", "?")
+        label = f"{first}..{last}"
+        note = await _summarize([e["doc"] for e in merged], label)
+        created.append({
+            "id": f"{user_id}:summary:{label}:{uuid.uuid4().hex[:8]}",
+            "doc": f"[summary {label}] {note}",
+            "ts": float(merged[-1]["meta"].get("ts", 0)),
+            "period": label,
+            "turns": sum(int(e["meta"].get("turns", 0)) for e in merged),
+        })
+
+    # Write summaries before deleting what they replace, so a crash never loses history
+    if created:
+        await asyncio.to_thread(_upsert_summaries, col, user_id, created)
+    stale = [e["id"] for e in rolled] + [e["id"] for e in merged]
+    if stale:
+        await asyncio.to_thread(col.delete, ids=stale)
+
+    report = {"user_id": user_id, "raw_before": len(raw), "rolled_up": len(rolled),
+              "summaries_created": len(created), "summaries_merged": len(merged),
+              "size_after": len(entries) - len(stale) + len(created)}
+    print(f"🗜️ Compacted memory for {user_id}: {report}")
+    return report
+
+def memory_users() -> list:
+    """User ids that have a memory collection."""
+    return [n[len("mem_"):] for n in list_stores("mem_")]
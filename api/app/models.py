@@ -0,0 +1,243 @@
+import gc, os, threading, time, logging
+from typing import Any, Callable, Dict, Optional
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+_device = None
+
+def get_device() -> str:
+    """Detect the best available torch device once per process (cuda > mps > cpu)."""
+    global _device
+    if _device is not None:
+        return _device
+    import torch
+    # Check for CUDA
+    if torch.cuda.is_available() and torch.cuda.device_count() > 0:
+        _device = "cuda"
+        print(f"🚀 GPU detected: {torch.cuda.get_device_name(0)}")
+
+    # Check for Apple Silicon MPS (Metal Performance Shaders)
+    elif hasattr(torch.backends, 'mps') and torch.backends.mps.is_available():
+        _device = "mps"
+        print(f"🍎 Apple Metal GPU detected, using MPS acceleration")
+
+    else:
+        # Optimize CPU inference
+        cpu_threads = os.cpu_count()
+        if cpu_threads:
+            torch.set_num_threads(min(cpu_threads, 8))  # Limit to 8 threads max
+            print(f"💻 Using CPU with {min(cpu_threads, 8)} threads optimized")
+        _device = "cpu"
+    return _device
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return 0
+
+def _torch_bytes(module) -> int:
+    try:
+        tensors = list(module.parameters()) + list(module.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    except Exception:
+        return 0
+
+def _apply_precision(module, device: str):
+    """fp16 on CUDA; on CPU honour settings.torch_cpu_precision (fp32 | fp16 | int8)."""
+    import torch
+    if device == "cuda":
+        return module.half()
+    if device == "cpu" and settings.torch_cpu_precision == "int8":
+        return torch.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+    if device == "cpu" and settings.torch_cpu_precision == "fp16":
+        return module.half()
+    return module
+
+# --- loaders -------------------------------------------------------------
+
+def _load_text():
+    from sentence_transformers import SentenceTransformer
+    device = get_device()
+    model = SentenceTransformer(settings.embedding_model, device=device)
+    return _apply_precision(model, device), device
+
+def _load_image():
+    from sentence_transformers import SentenceTransformer
+    device = get_device()
+    model = SentenceTransformer(settings.image_embedding_model, device=device)
+    return _apply_precision(model, device), device
+
+def _load_ocr():
+    import torch
+    from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+    processor = TrOCRProcessor.from_pretrained(settings.ocr_model)
+    model = VisionEncoderDecoderModel.from_pretrained(settings.ocr_model)
+    # TrOCR generate() is only reliable on CUDA/CPU
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = _apply_precision(model.to(device), device).eval()
+    return (model, processor), device
+
+def _load_asr():
+    import torch
+    from faster_whisper import WhisperModel
+    if torch.cuda.is_available():
+        device, compute_type = "cuda", "float16"
+    else:
+        device, compute_type = "cpu", "int8"
+    # num_workers lets asr_workers threads transcribe concurrently on the one set of weights
+    model = WhisperModel(settings.asr_model, device=device, compute_type=compute_type,
+                         num_workers=max(settings.asr_workers, 1), cpu_threads=settings.asr_cpu_threads)
+    return model, device
+
+LOADERS: Dict[str, Callable[[], Any]] = {
+    "text": _load_text,
+    "image": _load_image,
+    "ocr": _load_ocr,
+    "asr": _load_asr,
+}
+
+# --- warmups: one tiny inference so kernels, allocators and lazy weights are initialized
+
+def _warm_embedder(model):
+    model.encode(["warmup query about hypertension treatment"], normalize_embeddings=True)
+
+def _warm_ocr(model):
+    import torch
+    from PIL import Image
+    ocr_model, processor = model
+    param = next(ocr_model.parameters())
+    pixel_values = processor(images=[Image.new("RGB", (384, 32), "white")], return_tensors="pt").pixel_values
+    with torch.no_grad():
+        ocr_model.generate(pixel_values.to(param.device, dtype=param.dtype), max_new_tokens=4)
+
+def _warm_asr(model):
+    import numpy as np
+    segments, _ = model.transcribe(np.zeros(16000, dtype=np.float32))
+    list(segments)
+
+WARMUPS: Dict[str, Callable[[Any], None]] = {
+    "text": _warm_embedder,
+    "image": _warm_embedder,
+    "ocr": _warm_ocr,
+    "asr": _warm_asr,
+}
+
+class ModelRegistry:
+    """Process-wide owner of every model (text embedder, CLIP, TrOCR, Whisper).
+
+    Each model is loaded once on first ``get`` and shared by all callers. The registry
+    records device, load time and resident memory per model, and ``unload_idle`` drops
+    models that have not been used for ``settings.idle_model_ttl`` seconds.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._locks = {name: threading.Lock() for name in LOADERS}
+        self.pinned = set()  # preloaded models are never unloaded as idle
+        self.warmed = set()  # preloads that finished, warmup included; what /readyz reports
+        self.preload_errors: Dict[str, str] = {}
+
+    def get(self, name: str):
+        entry = self._entries.get(name)
+        if entry is None:
+            with self._locks[name]:
+                entry = self._entries.get(name)
+                if entry is None:
+                    entry = self._load(name)
+        entry["last_used"] = time.time()
+        return entry["model"]
+
+    def _load(self, name: str) -> Dict[str, Any]:
+        rss0, t0 = _rss_bytes(), time.perf_counter()
+        model, device = LOADERS[name]()
+        load_s = time.perf_counter() - t0
+        module = model[0] if isinstance(model, tuple) else model
+        entry = {
+            "model": model,
+            "device": device,
+            "loaded_at": time.time(),
+            "load_s": round(load_s, 2),
+            "last_used": time.time(),
+            "param_bytes": _torch_bytes(module),
+            "rss_delta_bytes": max(_rss_bytes() - rss0, 0),
+        }
+        self._entries[name] = entry
+        print(f"✅ Loaded {name} model on {device} in {load_s:.1f}s")
+        return entry
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._entries
+
+    def preload(self, names, warmup: bool = True):
+        """Load (and warm up) ``names`` now instead of on first request; pins them in memory."""
+        for name in names:
+            try:
+                model = self.get(name)
+                self.pinned.add(name)
+                if warmup:
+                    t0 = time.perf_counter()
+                    WARMUPS[name](model)
+                    self._entries[name]["warmup_s"] = round(time.perf_counter() - t0, 2)
+                    print(f"🔥 Warmed up {name} model in {self._entries[name]['warmup_s']:.1f}s")
+                self.warmed.add(name)
+                self.preload_errors.pop(name, None)
+            except Exception as e:
+                self.preload_errors[name] = str(e)
+                print(f"❌ Failed to preload {name} model: {str(e)}")
+
+    def unload(self, name: str) -> bool:
+        with self._locks[name]:
+            entry = self._entries.pop(name, None)
+            self.warmed.discard(name)
+        if entry is None:
+            return False
+        del entry
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except Exception:
+            pass
+        print(f"♻️ Unloaded idle {name} model")
+        return True
+
+    def unload_idle(self, ttl: Optional[float] = None) -> list:
+        ttl = settings.idle_model_ttl if ttl is None else ttl
+        if not ttl or ttl <= 0:
+            return []
+        now = time.time()
+        idle = [n for n, e in list(self._entries.items())
+                if n not in self.pinned and now - e["last_used"] > ttl]
+        return [n for n in idle if self.unload(n)]
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        return {
+            "rss_bytes": _rss_bytes(),
+            "idle_ttl": settings.idle_model_ttl,
+            "models": {
+                name: {
+                    "device": e["device"],
+                    "load_s": e["load_s"],
+                    "warmup_s": e.get("warmup_s"),
+                    "pinned": name in self.pinned,
+                    "warmed": name in self.warmed,
+                    "idle_s": round(now - e["last_used"], 1),
+                    "param_bytes": e["param_bytes"],
+                    "rss_delta_bytes": e["rss_delta_bytes"],
+                }
+                for name, e in self._entries.items()
+            },
+        }
+
+_registry = None
+
+def get_registry() -> ModelRegistry:
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry()
+    return _registry
@@ -1,44 +1,117 @@
 import io, logging
 from typing import List, Dict, Any, Optional
+import numpy as np
 from PIL import Image
-import torch
-from transformers import TrOCRProcessor, VisionEncoderDecoderModel
 from .settings import settings
+from .models import get_registry
 
 logger = logging.getLogger(__name__)
 
-# Global variables for lazy loading
-_ocr_model = None
-_ocr_processor = None
+_ocr_load_failed = False
 
 def _get_ocr_model():
-    """Initialize and return the TrOCR model for lightweight OCR"""
-    global _ocr_model, _ocr_processor
-    if _ocr_model is None or _ocr_processor is None:
-        try:
-            # Use TrOCR for lightweight OCR instead of heavy dots.ocr
-            model_name = "microsoft/trocr-base-printed"  # Lightweight printed text OCR
-            logger.info(f"Loading lightweight OCR model: {model_name}")
-            _ocr_processor = TrOCRProcessor.from_pretrained(model_name)
-            _ocr_model = VisionEncoderDecoderModel.from_pretrained(model_name)
-            
-            # Move to appropriate device
-            if torch.cuda.is_available():
-                _ocr_model = _ocr_model.to("cuda")
-                _ocr_model = _ocr_model.half()  # Use FP16 for faster inference
-            
-            logger.info("Lightweight OCR model loaded successfully")
-        except Exception as e:
-            logger.error(f"Failed to load OCR model: {e}")
-            # Fallback: return None to indicate OCR is not available
-            _ocr_model = None
-            _ocr_processor = None
-            return None, None
-    return _ocr_model, _ocr_processor
+    """Return the shared TrOCR (model, processor) for lightweight OCR, or (None, None)"""
+    global _ocr_load_failed
+    if _ocr_load_failed:
+        return None, None
+    try:
+        return get_registry().get("ocr")
+    except Exception as e:
+        logger.error(f"Failed to load OCR model: {e}")
+        # Fallback: OCR is not available (don't retry every page)
+        _ocr_load_failed = True
+        return None, None
+
+def classify_page(page_rect, text_blocks: List[Dict[str, Any]]) -> str:
+    """
+    Decide whether a page needs OCR from its text layer alone
+    
+    Args:
+        page_rect: (x0, y0, x1, y1) of the page
+        text_blocks: Text blocks extracted by PyMuPDF
+        
+    Returns:
+        "image_only" (no text layer), "low_text" (sparse text layer) or "text"
+    """
+    if not text_blocks:
+        return "image_only"
+    x0, y0, x1, y1 = page_rect
+    page_area = max((x1 - x0) * (y1 - y0), 1.0)
+    covered = sum(max(b["bbox"][2] - b["bbox"][0], 0) * max(b["bbox"][3] - b["bbox"][1], 0) for b in text_blocks)
+    chars = sum(len(b["text"]) for b in text_blocks)
+    if covered / page_area < settings.ocr_min_text_coverage or chars < settings.ocr_min_text_chars:
+        return "low_text"
+    return "text"
+
+def segment_lines(image: Image.Image) -> List[Image.Image]:
+    """
+    Split a rendered page into text line/region crops for TrOCR (a line-level model)
+    
+    Uses horizontal ink projection to find line bands, then splits each band at wide
+    horizontal gaps so multi-column layouts become separate regions.
+    """
+    gray = np.asarray(image.convert("L"))
+    ink = gray < 160
+    h, w = ink.shape
+    rows = ink.sum(axis=1) > max(2, w // 400)
+
+    crops, y = [], 0
+    while y < h:
+        if not rows[y]:
+            y += 1
+            continue
+        y0 = y
+        while y < h and rows[y]:
+            y += 1
+        if y - y0 < 6:  # specks / rules, not text
+            continue
+        band = ink[y0:y]
+        cols = band.any(axis=0)
+        gap = max(w // 25, 20)
+        x, runs = 0, []
+        while x < w:
+            if not cols[x]:
+                x += 1
+                continue
+            x0 = x
+            last = x
+            while x < w and (cols[x] or x - last < gap):
+                if cols[x]:
+                    last = x
+                x += 1
+            runs.append((x0, last + 1))
+        pad = 4
+        for x0, x1 in runs:
+            if x1 - x0 < 8:
+                continue
+            crops.append(image.crop((max(x0 - pad, 0), max(y0 - pad, 0), min(x1 + pad, w), min(y + pad, h))))
+    return crops
+
+def ocr_crops(crops: List[Image.Image], batch_size: Optional[int] = None) -> List[str]:
+    """
+    Run TrOCR over many crops, ``batch_size`` crops per ``generate`` call
+    
+    Returns one (possibly empty) string per crop, in order.
+    """
+    import torch
+    model, processor = _get_ocr_model()
+    if model is None or processor is None or not crops:
+        return ["" for _ in crops]
+    batch_size = batch_size or settings.ocr_batch_size
+    param = next(model.parameters())
+    texts = []
+    for i in range(0, len(crops), batch_size):
+        batch = [c if c.mode == "RGB" else c.convert("RGB") for c in crops[i:i + batch_size]]
+        pixel_values = processor(images=batch, return_tensors="pt").pixel_values
+        pixel_values = pixel_values.to(param.device, dtype=param.dtype)
+        with torch.no_grad():
+            generated_ids = model.generate(pixel_values, max_new_tokens=settings.ocr_max_line_tokens)
+        texts.extend(t.strip() for t in processor.batch_decode(generated_ids, skip_special_tokens=True))
+    return texts
 
 def extract_text_from_image(image_bytes: bytes) -> Optional[str]:
     """
-    Extract text from an image using TrOCR model
+    Extract text from a page image using batched, line-level TrOCR
     
     Args:
         image_bytes: Raw image bytes
@@ -47,7 +120,6 @@ def extract_text_from_image(image_bytes: bytes) -> Optional[str]:
         Extracted text content or None if extraction fails
     """
     try:
-        # Get model and processor
         model, processor = _get_ocr_model()
         if model is None or processor is None:
             logger.warning("OCR model not available, skipping OCR extraction")
@@ -58,21 +130,13 @@ def extract_text_from_image(image_bytes: bytes) -> Optional[str]:
         if image.mode != 'RGB':
             image = image.convert('RGB')
         
-        # Process the image with TrOCR (no text prompt needed)
-        pixel_values = processor(image, return_tensors="pt").pixel_values
-        
-        # Move inputs to the same device as model
-        device = next(model.parameters()).device
-        pixel_values = pixel_values.to(device)
-        
-        # Generate text with TrOCR
-        with torch.no_grad():
-            generated_ids = model.generate(pixel_values, max_new_tokens=512)
-        
-        # Decode the generated text
-        generated_text = processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
+        crops = segment_lines(image)
+        if not crops:
+            return None
+        lines = [t for t in ocr_crops(crops) if t]
+        generated_text = "\n".join(lines)
         
-        logger.info(f"Successfully extracted {len(generated_text)} characters via TrOCR")
+        logger.info(f"Successfully extracted {len(generated_text)} characters via TrOCR ({len(crops)} crops)")
         return generated_text.strip() if generated_text else None
         
     except Exception as e:
@@ -136,34 +200,32 @@ def enhance_pdf_text_blocks(text_blocks: List[Dict[str, Any]], page_image_bytes:
         if ocr_result.get("text") and ocr_result["structure_type"] != "error":
             ocr_text = ocr_result["text"]
     
-    # Process each text block
-    for block in text_blocks:
-        enhanced_block = block.copy()
-        
-        # If OCR text is available and significantly longer than extracted text, use OCR
-        original_text = block.get("text", "")
-        if ocr_text and len(ocr_text) > len(original_text) * 1.2:  # OCR text is 20% longer
-            enhanced_block["text"] = ocr_text
-            enhanced_block["enhanced_with_ocr"] = True
-            enhanced_block["original_text"] = original_text
-            logger.info("Enhanced text block with comprehensive OCR parsing")
-            
-            # Use OCR text for all blocks on this page (since it's comprehensive)
-            break
-        else:
-            enhanced_block["enhanced_with_ocr"] = False
-        
-        enhanced_blocks.append(enhanced_block)
-    
-    # If we used comprehensive OCR, replace all blocks with a single comprehensive block
-    if ocr_text and any(block.get("enhanced_with_ocr") for block in enhanced_blocks):
+    # Scanned page without any text layer: OCR is the only source of text
+    if ocr_text and not text_blocks:
         return [{
             "bbox": [0, 0, 1, 1],  # Full page bbox
             "text": ocr_text,
             "enhanced_with_ocr": True,
-            "extraction_method": "dots_ocr_comprehensive"
+            "extraction_method": "trocr_lines"
         }]
     
+    # OCR reads the whole page, so weigh it against the whole text layer, not block by block
+    original_text = "\n".join(block.get("text", "") for block in text_blocks)
+    if ocr_text and len(ocr_text) > len(original_text) * 1.2:  # OCR text is 20% longer
+        logger.info("Replaced sparse text layer with comprehensive OCR parsing")
+        return [{
+            "bbox": [0, 0, 1, 1],  # Full page bbox
+            "text": ocr_text,
+            "enhanced_with_ocr": True,
+            "original_text": original_text,
+            "extraction_method": "trocr_lines"
+        }]
+
+    # Otherwise the text layer wins: keep every original block
+    for block in text_blocks:
+        enhanced_block = block.copy()
+        enhanced_block["enhanced_with_ocr"] = False
+        enhanced_blocks.append(enhanced_block)
     return enhanced_blocks
 
 def is_ocr_available() -> bool:
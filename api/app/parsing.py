@@ -1,82 +1,185 @@
-import fitz, hashlib, io, logging
-from minio import Minio
+import fitz, logging, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional, Union
 from .settings import settings
-from .ocr import enhance_pdf_text_blocks, is_ocr_available
+from .ocr import enhance_pdf_text_blocks, is_ocr_available, classify_page
+from .storage import get_object_store, wait_uploads
+from .images import ImageFilter
 
 logger = logging.getLogger(__name__)
 
-def _minio():
-    host = settings.minio_endpoint.replace("http://","").replace("https://","")
-    return Minio(host,
-                 access_key=settings.minio_access_key,
-                 secret_key=settings.minio_secret_key,
-                 secure=settings.minio_endpoint.startswith("https"))
-
-def _ensure_bucket(m, bucket):
-    if not m.bucket_exists(bucket):
-        m.make_bucket(bucket)
-
-def _put(m, bucket, key, data: bytes, content_type: str):
-    _ensure_bucket(m, bucket)
-    m.put_object(bucket, key, io.BytesIO(data), len(data), content_type=content_type)
-    return f"{settings.minio_endpoint}/{bucket}/{key}"
-
-def parse_pdf_to_sections(pdf_bytes: bytes, doc_name: str, doc_id: str):
-    m = _minio()
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    pages, images = [], []
+def _text_blocks(page) -> List[dict]:
+    """Text blocks with the font cues the chunker uses to spot headings: dominant span size and all-bold."""
+    text_blocks = []
+    for b in page.get_text("dict")["blocks"]:
+        if b.get("type") != 0:  # image block
+            continue
+        lines, sizes, bold = [], {}, True
+        for line in b["lines"]:
+            lines.append("".join(span["text"] for span in line["spans"]))
+            for span in line["spans"]:
+                if span["text"].strip():
+                    size = round(span["size"], 1)
+                    sizes[size] = sizes.get(size, 0) + len(span["text"])
+                    bold = bold and bool(span["flags"] & 16)
+        text = "\n".join(lines).strip()
+        if text:
+            text_blocks.append({"bbox": tuple(b["bbox"]), "text": text,
+                                "size": max(sizes, key=sizes.get) if sizes else None, "bold": bold and bool(sizes)})
+    return text_blocks
+
+def _parse_page(doc, pno: int, doc_id: str, ocr_available: bool, image_filter: ImageFilter):
+    """Extract text blocks (OCR for scanned/low-text pages) and images of one page.
+
+    Images go through ``image_filter`` (size, duplicate and per-document cap). The
+    survivors keep their stored PNG bytes; ``_queue_upload`` sends them to the object store.
+    """
+    page = doc.load_page(pno)
+    text_blocks = _text_blocks(page)
     
-    # Check if OCR is available for enhanced text extraction
-    ocr_available = is_ocr_available()
-    if ocr_available:
-        logger.info("OCR preprocessing available - will enhance text extraction")
-    else:
-        logger.info("OCR preprocessing not available - using standard PyMuPDF extraction")
+    # Only image-only / sparse-text pages are rendered and sent to OCR
+    kind = classify_page(tuple(page.rect), text_blocks)
+    page_image_bytes = None
+    if kind != "text" and ocr_available and is_ocr_available():
+        try:
+            # Render page as image for OCR
+            pix = page.get_pixmap(matrix=fitz.Matrix(2.0, 2.0))  # 2x scaling for better OCR
+            page_image_bytes = pix.tobytes("png")
+            logger.info(f"Rendered {kind} page {pno+1} for OCR")
+        except Exception as e:
+            logger.warning(f"Failed to render page {pno+1} for OCR: {e}")
     
-    for pno in range(doc.page_count):
-        page = doc.load_page(pno)
-        blocks = page.get_text("blocks")
-        text_blocks = []
-        for b in blocks:
-            if len(b) >= 5 and b[4].strip():
-                text_blocks.append({"bbox": b[:4], "text": b[4].strip()})
-        
-        # Get page image for OCR enhancement if available
-        page_image_bytes = None
-        if ocr_available and text_blocks:  # Only do OCR if we have some text to potentially enhance
-            try:
-                # Render page as image for OCR
-                pix = page.get_pixmap(matrix=fitz.Matrix(2.0, 2.0))  # 2x scaling for better OCR
-                page_image_bytes = pix.tobytes("png")
-                logger.info(f"Rendered page {pno+1} for OCR enhancement")
-            except Exception as e:
-                logger.warning(f"Failed to render page {pno+1} for OCR: {e}")
-        
-        # Enhance text blocks with OCR if available
-        if page_image_bytes:
-            try:
-                text_blocks = enhance_pdf_text_blocks(text_blocks, page_image_bytes)
-                logger.info(f"Enhanced page {pno+1} text blocks with OCR")
-            except Exception as e:
-                logger.warning(f"OCR enhancement failed for page {pno+1}: {e}")
+    # Enhance text blocks with OCR if available
+    if page_image_bytes:
+        try:
+            text_blocks = enhance_pdf_text_blocks(text_blocks, page_image_bytes)
+            logger.info(f"Enhanced page {pno+1} text blocks with OCR")
+        except Exception as e:
+            logger.warning(f"OCR enhancement failed for page {pno+1}: {e}")
+    
+    # Extract images from page
+    images = []
+    for img in page.get_images(full=True):
+        # (xref, smask, width, height, ...): sizes come from the header, before decoding
+        prepared = image_filter.prepare(doc, img[0], img[2], img[3])
+        if prepared is None:
+            continue
+        images.append({"doc_id": doc_id, "page": pno+1, "sha": prepared["sha"], "dhash": prepared["dhash"],
+                       "png": prepared["png"], "embed": prepared["embed"]})
+    
+    logger.info(f"Processed page {pno+1}: {len(text_blocks)} text blocks")
+    return {"page": pno+1, "text_blocks": text_blocks}, images
+
+def _queue_upload(img: dict, uploads: list):
+    """Queue the stored PNG of a kept image on the object store's pool; its URL is known up front."""
+    store = get_object_store()
+    key = f"{img['doc_id']}/page_{img['page']}/{img['sha']}.png"
+    uploads.append(store.submit(settings.minio_bucket, key, img.pop("png"), "image/png"))
+    img["url"] = store.url(settings.minio_bucket, key)
+
+# Per-process state for the parallel parser (set by _init_page_worker)
+_worker_doc = None
+
+def _open(source: Union[str, bytes]):
+    """Open a PDF from a path (read on demand by MuPDF) or from in-memory bytes."""
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source, filetype="pdf")
+
+def _init_page_worker(source: Union[str, bytes]):
+    """Process-pool initializer: each worker opens its own document once (and pools its own MinIO client).
+
+    Pass a path: every worker then opens the spooled file instead of receiving a pickled copy.
+    """
+    global _worker_doc
+    _worker_doc = _open(source)
+
+def _parse_page_range(doc_id: str, pnos: List[int], max_images: Optional[int]):
+    """Process-pool task: parse pages ``pnos`` (0-based) of the worker's document.
+
+    Images are returned, not uploaded: duplicates across slices are only visible to the parent.
+    """
+    pages, images = [], []
+    image_filter = ImageFilter(max_images)
+    for pno in pnos:
+        page, page_images = _parse_page(_worker_doc, pno, doc_id, settings.ocr_enabled, image_filter)
+        pages.append(page)
+        images.extend(page_images)
+    return pnos[0], pages, images
+
+def _parse_parallel(source: Union[str, bytes], doc_id: str, pnos: List[int], workers: int, progress=None,
+                    max_images: Optional[int] = None):
+    slice_size = max(1, settings.parse_pages_per_task)
+    ranges = [pnos[s:s + slice_size] for s in range(0, len(pnos), slice_size)]
+    results, done = {}, 0
+    # spawn (not fork): torch/OCR state in the parent must not be inherited mid-flight
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=ctx,
+                             initializer=_init_page_worker, initargs=(source,)) as pool:
+        futures = [pool.submit(_parse_page_range, doc_id, r, max_images) for r in ranges]
+        for fut in as_completed(futures):
+            start, pages, images = fut.result()
+            results[start] = (pages, images)
+            done += len(pages)
+            if progress:
+                progress(done, len(pnos))
+
+    # Merge back in page order so the result matches the serial path exactly
+    pages, images, uploads = [], [], []
+    image_filter = ImageFilter(max_images)
+    for start in sorted(results):
+        pages.extend(results[start][0])
+        for img in results[start][1]:
+            # Each slice filtered on its own: drop cross-slice duplicates and apply the cap before uploading
+            if image_filter.admit(img["dhash"]):
+                _queue_upload(img, uploads)
+                images.append(img)
+    wait_uploads(uploads)
+    logger.info(f"Images kept: {image_filter.kept}, skipped across page ranges: {image_filter.skipped}")
+    return pages, images
+
+def parse_pdf_to_sections(source: Union[str, bytes], doc_name: str, doc_id: str, progress=None,
+                          workers: Optional[int] = None, only_pages: Optional[List[int]] = None,
+                          max_images: Optional[int] = None):
+    """Parse a PDF (a file path, preferably, or bytes) into per-page text blocks and uploaded images.
+
+    ``progress(pages_done, pages_total)`` is called after every page (or page slice
+    in parallel mode) when given. ``workers`` > 1 splits the page range across a
+    process pool; it defaults to ``settings.parse_workers``. ``only_pages`` (1-based)
+    restricts parsing to those pages, e.g. the ones a revision changed. ``max_images``
+    overrides ``settings.image_max_per_doc``, e.g. with what is left of it after the
+    pages a revision did not change.
+    """
+    workers = settings.parse_workers if workers is None else workers
+    doc = _open(source)
+    page_count = doc.page_count
+    pnos = list(range(page_count)) if only_pages is None else sorted(p - 1 for p in only_pages if 0 < p <= page_count)
+
+    if workers > 1 and len(pnos) > 1:
+        doc.close()
+        logger.info(f"Parsing {len(pnos)} pages with {workers} worker processes")
+        pages, images = _parse_parallel(source, doc_id, pnos, workers, progress, max_images)
+    else:
+        pages, images, uploads = [], [], []
+        image_filter = ImageFilter(max_images)
         
-        # Extract images from page
-        for img in page.get_images(full=True):
-            xref = img[0]
-            pix = fitz.Pixmap(doc, xref)
-            if pix.alpha: pix = fitz.Pixmap(pix, 0)
-            img_bytes = pix.tobytes("png")
-            sha = hashlib.sha256(img_bytes).hexdigest()[:16]
-            key = f"{doc_id}/page_{pno+1}/{sha}.png"
-            url = _put(m, settings.minio_bucket, key, img_bytes, "image/png")
-            images.append({"doc_id": doc_id, "page": pno+1, "url": url})
+        # The OCR model is loaded lazily, on the first page that actually needs it
+        for done, pno in enumerate(pnos, start=1):
+            page, page_images = _parse_page(doc, pno, doc_id, settings.ocr_enabled, image_filter)
+            pages.append(page)
+            for img in page_images:
+                _queue_upload(img, uploads)
+            images.extend(page_images)
+            if progress:
+                progress(done, len(pnos))
         
-        pages.append({"page": pno+1, "text_blocks": text_blocks})
-        logger.info(f"Processed page {pno+1}: {len(text_blocks)} text blocks")
-    
-    doc.close()
+        doc.close()
+        # Uploads overlapped with parsing; only the tail is left to wait for
+        wait_uploads(uploads)
+        logger.info(f"Images kept: {image_filter.kept}, skipped: {image_filter.skipped}")
     
     total_blocks = sum(len(p["text_blocks"]) for p in pages)
     logger.info(f"Completed parsing {doc_name}: {len(pages)} pages, {total_blocks} text blocks, {len(images)} images")
+    logger.info(f"Object store uploads so far: {get_object_store().snapshot()}")
     
-    return {"doc_id": doc_id, "title": doc_name, "pages": pages, "images": images}
+    return {"doc_id": doc_id, "title": doc_name, "pages": pages, "images": images, "page_count": page_count}
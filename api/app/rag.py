@@ -1,109 +1,182 @@
-import chromadb, httpx
-import torch
-from sentence_transformers import SentenceTransformer
+import asyncio, httpx, json, time
 from .settings import settings
+from .models import get_registry
+from .embed_cache import encode_cached
+from .llm import get_llm_client
+from .executors import run_in
+from .vectorstore import VectorStore, get_store
+from .lexical import get_lexical_index, rrf
+from .images import embed_images
 
-# Detect available device with optimizations
-def _get_device():
-    import os
-    # Check for CUDA
-    if torch.cuda.is_available() and torch.cuda.device_count() > 0:
-        device = "cuda"
-        print(f"🚀 GPU detected: {torch.cuda.get_device_name(0)}")
-        return device
-    
-    # Check for Apple Silicon MPS (Metal Performance Shaders)
-    elif hasattr(torch.backends, 'mps') and torch.backends.mps.is_available():
-        device = "mps"
-        print(f"🍎 Apple Metal GPU detected, using MPS acceleration")
-        return device
-    
-    else:
-        # Optimize CPU inference
-        cpu_threads = os.cpu_count()
-        if cpu_threads:
-            torch.set_num_threads(min(cpu_threads, 8))  # Limit to 8 threads max
-            print(f"💻 Using CPU with {min(cpu_threads, 8)} threads optimized")
-        return "cpu"
-
-# Global variables for lazy loading
-_client = None
-_txt_model = None
-_img_model = None
-_text_col = None
-_img_col = None
-
-def _get_client():
-    global _client
-    if _client is None:
-        host = settings.chroma_url.split("//")[1].split(":")[0]
-        port = int(settings.chroma_url.split(":")[-1])
-        _client = chromadb.HttpClient(host=host, port=port)
-    return _client
+SEARCH_MODES = ("dense", "lexical", "hybrid")
 
 def _get_txt_model():
-    global _txt_model
-    if _txt_model is None:
-        device = _get_device()
-        _txt_model = SentenceTransformer(settings.embedding_model, device=device)
-        print(f"✅ Loaded text embedding model on {device}")
-    return _txt_model
+    return get_registry().get("text")
 
 def _get_img_model():
-    global _img_model
-    if _img_model is None:
-        device = _get_device()
-        _img_model = SentenceTransformer(settings.image_embedding_model, device=device)
-        print(f"✅ Loaded image embedding model on {device}")
-    return _img_model
+    return get_registry().get("image")
 
 def _get_text_col():
-    global _text_col
-    if _text_col is None:
-        _text_col = _get_client().get_or_create_collection("text_chunks")
-    return _text_col
+    return get_store("text_chunks")
 
 def _get_img_col():
-    global _img_col
-    if _img_col is None:
-        _img_col = _get_client().get_or_create_collection("image_chunks")
-    return _img_col
-
-def upsert_text(doc_id, title, page, section, chunks):
-    if not chunks: return
-    ids = [f"{doc_id}:{page}:{i}" for i,_ in enumerate(chunks)]
-    embs = _get_txt_model().encode(chunks, normalize_embeddings=True).tolist()
-    metas= [{"doc_id":doc_id,"title":title,"page":page,"section":section or "","type":"text"} for _ in chunks]
-    _get_text_col().upsert(ids=ids, embeddings=embs, metadatas=metas, documents=chunks)
+    return get_store("image_chunks")
+
+class TextIngestBatcher:
+    """Streams chunks from many pages into large encode batches and bulk text_chunks upserts.
+
+    Chunks are buffered until ``batch_size`` are pending (or ``flush_interval`` seconds
+    have passed since the last flush), sorted by length to minimise padding, encoded
+    in one pass and written with as few vector store round trips as possible.
+    """
+
+    def __init__(self, batch_size: int = None, flush_interval: float = None):
+        self.batch_size = batch_size or settings.ingest_batch_size
+        self.flush_interval = settings.ingest_flush_interval if flush_interval is None else flush_interval
+        self._pending = []  # (id, text, metadata)
+        self._last_flush = time.monotonic()
+        self._started = time.monotonic()
+        self.chunks_written = 0
+        self.flushes = 0
+
+    def add(self, title, chunks):
+        """Queue chunk dicts from ``app.chunker`` (id, doc_id, page, section, text, tokens)."""
+        for c in chunks:
+            self._pending.append((
+                c["id"], c["text"],
+                {"doc_id":c["doc_id"],"title":title,"page":c["page"],"section":c["section"] or "",
+                 "tokens":c["tokens"],"type":"text"},
+            ))
+        if len(self._pending) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return 0
+        batch = sorted(self._pending, key=lambda c: len(c[1]))
+        self._pending = []
+
+        texts = [c[1] for c in batch]
+        embs = encode_cached(_get_txt_model(), settings.embedding_model, texts, batch_size=settings.embed_batch_size)
+        col = _get_text_col()
+        step = settings.ingest_upsert_batch_size
+        for i in range(0, len(batch), step):
+            col.upsert(
+                ids=[c[0] for c in batch[i:i+step]],
+                embeddings=embs[i:i+step],
+                metadatas=[c[2] for c in batch[i:i+step]],
+                documents=texts[i:i+step],
+            )
+        if settings.lexical_enabled:
+            get_lexical_index().add(batch)
+        self.chunks_written += len(batch)
+        self.flushes += 1
+        return len(batch)
+
+    def stats(self) -> dict:
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        return {"chunks": self.chunks_written, "flushes": self.flushes,
+                "seconds": round(elapsed, 2), "chunks_per_s": round(self.chunks_written / elapsed, 2)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+def delete_chunks(ids):
+    """Remove text chunks from the vector store and the lexical index."""
+    if not ids: return
+    _get_text_col().delete(ids=list(ids))
+    if settings.lexical_enabled:
+        get_lexical_index().delete(chunk_ids=list(ids))
+
+def image_id(img) -> str:
+    return f"{img['doc_id']}:img:{img['page']}:{img['sha']}"
+
+def delete_images(ids):
+    if not ids: return
+    _get_img_col().delete(ids=list(ids))
 
 def upsert_images(imgs):
+    """Embed the prepared figure thumbnails (see app/images.py) with CLIP and upsert them."""
+    imgs = [i for i in imgs if i.get("embed")]
     if not imgs: return
     captions = [f"Figure p.{i['page']}" for i in imgs]
-    embs = _get_img_model().encode(captions, normalize_embeddings=True).tolist()
-    ids  = [f"{i['doc_id']}:img:{i['page']}:{k}" for k,i in enumerate(imgs)]
+    embs = embed_images(_get_img_model(), imgs)
+    ids  = [image_id(i) for i in imgs]
     metas= [{"doc_id":i["doc_id"],"page":i["page"],"url":i["url"],"type":"image"} for i in imgs]
     _get_img_col().upsert(ids=ids, embeddings=embs, metadatas=metas, documents=captions)
 
-async def search(query: str, k: int = 6, want_images: bool = True):
-    qvec = _get_txt_model().encode([query], normalize_embeddings=True)[0].tolist()
-    text = _get_text_col().query(query_embeddings=[qvec], n_results=k)
+def embed_query(query: str):
+    """Text-space query vector, shared by document search and memory recall."""
+    return encode_cached(_get_txt_model(), settings.embedding_model, [query])[0]
+
+def _query_text(qvec, k: int):
     hits = []
-    if text.get("ids") and text["ids"][0]:
-        for did, meta, doc, dist in zip(text["ids"][0], text["metadatas"][0], text["documents"][0], text["distances"][0]):
-            hits.append({
-              "doc_id":meta["doc_id"],"title":meta["title"],
-              "page":meta["page"],"section":meta.get("section"),
-              "snippet":doc[:600],"score":1.0 - dist
-            })
-    images = []
-    if want_images:
-        img = _get_img_col().query(query_embeddings=[qvec], n_results=min(4,k))
-        if img.get("ids") and img["ids"][0]:
-            for meta in img["metadatas"][0]:
-                images.append(meta["url"])
+    for r in _get_text_col().query(qvec, k):
+        meta, doc = r["metadata"], r["document"] or ""
+        hits.append({
+          "chunk_id":r["id"],
+          "doc_id":meta["doc_id"],"title":meta["title"],
+          "page":meta["page"],"section":meta.get("section"),
+          "snippet":doc[:600],"score":VectorStore.similarity(r["distance"])
+        })
+    return hits
+
+def _query_images(ivec, k: int):
+    return [r["metadata"]["url"] for r in _get_img_col().query(ivec, min(4,k))]
+
+def embed_image_query(query: str):
+    # image_chunks lives in the CLIP space, so it needs its own (cached) query vector
+    return encode_cached(_get_img_model(), settings.image_embedding_model, [query])[0]
+
+async def _search_images(query: str, k: int):
+    ivec = await run_in("embed", embed_image_query, query)
+    return await run_in("vector", _query_images, ivec, k)
+
+def _query_lexical(query: str, k: int):
+    return get_lexical_index().search(query, k)
+
+async def _search_text(query: str, k: int, mode: str, qvec=None):
+    if mode == "lexical":
+        return await run_in("vector", _query_lexical, query, k)
+    if qvec is None:
+        qvec = await run_in("embed", embed_query, query)
+    if mode == "dense":
+        return await run_in("vector", _query_text, qvec, k)
+    # hybrid: both rankers over a wider candidate pool, fused by reciprocal rank
+    n = k * settings.hybrid_candidates
+    dense, lexical = await asyncio.gather(
+        run_in("vector", _query_text, qvec, n),
+        run_in("vector", _query_lexical, query, n),
+    )
+    return rrf(dense, lexical, limit=k)
+
+async def search(query: str, k: int = 6, want_images: bool = True, qvec=None, mode: str = "dense"):
+    """Search text_chunks (and image_chunks), issuing the queries concurrently.
+
+    ``mode`` is ``dense`` (vector), ``lexical`` (BM25, no embedding) or ``hybrid``
+    (both, reciprocal-rank fused). Pass ``qvec`` (from ``embed_query``) to reuse a
+    query vector computed by the caller.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}'; expected {', '.join(SEARCH_MODES)}")
+    if not want_images:
+        return await _search_text(query, k, mode, qvec), []
+    hits, images = await asyncio.gather(
+        _search_text(query, k, mode, qvec),
+        _search_images(query, k),
+    )
     return hits, images
 
-async def call_llm(prompt: str, context_blocks):
+def _llm_payload(prompt: str, context_blocks, stream: bool = False):
     sys = ("You are a medical assistant. Use provided context if helpful; "
            "cite sources as [title p.X]. Keep answers concise.")
     ctx = "\n\n".join([f"[CTX {i+1}]\n{c}" for i,c in enumerate(context_blocks)])
@@ -112,31 +185,68 @@ async def call_llm(prompt: str, context_blocks):
       {"role":"user","content": f"{prompt}\n\nContext:\n{ctx}"}
     ]
     payload = {"model": settings.openai_chat_model, "messages": messages, "temperature": 0.2, "max_tokens": 512}
+    if stream:
+        payload["stream"] = True
+    return payload
+
+def _llm_error(e: Exception) -> Exception:
+    """Translate httpx failures into the user-facing errors surfaced by /chat."""
+    if isinstance(e, httpx.ConnectError):
+        print(f"❌ LLM Connection Error: {str(e)}")
+        return Exception(f"Cannot connect to LLM server at {settings.openai_base_url}. Please ensure LM Studio is running with network access enabled. Error: {str(e)}")
+    if isinstance(e, httpx.TimeoutException):
+        print(f"❌ LLM Timeout Error: {str(e)}")
+        return Exception(f"LLM server timeout. The model may be too slow or overloaded. Error: {str(e)}")
+    if isinstance(e, httpx.HTTPStatusError):
+        print(f"❌ LLM HTTP Error {e.response.status_code}: {e.response.text}")
+        return Exception(f"LLM server returned error {e.response.status_code}: {e.response.text}")
+    print(f"❌ LLM General Error: {str(e)}")
+    return Exception(f"LLM error: {str(e)}")
+
+async def call_llm(prompt: str, context_blocks):
+    payload = _llm_payload(prompt, context_blocks)
     
     print(f"🤖 Calling LLM: {settings.openai_chat_model} at {settings.openai_base_url}")
     
     try:
-        headers = {"Content-Type": "application/json"}
-        if settings.openai_api_key:
-            headers["Authorization"] = f"Bearer {settings.openai_api_key}"
-        
-        async with httpx.AsyncClient(timeout=120) as ax:
-            r = await ax.post(f"{settings.openai_base_url}/chat/completions", json=payload, headers=headers)
-            r.raise_for_status()
-            result = r.json()
-            if "choices" in result and len(result["choices"]) > 0:
-                return result["choices"][0]["message"]["content"]
-            else:
-                raise Exception(f"No response choices in LLM result: {result}")
-    except httpx.ConnectError as e:
-        print(f"❌ LLM Connection Error: {str(e)}")
-        raise Exception(f"Cannot connect to LLM server at {settings.openai_base_url}. Please ensure LM Studio is running with network access enabled. Error: {str(e)}")
-    except httpx.TimeoutException as e:
-        print(f"❌ LLM Timeout Error: {str(e)}")
-        raise Exception(f"LLM server timeout. The model may be too slow or overloaded. Error: {str(e)}")
-    except httpx.HTTPStatusError as e:
-        print(f"❌ LLM HTTP Error {e.response.status_code}: {e.response.text}")
-        raise Exception(f"LLM server returned error {e.response.status_code}: {e.response.text}")
+        result = await get_llm_client().post_json("/chat/completions", payload)
+        if "choices" in result and len(result["choices"]) > 0:
+            return result["choices"][0]["message"]["content"]
+        else:
+            raise Exception(f"No response choices in LLM result: {result}")
+    except Exception as e:
+        raise _llm_error(e)
+
+async def stream_llm(prompt: str, context_blocks):
+    """Yield answer text deltas as the OpenAI-compatible backend produces them (SSE ``data:`` lines)."""
+    payload = _llm_payload(prompt, context_blocks, stream=True)
+
+    print(f"🤖 Streaming LLM: {settings.openai_chat_model} at {settings.openai_base_url}")
+
+    try:
+        async with get_llm_client().stream("/chat/completions", payload) as r:
+            # Backends that ignore "stream" answer with a single JSON body
+            if r.headers.get("content-type", "").startswith("application/json"):
+                result = json.loads(await r.aread())
+                if result.get("choices"):
+                    yield result["choices"][0]["message"]["content"]
+                return
+
+            async for line in r.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                # Backends report a failure mid-generation as an error event, not an HTTP status
+                if chunk.get("error"):
+                    error = chunk["error"]
+                    raise Exception(error.get("message", error) if isinstance(error, dict) else error)
+                if not chunk.get("choices"):
+                    continue
+                delta = chunk["choices"][0].get("delta") or {}
+                if delta.get("content"):
+                    yield delta["content"]
     except Exception as e:
-        print(f"❌ LLM General Error: {str(e)}")
-        raise Exception(f"LLM error: {str(e)}")
+        raise _llm_error(e)
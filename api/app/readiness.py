@@ -0,0 +1,59 @@
+import asyncio, time
+from .settings import settings
+from .models import get_registry
+
+def preload_names() -> list:
+    return [n.strip() for n in settings.preload_models.split(",") if n.strip()]
+
+async def _timed(check):
+    t0 = time.perf_counter()
+    try:
+        detail = await asyncio.wait_for(check(), timeout=settings.readiness_timeout)
+        return {"ready": True, "latency_ms": round((time.perf_counter() - t0) * 1000, 1), **(detail or {})}
+    except Exception as e:
+        return {"ready": False, "latency_ms": round((time.perf_counter() - t0) * 1000, 1),
+                "error": str(e) or type(e).__name__}
+
+async def _check_vectors():
+    from .vectorstore import ping
+    await asyncio.to_thread(ping)
+    return {"backend": settings.vector_backend}
+
+async def _check_minio():
+    from .storage import get_object_store
+    exists = await asyncio.to_thread(lambda: get_object_store().client.bucket_exists(settings.minio_bucket))
+    return {"bucket": settings.minio_bucket, "bucket_exists": exists}
+
+async def _check_llm():
+    from .llm import get_llm_client
+    r = await get_llm_client().client.get("/models")
+    r.raise_for_status()
+    return {"models": [m.get("id") for m in r.json().get("data", [])][:5]}
+
+async def _check_redis():
+    from .jobs import _get_redis
+    await asyncio.to_thread(lambda: _get_redis().ping())
+
+CHECKS = {"vectors": _check_vectors, "minio": _check_minio, "llm": _check_llm, "redis": _check_redis}
+
+def model_readiness(names) -> dict:
+    registry = get_registry()
+    snap = registry.snapshot()["models"]
+    out = {}
+    for name in names:
+        # A model is in the registry as soon as it has loaded, before its warmup has run
+        if name in registry.warmed and name in snap:
+            out[name] = {"ready": True, **snap[name]}
+        elif name in registry.preload_errors:
+            out[name] = {"ready": False, "error": registry.preload_errors[name]}
+        else:
+            out[name] = {"ready": False, "error": "warming up" if name in snap else "loading", **snap.get(name, {})}
+    return out
+
+async def check_readiness(models, dependencies) -> dict:
+    """Per-model and per-dependency readiness for /readyz; ``ready`` only if every check passes."""
+    results = await asyncio.gather(*[_timed(CHECKS[d]) for d in dependencies])
+    deps = dict(zip(dependencies, results))
+    models = model_readiness(models)
+    ready = all(m["ready"] for m in models.values()) and all(d["ready"] for d in deps.values())
+    return {"ready": ready, "models": models, "dependencies": deps}
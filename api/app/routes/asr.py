@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect
+
+from ..settings import settings
+from ..uploads import spool_form, upload_form_schema
+from ..asr_pool import get_transcription_pool
+from ..asr_stream import get_stream_scheduler, StreamSession, OpusDecoder, parse_control
+
+router = APIRouter()
+
+@router.post("/transcribe", openapi_extra=upload_form_schema("audio"))
+async def transcribe(request: Request):
+    """Accepts WAV/MP3/M4A/FLAC; returns the transcript with timestamped segments.
+
+    ``{text, duration, segments: [{start, end, text}], chunks, timings}``; long recordings
+    are split at pauses and the chunks transcribed in parallel.
+    """
+    # Parsed as it streams in, straight to a spool file; Whisper decodes from that path
+    form = await spool_form(request, "audio", settings.asr_spool_dir, settings.asr_max_upload_mb * 1024 * 1024)
+    spooled = form.upload
+    try:
+        return await get_transcription_pool().transcribe_file(spooled.path)
+    finally:
+        spooled.discard()
+
+@router.get("/stats/asr")
+async def asr_stats():
+    """Recording pool (admission, real-time factor) and live transcription scheduler counters."""
+    return {"recordings": get_transcription_pool().snapshot(), "stream": get_stream_scheduler().snapshot()}
+
+@router.websocket("/transcribe/stream")
+async def transcribe_stream(ws: WebSocket, format: str = "pcm", sample_rate: int = 16000):
+    """Live transcription. Binary frames: 16-bit mono PCM at ``sample_rate`` (``format=pcm``)
+    or an Ogg/WebM Opus stream (``format=opus``, e.g. MediaRecorder chunks).
+
+    Replies with JSON ``partial`` / ``final`` transcripts as speech is detected; send the
+    text frame ``{"type": "stop"}`` to flush the last utterance and receive ``done``.
+    """
+    await ws.accept()
+    if format not in ("pcm", "opus") or not 8000 <= sample_rate <= 48000:
+        await ws.send_json({"type": "error", "error": "format must be pcm or opus, sample_rate 8000-48000"})
+        await ws.close(code=1003)
+        return
+    scheduler = get_stream_scheduler()
+    sid = scheduler.open_session()
+    if sid is None:
+        await ws.send_json({"type": "error", "error": "Too many live transcription sessions, try again later"})
+        await ws.close(code=1013)
+        return
+
+    session = StreamSession(sid, scheduler, ws.send_json, sample_rate if format == "pcm" else 16000)
+    decoder = None
+    try:
+        if format == "opus":
+            decoder = OpusDecoder(session.feed_pcm)
+            await decoder.start()
+        await ws.send_json({"type": "ready", "sample_rate": session.sample_rate})
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(msg.get("code", 1000))
+            if msg.get("bytes"):
+                await (decoder.write(msg["bytes"]) if decoder else session.feed_pcm(msg["bytes"]))
+            elif msg.get("text") and parse_control(msg["text"]).get("type") == "stop":
+                break
+        if decoder:
+            await decoder.close()
+        await session.finish()
+        await ws.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.cancel()
+        if decoder and decoder.proc and decoder.proc.returncode is None:
+            decoder.proc.kill()
+        scheduler.close_session(sid)
@@ -0,0 +1,136 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio, json, time
+
+from ..schemas import ChatRequest, ChatResponse, SearchHit, SearchRequest, SearchResponse
+from ..rag import search, call_llm, stream_llm, embed_query
+from ..memory import remember, recall, get_memory_writer
+from ..tools import full_read_summarize
+from ..embed_cache import get_embedding_cache
+from ..llm import get_llm_client
+from ..executors import run_in, ExecutorBusy
+
+router = APIRouter()
+
+@router.get("/stats/embeddings")
+async def embedding_stats():
+    return get_embedding_cache().snapshot()
+
+@router.get("/stats/memory")
+async def memory_stats():
+    return get_memory_writer().snapshot()
+
+@router.get("/stats/llm")
+async def llm_stats():
+    return get_llm_client().snapshot()
+
+@router.post("/search", response_model=SearchResponse)
+async def search_documents(req: SearchRequest):
+    """Document retrieval only (no LLM): ``mode`` is dense, lexical (BM25) or hybrid (RRF)."""
+    t0 = time.perf_counter()
+    hits, images = await search(req.query, k=req.k, want_images=req.return_images, mode=req.mode)
+    return SearchResponse(mode=req.mode, hits=[SearchHit(**h) for h in hits], images=images,
+                          took_ms=round((time.perf_counter() - t0) * 1000, 3))
+
+def _remember_exchange(user_id: str, query: str, answer: str):
+    # Only buffers the turns; the write-behind MemoryWriter embeds and upserts them in batches
+    remember(user_id, "user", query)
+    remember(user_id, "assistant", answer)
+
+async def _gather_context(req: ChatRequest):
+    """Memory recall + document retrieval shared by /chat and /chat/stream."""
+    # Embed the query once, then 1) recall memory and 2) retrieve from docs concurrently.
+    # Lexical retrieval doesn't need the vector, so it starts without waiting for it.
+    embedding = asyncio.ensure_future(run_in("embed", embed_query, req.query))
+
+    async def _memory():
+        return await run_in("vector", recall, req.user_id, req.query, 6, await embedding)
+
+    async def _documents():
+        qvec = None if req.mode == "lexical" else await embedding
+        return await search(req.query, k=req.k, want_images=req.return_images, qvec=qvec, mode=req.mode)
+
+    mem, (hits, img_urls) = await asyncio.gather(_memory(), _documents())
+    ctx = mem + [h["snippet"] for h in hits]
+    
+    print(f"🔍 Found {len(hits)} document hits, {len(mem)} memory items")
+
+    # 3) decide: full-read vs normal
+    wants_full = req.full_read or ("read the entire" in req.query.lower() or "read whole" in req.query.lower())
+    # Only use full-read if explicitly requested AND we have content
+    return ctx, hits, img_urls, wants_full and bool(mem or hits)
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat(req: ChatRequest):
+    try:
+        print(f"💬 Chat request: {req.query[:100]}...")
+        ctx, hits, img_urls, full = await _gather_context(req)
+
+        if full:
+            answer = await full_read_summarize(ctx, goal=req.query)
+        else:
+            # Normal chat with available context (memory + documents)
+            answer = await call_llm(req.query, ctx)
+
+        # 4) persist memory
+        if req.remember:
+            _remember_exchange(req.user_id, req.query, answer)
+
+        print(f"✅ Chat completed successfully")
+        return ChatResponse(
+            answer=answer,
+            citations=[SearchHit(**h) for h in hits],
+            images=img_urls
+        )
+    
+    except ExecutorBusy:
+        raise
+    except Exception as e:
+        print(f"❌ Chat error: {str(e)}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+def _ndjson(event: dict) -> str:
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+@router.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """Same as /chat, streamed as NDJSON events.
+
+    One JSON object per line: ``{"type": "citations", ...}`` first, then
+    ``{"type": "token", "text": ...}`` per generated delta, and finally
+    ``{"type": "done", "answer": ...}`` (or ``{"type": "error", "error": ...}``).
+    """
+    print(f"💬 Streaming chat request: {req.query[:100]}...")
+
+    async def events():
+        try:
+            ctx, hits, img_urls, full = await _gather_context(req)
+            yield _ndjson({
+                "type": "citations",
+                "citations": [SearchHit(**h).model_dump() for h in hits],
+                "images": img_urls,
+            })
+
+            parts = []
+            if full:
+                # Map-reduce has no incremental output; send the synthesis as one delta
+                parts.append(await full_read_summarize(ctx, goal=req.query))
+                yield _ndjson({"type": "token", "text": parts[0]})
+            else:
+                async for delta in stream_llm(req.query, ctx):
+                    parts.append(delta)
+                    yield _ndjson({"type": "token", "text": delta})
+            answer = "".join(parts)
+
+            # 4) persist memory once the full answer is known
+            if req.remember:
+                _remember_exchange(req.user_id, req.query, answer)
+
+            print(f"✅ Streaming chat completed successfully")
+            yield _ndjson({"type": "done", "answer": answer})
+        except Exception as e:
+            print(f"❌ Chat error: {str(e)}")
+            yield _ndjson({"type": "error", "error": str(e)})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
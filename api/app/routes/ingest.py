@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+from ..schemas import IngestJobResponse, IngestStatus
+from ..jobs import enqueue_ingest, get_ingest_status
+from ..executors import run_in, ExecutorBusy
+from ..manifest import doc_id_for, get_manifest
+from ..settings import settings
+from ..uploads import spool_form, upload_form_schema, BadUpload, UploadTooLarge
+
+router = APIRouter()
+
+@router.post("/ingest", response_model=IngestJobResponse, status_code=202,
+             openapi_extra=upload_form_schema("file", title="string"))
+async def ingest(request: Request):
+    """Spool the upload and queue it for the ingest worker; poll GET /ingest/{job_id} for progress.
+
+    Documents are identified by title: re-uploading an unchanged file returns
+    ``status="unchanged"`` at once, and a revision only re-processes changed pages.
+    """
+    try:
+        # Parsed as it streams in: the file goes to the spool volume in chunks, hashed on the way
+        form = await spool_form(request, "file", settings.ingest_spool_dir,
+                                settings.ingest_max_upload_mb * 1024 * 1024, ".pdf")
+        spooled = form.upload
+        if not form.filename.lower().endswith(".pdf"):
+            spooled.discard()
+            return JSONResponse({"error":"Only PDF files are supported"}, status_code=400)
+        name = form.fields.get("title") or form.filename
+        doc_id = doc_id_for(name)
+
+        # Same bytes as the last ingest of this title: nothing to parse, embed or queue
+        manifest = await run_in("io", get_manifest, name)
+        if manifest and manifest.get("file_sha") == spooled.sha256:
+            spooled.discard()
+            print(f"⏭️ {name} is unchanged, skipping ingest")
+            return JSONResponse(IngestJobResponse(doc_id=doc_id, status="unchanged").model_dump(), status_code=200)
+
+        job_id = await run_in("io", enqueue_ingest, spooled.path, name, doc_id, spooled.sha256)
+        print(f"📥 Queued document: {name} ({spooled.size} bytes) as job {job_id}")
+        return IngestJobResponse(job_id=job_id, doc_id=doc_id)
+
+    except (ExecutorBusy, UploadTooLarge, BadUpload):
+        raise
+    except Exception as e:
+        print(f"❌ Ingest error: {str(e)}")
+        return JSONResponse({"error": f"Could not queue document: {str(e)}"}, status_code=500)
+
+@router.get("/ingest/{job_id}", response_model=IngestStatus)
+async def ingest_status(job_id: str):
+    status = await run_in("io", get_ingest_status, job_id)
+    if status is None:
+        return JSONResponse({"error": f"Unknown ingest job: {job_id}"}, status_code=404)
+    return IngestStatus(**status)
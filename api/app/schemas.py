@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 class ChatRequest(BaseModel):
     query: str
@@ -8,11 +8,53 @@ class ChatRequest(BaseModel):
     return_images: bool = True
     user_id: str = "alex"
     remember: bool = True
+    mode: Literal["dense", "lexical", "hybrid"] = "dense"
+
+class SearchRequest(BaseModel):
+    query: str
+    k: int = 10
+    mode: Literal["dense", "lexical", "hybrid"] = "hybrid"
+    return_images: bool = False
 
 class IngestResponse(BaseModel):
     doc_id: str
     pages: int
     chunks: int
+    chunks_per_s: float = 0.0
+    pages_changed: int = 0
+    pages_removed: int = 0
+    chunks_deleted: int = 0
+    unchanged: bool = False
+
+class IngestJobResponse(BaseModel):
+    job_id: Optional[str] = None  # None when the upload matched the last ingest ("unchanged")
+    doc_id: str
+    status: str = "queued"
+
+class IngestFailure(BaseModel):
+    page: Optional[int] = None
+    stage: str
+    error: str
+    attempt: int = 0
+
+class IngestStatus(BaseModel):
+    job_id: str
+    status: str
+    doc_id: Optional[str] = None
+    title: Optional[str] = None
+    stage: str = "queued"
+    pages_total: int = 0
+    pages_changed: int = 0
+    pages_parsed: int = 0
+    pages_embedded: int = 0
+    chunks: int = 0
+    chunks_per_s: float = 0.0
+    images: int = 0
+    retries: int = 0
+    retries_left: int = 0
+    failures: List[IngestFailure] = Field(default_factory=list)
+    error: Optional[str] = None
+    result: Optional[IngestResponse] = None
 
 class SearchHit(BaseModel):
     doc_id: str
@@ -27,3 +69,9 @@ class ChatResponse(BaseModel):
     answer: str
     citations: List[SearchHit] = Field(default_factory=list)
     images: List[str] = Field(default_factory=list)
+
+class SearchResponse(BaseModel):
+    mode: str
+    hits: List[SearchHit] = Field(default_factory=list)
+    images: List[str] = Field(default_factory=list)
+    took_ms: float = 0.0
@@ -0,0 +1,34 @@
+"""Role-split entry points; each imports only the subsystems its role needs.
+
+    python -m app.serve chat            # /chat, /chat/stream, /ingest enqueue + status
+    python -m app.serve asr             # /transcribe only (no Chroma, LLM client or embedders)
+    python -m app.serve ingest-worker   # RQ ingest worker (parsing, OCR, embedding)
+"""
+import argparse, os
+
+def chat_app():
+    from .factory import create_app
+    return create_app(["chat", "ingest"])
+
+def asr_app():
+    from .factory import create_app
+    return create_app(["asr"])
+
+APPS = {"chat": "app.serve:chat_app", "asr": "app.serve:asr_app"}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("role", choices=[*APPS, "ingest-worker"])
+    ap.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    ap.add_argument("--port", type=int, default=int(os.getenv("PORT", 8080)))
+    args = ap.parse_args()
+
+    if args.role == "ingest-worker":
+        from .worker import main as worker_main
+        return worker_main()
+
+    import uvicorn
+    uvicorn.run(APPS[args.role], factory=True, host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -5,23 +5,156 @@ class Settings(BaseSettings):
     openai_api_key: str = "none"
     openai_chat_model: str
 
+    # Shared LLM HTTP client (keep-alive pool, concurrency cap, 429/503 retries)
+    llm_timeout: float = 120.0
+    llm_max_connections: int = 16
+    llm_max_concurrency: int = 8  # in-flight /chat/completions requests
+    llm_max_retries: int = 3
+    llm_retry_base_delay: float = 0.5  # seconds, doubled per attempt with full jitter
+    llm_retry_max_delay: float = 10.0
+
+    # Which routers this API process serves: chat, ingest, asr (see app/serve.py for role entry points)
+    api_roles: str = "chat,ingest,asr"
+
     chroma_url: str
     redis_url: str
     minio_endpoint: str
     minio_access_key: str
     minio_secret_key: str
     minio_bucket: str = "medrandocs"
+    minio_max_connections: int = 16  # keep-alive pool of the shared MinIO client
+    minio_timeout: float = 60.0  # read timeout per request, seconds
+    minio_upload_workers: int = 8  # concurrent image uploads per process
+    minio_upload_queue: int = 64  # queued uploads before parsing waits (bounds memory)
+
+    # Vector store backend: chroma (HTTP server) | chroma-embedded | numpy | compact (see app/vectorstore.py)
+    vector_backend: str = "chroma"
+    vector_dir: str = "/root/.cache/medran-vectors"  # data directory of the embedded backends
+    vector_persist_interval: float = 5.0  # seconds between numpy index snapshots while writing
+    compact_dtype: str = "int8"  # compact backend first-pass codes: int8 | fp16
+    compact_rescore_factor: int = 8  # candidates re-scored against float32 per requested hit
+    compact_scan_block: int = 65536  # rows per first-pass block (bounds scan memory)
+    compact_vacuum_ratio: float = 0.25  # rewrite files once this fraction of rows is dead
+
+    # BM25 lexical index (SQLite, impact-ordered postings) maintained at ingest, for mode=lexical|hybrid search
+    lexical_enabled: bool = True
+    lexical_index_path: str = "/root/.cache/medran-lexical.sqlite"  # shared by API and worker
+    lexical_max_postings: int = 1000  # highest-impact postings read per query term; bounds query cost
+    lexical_postings_per_term: int = 20000  # highest-impact postings kept per term on disk (0 = all)
+    hybrid_candidates: int = 4  # per-ranker candidates per requested hit before fusion
+    rrf_k: int = 60  # reciprocal-rank fusion constant
 
     # OCR model for document preprocessing (TrOCR)
     ocr_model: str = "microsoft/trocr-base-printed"
+    ocr_enabled: bool = True
+    ocr_min_text_coverage: float = 0.02  # text-layer bbox area / page area below this -> OCR
+    ocr_min_text_chars: int = 80  # fewer text-layer characters than this -> OCR
+    ocr_batch_size: int = 16  # line crops per TrOCR generate() call
+    ocr_max_line_tokens: int = 64
     
+    # Image stage: xrefs below these sizes (logos, rules, spacers) are never decoded
+    image_min_side: int = 64  # px
+    image_min_area: int = 128 * 128  # px^2
+    image_max_per_doc: int = 200  # 0 = unlimited
+    image_max_side: int = 1600  # stored figure, px on the long side
+    image_embed_side: int = 336  # thumbnail fed to CLIP
+    image_embed_batch_size: int = 32
+
+    # PDF parsing: >1 splits pages across a process pool (each worker loads its own OCR model)
+    parse_workers: int = 1
+    parse_pages_per_task: int = 8
+
+    # Background ingest (RQ worker: python -m app.worker)
+    ingest_queue: str = "ingest"
+    ingest_spool_dir: str = "/tmp/medran-ingest"  # must be shared between API and worker
+    ingest_max_upload_mb: int = 512
+    upload_chunk_bytes: int = 1024 * 1024  # uploads are streamed to the spool dir in chunks of this size
+    ingest_job_timeout: int = 3600  # seconds per attempt
+    ingest_max_retries: int = 2
+    ingest_retry_interval: list[int] = [30, 120]  # seconds between attempts
+    ingest_result_ttl: int = 86400  # keep job status/results for a day
+    ingest_batch_size: int = 256  # chunks collected across pages per encode pass
+    ingest_flush_interval: float = 10.0  # seconds before a partial batch is flushed anyway
+    ingest_upsert_batch_size: int = 1000  # vectors per vector store upsert call
+    embed_batch_size: int = 32  # SentenceTransformer mini-batch
+
+    # Token-aware chunking (app/chunker.py), measured with the embedding model's tokenizer
+    chunk_tokens: int = 384  # target tokens per chunk
+    chunk_overlap: int = 48  # trailing tokens repeated at the start of the next chunk
+    chunk_max_tokens: int = 512  # hard cap, also bounded by the model's max_seq_length
+    chunk_max_per_doc: int = 20000  # 0 = unlimited
+
     # Embedding models for vector search (unchanged)
     embedding_model: str = "BAAI/bge-m3"
     image_embedding_model: str = "openai/clip-vit-large-patch14"
-    max_context_chars: int = 120000
+    max_context_chars: int = 120000  # per-prompt budget, enforced by the full-read reduce
+    summarize_concurrency: int = 8  # full-read map/reduce calls in flight per request
+
+    # Embedding cache keyed by (model, encode options, normalized text hash)
+    embed_cache_size: int = 20000  # in-memory LRU entries (~4KB each for bge-m3)
+    embed_cache_backend: str = "memory"  # memory | redis | disk
+    embed_cache_dir: str = "/root/.cache/medran-embeddings"
+    embed_cache_ttl: int = 30 * 86400  # seconds, redis tier only
+
+    # Shared model registry
+    torch_cpu_precision: str = "fp32"  # fp32 | fp16 | int8 (dynamic quantization) for torch models on CPU
+    idle_model_ttl: int = 0  # seconds; unload models unused for this long (0 = keep forever)
+    preload_models: str = "text,asr"  # comma-separated: text,image,ocr,asr — each role preloads the ones it serves
+    preload_warmup: bool = True
+    worker_preload_models: str = "text,image,ocr"  # loaded by the ingest worker before it takes jobs
+    readiness_timeout: float = 3.0  # seconds per dependency check in /readyz
+
+    # Bounded executors keeping blocking work off the event loop (workers, max queued tasks)
+    embed_workers: int = 2
+    embed_max_queue: int = 64
+    vector_workers: int = 8
+    vector_max_queue: int = 128
+    asr_workers: int = 2  # also the Whisper model's num_workers (concurrent transcriptions)
+    asr_max_queue: int = 8
+    io_workers: int = 4
+    io_max_queue: int = 32
+
+    # Write-behind conversation memory
+    memory_batch_size: int = 64  # flush as soon as this many turns are buffered
+    memory_flush_interval: float = 2.0  # seconds; otherwise flush on this cadence
+    memory_max_buffer: int = 10000  # turns kept in RAM while the vector store is unavailable
+    memory_spool_path: str = "/root/.cache/medran-memory-spool.jsonl"  # unwritten turns at shutdown
+
+    # Memory compaction & retention (runs on the worker's maintenance queue)
+    maintenance_queue: str = "maintenance"
+    memory_compact_every: int = 200  # new turns per user before a compaction is scheduled
+    memory_max_raw_turns: int = 400  # above this, older raw turns are rolled into summaries
+    memory_keep_recent_turns: int = 200  # raw turns always kept verbatim
+    memory_raw_ttl_days: int = 30  # raw turns older than this are rolled up regardless of count
+    memory_max_summaries: int = 120  # beyond this the oldest summaries are merged
+    memory_recall_oversample: int = 3  # candidates fetched per requested recall item
+    memory_recency_weight: float = 0.1
+    memory_recency_half_life_days: float = 7.0
+    memory_summary_weight: float = 0.03
 
     # ASR model for /transcribe (faster-whisper)
     asr_model: str = "small.en"  # options: tiny/base/small/medium/large-v3, or multilingual variants
+    asr_spool_dir: str = "/tmp/medran-asr"
+    asr_max_upload_mb: int = 200
+    asr_cpu_threads: int = 0  # CTranslate2 threads per Whisper worker (0 = library default)
+
+    # Long recordings on /transcribe: split at pauses, transcribe chunks in parallel, stitch
+    asr_chunk_s: float = 28.0  # target chunk length (Whisper's window is 30 s)
+    asr_chunk_search_s: float = 8.0  # look back this far from the target for the quietest cut point
+    asr_max_jobs: int = 2  # recordings transcribed at once
+    asr_max_queued_jobs: int = 4  # recordings allowed to wait beyond that; more get a 503
+
+    # Live transcription (ws /transcribe/stream) and its energy VAD
+    asr_stream_max_sessions: int = 8  # concurrent sessions sharing the Whisper model
+    asr_stream_max_pending: int = 4  # closed utterances queued per session before the socket is back-pressured
+    asr_stream_partial_interval: float = 1.0  # seconds between partial transcripts of the utterance in progress
+    asr_stream_max_utterance_s: float = 20.0  # force a final after this much continuous speech
+    asr_vad_frame_ms: int = 30
+    asr_vad_threshold_db: float = -45.0  # minimum frame level (dBFS) that counts as speech
+    asr_vad_margin_db: float = 8.0  # ...and at least this far above the tracked noise floor
+    asr_vad_min_speech_ms: int = 150  # speech needed to open an utterance
+    asr_vad_end_silence_ms: int = 600  # silence that closes it
+    asr_vad_preroll_ms: int = 200  # audio kept from before speech onset
 
     class Config:
         env_prefix = ""
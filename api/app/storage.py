@@ -0,0 +1,143 @@
+"""Pooled MinIO client and bounded, deduplicating upload pool for extracted images.
+
+One ``Minio`` client per process (sharing a keep-alive connection pool), the bucket
+checked once, and uploads submitted to a small thread pool so they overlap with page
+parsing. Keys are content-addressed, so an object that already exists (``stat_object``)
+is skipped instead of uploaded again. Works against any S3-compatible endpoint.
+"""
+import io, logging, threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+class ObjectStore:
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+        self._buckets = set()  # buckets known to exist
+        self._known = set()  # (bucket, key) uploaded or seen in this process
+        self._pending = {}  # (bucket, key) -> upload future still in flight
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(settings.minio_upload_workers + settings.minio_upload_queue)
+        self.stats = {"uploaded": 0, "skipped": 0, "failed": 0, "bytes": 0}
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._make_client()
+        return self._client
+
+    def _make_client(self):
+        import urllib3
+        from minio import Minio
+        host = settings.minio_endpoint.replace("http://", "").replace("https://", "")
+        secure = settings.minio_endpoint.startswith("https")
+        kwargs = {}
+        if secure:
+            import certifi
+            kwargs = {"cert_reqs": "CERT_REQUIRED", "ca_certs": certifi.where()}
+        http = urllib3.PoolManager(
+            maxsize=settings.minio_max_connections,
+            timeout=urllib3.Timeout(connect=5, read=settings.minio_timeout),
+            retries=urllib3.Retry(total=3, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+            **kwargs,
+        )
+        return Minio(host,
+                     access_key=settings.minio_access_key,
+                     secret_key=settings.minio_secret_key,
+                     secure=secure,
+                     http_client=http)
+
+    def url(self, bucket: str, key: str) -> str:
+        return f"{settings.minio_endpoint}/{bucket}/{key}"
+
+    def ensure_bucket(self, bucket: str):
+        if bucket in self._buckets:
+            return
+        with self._lock:
+            if bucket not in self._buckets:
+                if not self.client.bucket_exists(bucket):
+                    self.client.make_bucket(bucket)
+                self._buckets.add(bucket)
+
+    def exists(self, bucket: str, key: str) -> bool:
+        try:
+            self.client.stat_object(bucket, key)
+            return True
+        except Exception as e:
+            # minio's S3Error carries the S3 error code
+            if getattr(e, "code", None) in ("NoSuchKey", "NoSuchObject", "ResourceNotFound"):
+                return False
+            raise
+
+    def put(self, bucket: str, key: str, data: bytes, content_type: str) -> str:
+        """Upload unless ``key`` already exists (keys are content hashes). Returns the object URL."""
+        self.ensure_bucket(bucket)
+        if (bucket, key) in self._known or self.exists(bucket, key):
+            with self._lock:
+                self.stats["skipped"] += 1
+            self._known.add((bucket, key))
+            return self.url(bucket, key)
+        self.client.put_object(bucket, key, io.BytesIO(data), len(data), content_type=content_type)
+        with self._lock:
+            self.stats["uploaded"] += 1
+            self.stats["bytes"] += len(data)
+        self._known.add((bucket, key))
+        return self.url(bucket, key)
+
+    def submit(self, bucket: str, key: str, data: bytes, content_type: str) -> Future:
+        """Queue an upload on the bounded pool; blocks the caller while the queue is full.
+
+        A key that is already queued or uploading shares that upload's future.
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=settings.minio_upload_workers,
+                                                thread_name_prefix="medran-upload")
+            pending = self._pending.get((bucket, key))
+        if pending is not None:
+            with self._lock:
+                self.stats["skipped"] += 1
+            return pending
+        self._slots.acquire()
+        with self._lock:
+            fut = self._pool.submit(self.put, bucket, key, data, content_type)
+            self._pending[(bucket, key)] = fut
+        fut.add_done_callback(lambda f: self._done(bucket, key, f))
+        return fut
+
+    def _done(self, bucket: str, key: str, fut: Future):
+        self._slots.release()
+        with self._lock:
+            self._pending.pop((bucket, key), None)
+            if fut.exception() is not None:
+                self.stats["failed"] += 1
+
+    def snapshot(self) -> dict:
+        return {"workers": settings.minio_upload_workers, "buckets": sorted(self._buckets), **self.stats}
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_object_store() -> ObjectStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ObjectStore()
+    return _store
+
+def wait_uploads(futures) -> list:
+    """Wait for every upload; raise the first failure after all have finished."""
+    errors = []
+    for fut in futures:
+        try:
+            fut.result()
+        except Exception as e:
+            errors.append(e)
+    if errors:
+        raise errors[0]
+    return futures
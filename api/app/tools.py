@@ -1,21 +1,76 @@
+import asyncio
 from .rag import call_llm
+from .settings import settings
+
+# Room left in max_context_chars for the prompt text and "[CTX i]" framing of call_llm
+_PROMPT_OVERHEAD = 2000
+_PER_BLOCK_OVERHEAD = 16
+
+def _context_budget() -> int:
+    return max(settings.max_context_chars - _PROMPT_OVERHEAD, 2000)
+
+def _pack(texts: list[str], budget: int) -> list[list[str]]:
+    """Greedily group texts into prompts whose combined context stays within ``budget`` chars.
+
+    Every text is capped at half the budget so each group holds at least two, which
+    guarantees the hierarchical reduce makes progress.
+    """
+    cap = budget // 2 - _PER_BLOCK_OVERHEAD
+    groups, cur, size = [], [], 0
+    for t in texts:
+        t = t[:cap]
+        cost = len(t) + _PER_BLOCK_OVERHEAD
+        if cur and size + cost > budget:
+            groups.append(cur)
+            cur, size = [], 0
+        cur.append(t)
+        size += cost
+    if cur:
+        groups.append(cur)
+    return groups
 
 async def full_read_summarize(section_texts: list[str], goal: str) -> str:
-    """Map-reduce style summarization over many chunks: summarize then synthesize."""
+    """Map-reduce style summarization over many chunks: summarize then synthesize.
+
+    The map phase runs with at most ``settings.summarize_concurrency`` calls in flight.
+    The reduce phase is hierarchical: partial summaries are packed into prompts that
+    fit ``settings.max_context_chars`` and merged level by level until one remains.
+    """
     if not section_texts:
         return "No content available to read."
+    budget = _context_budget()
+    sem = asyncio.Semaphore(settings.summarize_concurrency)
+
+    async def _bounded(prompt: str, blocks: list[str]) -> str:
+        async with sem:
+            return await call_llm(prompt, blocks)
+
     # map
-    partials = []
-    for chunk in section_texts:
-        partials.append(
-            await call_llm(
-                f"Summarize this for the goal: {goal}. Keep key points & page refs if present.",
-                [chunk],
-            )
+    partials = await asyncio.gather(*[
+        _bounded(
+            f"Summarize this for the goal: {goal}. Keep key points & page refs if present.",
+            [chunk[:budget]],
         )
+        for chunk in section_texts
+    ])
+
     # reduce
+    groups = _pack(list(partials), budget)
+    level = 0
+    while len(groups) > 1:
+        level += 1
+        print(f"📚 Reduce level {level}: {sum(len(g) for g in groups)} partials -> {len(groups)} prompts")
+        partials = await asyncio.gather(*[
+            _bounded(
+                f"Merge these partial summaries for the goal: {goal}. Keep key points & page refs [title p.X].",
+                group,
+            )
+            for group in groups
+        ])
+        groups = _pack(list(partials), budget)
+
     final = await call_llm(
         f"Synthesize these partial summaries into one concise answer for the goal: {goal}. Cite as [title p.X].",
-        partials,
+        groups[0],
     )
     return final
@@ -0,0 +1,143 @@
+"""Stream multipart uploads to a spool file in fixed-size chunks, hashing as they go.
+
+Routes never hold a whole upload in memory. ``spool_form`` parses the request body
+as it arrives and writes the file field straight into ``directory``, in blocks of
+``upload_chunk_bytes``, so the bytes touch disk once. The size limit is enforced
+up front from ``Content-Length`` and again while the body streams in (chunked
+requests have no length). The caller gets the path, size and sha256 to hand on.
+"""
+import hashlib, os, uuid
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+from multipart.multipart import MultipartParser, parse_options_header
+from .settings import settings
+from .executors import run_in
+
+_FORM_OVERHEAD = 64 * 1024  # multipart headers plus the small text fields next to the file
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds its configured limit; routes turn it into a 413."""
+
+class BadUpload(Exception):
+    """Raised for a malformed multipart body or a missing file field; routes turn it into a 400."""
+
+@dataclass
+class SpooledUpload:
+    path: str
+    size: int
+    sha256: str
+
+    def discard(self):
+        try: os.remove(self.path)
+        except Exception: pass
+
+@dataclass
+class SpooledForm:
+    upload: SpooledUpload
+    filename: str
+    fields: Dict[str, str] = field(default_factory=dict)
+
+class _PartEvents(list):
+    """Multipart parser callbacks are synchronous: queue ``(kind, value)`` for the async side."""
+
+    def __init__(self):
+        super().__init__()
+        self.field, self.value, self.headers = b"", b"", {}
+
+    def _header_end(self):
+        self.headers[self.field.lower()] = self.value
+        self.field = self.value = b""
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.headers.clear,
+            "on_header_field": lambda data, start, end: setattr(self, "field", self.field + data[start:end]),
+            "on_header_value": lambda data, start, end: setattr(self, "value", self.value + data[start:end]),
+            "on_header_end": self._header_end,
+            "on_headers_finished": lambda: self.append(("headers", dict(self.headers))),
+            "on_part_data": lambda data, start, end: self.append(("data", data[start:end])),
+            "on_part_end": lambda: self.append(("end", None)),
+        }
+
+def upload_form_schema(file_field: str, **fields: str) -> dict:
+    """``openapi_extra`` documenting a route's multipart body, which ``spool_form`` parses itself."""
+    properties = {file_field: {"type": "string", "format": "binary"}}
+    properties.update({name: {"type": kind} for name, kind in fields.items()})
+    schema = {"type": "object", "required": [file_field], "properties": properties}
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": schema}}}}
+
+def _limit_message(max_bytes: int) -> str:
+    return f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit"
+
+async def spool_form(request, file_field: str, directory: str, max_bytes: int,
+                     suffix: Optional[str] = None) -> SpooledForm:
+    """Parse a ``multipart/form-data`` request, spooling ``file_field`` and keeping the text fields.
+
+    ``suffix`` defaults to the uploaded file name's extension. Raises ``UploadTooLarge``
+    before reading anything when ``Content-Length`` is already over the limit.
+    """
+    length = request.headers.get("content-length")
+    if max_bytes and length and length.isdigit() and int(length) > max_bytes + _FORM_OVERHEAD:
+        raise UploadTooLarge(_limit_message(max_bytes))
+    ctype, params = parse_options_header(request.headers.get("content-type", ""))
+    if ctype != b"multipart/form-data" or b"boundary" not in params:
+        raise BadUpload("Expected a multipart/form-data upload")
+
+    os.makedirs(directory, exist_ok=True)
+    events = _PartEvents()
+    parser = MultipartParser(params[b"boundary"], events.callbacks())
+
+    digest, size, fields = hashlib.sha256(), 0, {}
+    path = filename = f = None
+    name, buffered, pending, field_bytes = None, bytearray(), bytearray(), 0
+    try:
+        async for chunk in request.stream():
+            try:
+                parser.write(chunk)
+            except Exception as e:
+                raise BadUpload(f"Malformed multipart body: {str(e)}")
+            for kind, value in events:
+                if kind == "headers":
+                    _, options = parse_options_header(value.get(b"content-disposition", b""))
+                    name = options.get(b"name", b"").decode("utf-8", "replace")
+                    if name == file_field and b"filename" in options and f is None:
+                        filename = options[b"filename"].decode("utf-8", "replace")
+                        ext = os.path.splitext(filename)[-1] if suffix is None else suffix
+                        path = os.path.join(directory, f"upload-{uuid.uuid4().hex}{ext}")
+                        f = open(path, "wb")
+                        buffered = None  # file data goes to the spool from here on
+                    else:
+                        buffered = bytearray()
+                elif kind == "data":
+                    if buffered is not None:
+                        field_bytes += len(value)
+                        if field_bytes > _FORM_OVERHEAD:
+                            raise UploadTooLarge("Form fields exceed 64 KB")
+                        buffered += value
+                        continue
+                    size += len(value)
+                    if max_bytes and size > max_bytes:
+                        raise UploadTooLarge(_limit_message(max_bytes))
+                    digest.update(value)
+                    pending += value
+                    if len(pending) >= settings.upload_chunk_bytes:
+                        block, pending = pending, bytearray()
+                        await run_in("io", f.write, block)
+                elif kind == "end":
+                    if buffered is not None:
+                        fields[name] = bytes(buffered).decode("utf-8", "replace")
+                    buffered = bytearray()
+            events.clear()
+        if f is None:
+            raise BadUpload(f"Missing file field '{file_field}'")
+        if pending:
+            await run_in("io", f.write, pending)
+    except BaseException:
+        if f is not None:
+            f.close()
+            try: os.remove(path)
+            except Exception: pass
+        raise
+    f.close()
+    return SpooledForm(upload=SpooledUpload(path=path, size=size, sha256=digest.hexdigest()),
+                       filename=filename, fields=fields)
@@ -0,0 +1,117 @@
+"""Energy-based voice activity detection on 16 kHz mono PCM.
+
+Audio is cut into ``asr_vad_frame_ms`` frames and each frame's RMS level (dBFS) is
+compared with a threshold: the larger of ``asr_vad_threshold_db`` and the tracked
+noise floor plus ``asr_vad_margin_db``. ``Segmenter`` turns a live stream into
+utterances (``asr_vad_min_speech_ms`` of speech opens one, ``asr_vad_end_silence_ms``
+of silence closes it); ``frame_db`` is also usable on whole recordings at once.
+"""
+from collections import deque
+from typing import List, Optional
+import numpy as np
+from .settings import settings
+
+SAMPLE_RATE = 16000
+
+def frame_size(sample_rate: int = SAMPLE_RATE) -> int:
+    return max(int(sample_rate * settings.asr_vad_frame_ms / 1000), 1)
+
+def frame_db(audio: np.ndarray, size: int) -> np.ndarray:
+    """RMS level in dBFS of each full ``size``-sample frame of float32 audio in [-1, 1]."""
+    n = len(audio) // size
+    if not n:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:n * size].reshape(n, size)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-6))
+
+def pcm16_to_float(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+
+def resample(audio: np.ndarray, rate: int, target: int = SAMPLE_RATE) -> np.ndarray:
+    """Linear resampling; plenty for speech going into Whisper's 16 kHz log-mel frontend."""
+    if rate == target or not len(audio):
+        return audio
+    n = int(round(len(audio) * target / rate))
+    return np.interp(np.linspace(0, len(audio) - 1, n), np.arange(len(audio)), audio).astype(np.float32)
+
+class Segmenter:
+    """Incremental utterance segmentation of a 16 kHz float32 stream.
+
+    ``feed`` returns the utterances completed by the new audio as
+    ``(start_s, end_s, audio)``; ``current`` is the utterance still in progress
+    (for partial transcripts) and ``flush`` closes it at end of stream.
+    """
+
+    def __init__(self):
+        self.size = frame_size()
+        ms = lambda v: max(int(v / settings.asr_vad_frame_ms), 1)
+        self.min_speech = ms(settings.asr_vad_min_speech_ms)
+        self.end_silence = ms(settings.asr_vad_end_silence_ms)
+        self.max_frames = ms(settings.asr_stream_max_utterance_s * 1000)
+        self.preroll = deque(maxlen=ms(settings.asr_vad_preroll_ms) + self.min_speech)
+        self.noise_floor = -60.0
+        self.in_speech = False
+        self.utterances = 0  # utterances emitted so far
+        self._rem = np.zeros(0, dtype=np.float32)
+        self._frames: List[np.ndarray] = []
+        self._speech_run = 0
+        self._silence = 0
+        self._offset = 0  # frames consumed since the start of the stream
+        self._start = 0  # frame index where the current utterance starts
+
+    def threshold(self) -> float:
+        return max(settings.asr_vad_threshold_db, self.noise_floor + settings.asr_vad_margin_db)
+
+    def feed(self, audio: np.ndarray) -> List[tuple]:
+        audio = np.concatenate([self._rem, audio]) if len(self._rem) else audio
+        n = len(audio) // self.size
+        self._rem = audio[n * self.size:]
+        done = []
+        for frame, db in zip(audio[:n * self.size].reshape(n, self.size), frame_db(audio, self.size)):
+            speech = db > self.threshold()
+            self._offset += 1
+            if not self.in_speech:
+                self.preroll.append(frame)
+                self._speech_run = self._speech_run + 1 if speech else 0
+                if not speech:
+                    self.noise_floor = 0.95 * self.noise_floor + 0.05 * float(db)
+                if self._speech_run >= self.min_speech:
+                    self.in_speech, self._silence = True, 0
+                    self._frames = list(self.preroll)
+                    self._start = self._offset - len(self._frames)
+                    self.preroll.clear()
+                continue
+            self._frames.append(frame)
+            self._silence = 0 if speech else self._silence + 1
+            if self._silence >= self.end_silence:
+                done.append(self._emit(keep_trailing=self.end_silence // 2))
+                self.in_speech, self._speech_run = False, 0
+            elif len(self._frames) >= self.max_frames:
+                done.append(self._emit())  # long monologue: cut here and keep going
+        return done
+
+    def _emit(self, keep_trailing: Optional[int] = None) -> tuple:
+        frames = self._frames
+        if keep_trailing is not None:  # drop most of the closing silence
+            frames = frames[:len(frames) - self._silence + keep_trailing]
+        start = self._start
+        self._start += len(self._frames)
+        self._frames, self._silence = [], 0
+        self.utterances += 1
+        return (start * self.size / SAMPLE_RATE, (start + len(frames)) * self.size / SAMPLE_RATE,
+                np.concatenate(frames) if frames else np.zeros(0, dtype=np.float32))
+
+    def current(self) -> Optional[np.ndarray]:
+        if not self.in_speech or not self._frames:
+            return None
+        return np.concatenate(self._frames)
+
+    def current_start(self) -> float:
+        return self._start * self.size / SAMPLE_RATE
+
+    def flush(self) -> Optional[tuple]:
+        if not self.in_speech or not self._frames:
+            return None
+        self.in_speech = False
+        return self._emit(keep_trailing=self.end_silence // 2)
@@ -0,0 +1,389 @@
+"""Vector store abstraction used by rag (document chunks) and memory (conversation turns).
+
+``settings.vector_backend`` selects the implementation:
+
+* ``chroma``          - the Chroma server at ``settings.chroma_url`` (default, multi-process)
+* ``chroma-embedded`` - Chroma persistent mode in ``settings.vector_dir``, no server hop
+* ``numpy``           - in-process brute-force index persisted to ``settings.vector_dir``;
+                        no extra dependencies, suited to single-node setups, tests and benchmarks
+* ``compact``         - int8/fp16 memory-mapped index with exact re-scoring (app/compact_index.py)
+
+The API and the worker both write (memory turns vs. compaction, ingest). ``compact``
+serialises writers through SQLite's lock and ``numpy`` merges on save under a file
+lock; ``chroma-embedded`` keeps state in the process that opened it, so use it only
+with every role and the worker's jobs in one process, or use the Chroma server.
+Distances are squared L2 for every backend (Chroma's default), and
+``VectorStore.similarity`` turns them into scores that stay comparable when
+switching backends.
+"""
+import atexit, fcntl, json, os, threading, time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+from .settings import settings
+
+class VectorStore(ABC):
+    """One named collection of (id, embedding, document, metadata) records.
+
+    ``where`` filters use Chroma's syntax: ``{"key": value}``, ``{"key": {"$gte": v}}``
+    (``$eq $ne $gt $gte $lt $lte $in $nin``) combined with ``$and`` / ``$or``.
+    Query and get results are lists of ``{"id", "document", "metadata", "distance"}``.
+    """
+
+    name: str
+
+    @abstractmethod
+    def upsert(self, ids: List[str], embeddings, documents: Optional[List[str]] = None,
+               metadatas: Optional[List[dict]] = None):
+        """Insert or replace records by id."""
+
+    @abstractmethod
+    def query(self, embedding, k: int, where: Optional[dict] = None) -> List[dict]:
+        """The ``k`` nearest records (squared L2), optionally filtered by ``where``."""
+
+    @abstractmethod
+    def get(self, ids: Optional[List[str]] = None, where: Optional[dict] = None) -> List[dict]:
+        """Records by id and/or filter, without distances."""
+
+    @abstractmethod
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[dict] = None):
+        """Remove records by id and/or filter."""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of records in the collection."""
+
+    @staticmethod
+    def similarity(distance: float) -> float:
+        """Cosine similarity for a squared-L2 ``distance`` between unit vectors: 1 - d/2."""
+        return 1.0 - distance / 2.0
+
+    def save(self):
+        """Persist buffered writes (no-op for backends that write through)."""
+
+# --- chroma (HTTP or persistent) ------------------------------------------
+
+class ChromaStore(VectorStore):
+    def __init__(self, collection):
+        self._col = collection
+        self.name = collection.name
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        self._col.upsert(ids=ids, embeddings=[list(map(float, e)) for e in embeddings],
+                         documents=documents, metadatas=metadatas)
+
+    def query(self, embedding, k, where=None):
+        if k <= 0:
+            return []
+        res = self._col.query(query_embeddings=[list(map(float, embedding))], n_results=k, where=where or None,
+                              include=["documents", "metadatas", "distances"])
+        if not res.get("ids") or not res["ids"][0]:
+            return []
+        return [
+            {"id": i, "document": d, "metadata": m or {}, "distance": dist}
+            for i, d, m, dist in zip(res["ids"][0], res["documents"][0], res["metadatas"][0], res["distances"][0])
+        ]
+
+    def get(self, ids=None, where=None):
+        res = self._col.get(ids=ids, where=where or None, include=["documents", "metadatas"])
+        return [
+            {"id": i, "document": d, "metadata": m or {}, "distance": None}
+            for i, d, m in zip(res.get("ids", []), res.get("documents", []), res.get("metadatas", []))
+        ]
+
+    def delete(self, ids=None, where=None):
+        if ids is not None and not ids:
+            return
+        self._col.delete(ids=ids, where=where or None)
+
+    def count(self):
+        return self._col.count()
+
+# --- numpy brute force ----------------------------------------------------
+
+_OPS = {
+    "$eq": lambda a, b: a == b,
+    "$ne": lambda a, b: a != b,
+    "$gt": lambda a, b: a is not None and a > b,
+    "$gte": lambda a, b: a is not None and a >= b,
+    "$lt": lambda a, b: a is not None and a < b,
+    "$lte": lambda a, b: a is not None and a <= b,
+    "$in": lambda a, b: a in b,
+    "$nin": lambda a, b: a not in b,
+}
+
+def matches(meta: dict, where: Optional[dict]) -> bool:
+    """Evaluate a Chroma-style ``where`` filter against one metadata dict."""
+    if not where:
+        return True
+    for key, cond in where.items():
+        if key == "$and":
+            if not all(matches(meta, c) for c in cond):
+                return False
+        elif key == "$or":
+            if not any(matches(meta, c) for c in cond):
+                return False
+        elif isinstance(cond, dict):
+            if key not in meta:
+                return False
+            if not all(_OPS[op](meta[key], v) for op, v in cond.items()):
+                return False
+        elif meta.get(key) != cond:
+            return False
+    return True
+
+class NumpyStore(VectorStore):
+    """Exact search over an in-memory float32 matrix.
+
+    Writes are persisted to ``{vector_dir}/{name}.npy`` + ``.json`` at most every
+    ``vector_persist_interval`` seconds (and at exit); readers reload when the files
+    on disk changed. Writes not yet saved are kept as an operation log: when another
+    process saved in the meantime, the log is replayed on top of its data (on reload,
+    and under ``{name}.lock`` when saving), so concurrent writers never erase each other.
+    """
+
+    def __init__(self, name: str, directory: str):
+        self.name = name
+        self._dir = directory
+        self._lock = threading.RLock()
+        self._ids: List[str] = []
+        self._docs: List[Optional[str]] = []
+        self._metas: List[dict] = []
+        self._index: Dict[str, int] = {}
+        self._vecs = None
+        self._pending: list = []  # ("upsert", ids, vecs, docs, metas) / ("delete", ids, where) since the last save
+        self._saved_at = 0.0
+        self._loaded_stat = None
+        self._load()
+
+    @property
+    def _paths(self):
+        base = os.path.join(self._dir, self.name)
+        return f"{base}.npy", f"{base}.json"
+
+    def _stat(self):
+        # Every save renames a new file into place, so the inode changes even within one mtime tick
+        try:
+            st = os.stat(self._paths[1])
+            return st.st_ino, st.st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self) -> bool:
+        import numpy as np
+        vec_path, meta_path = self._paths
+        stat = self._stat()
+        if stat is None:
+            return False
+        with open(meta_path) as f:
+            meta = json.load(f)
+        vecs = np.load(vec_path)
+        if len(meta["ids"]) and vecs.shape[0] != len(meta["ids"]):
+            return False  # caught between the two renames of a concurrent save; retry on next access
+        self._ids, self._docs, self._metas = meta["ids"], meta["documents"], meta["metadatas"]
+        self._index = {i: n for n, i in enumerate(self._ids)}
+        self._vecs = vecs if len(self._ids) else None
+        self._loaded_stat = stat
+        return True
+
+    def _refresh(self):
+        """Pick up another process's save, then re-apply our unsaved writes on top of it."""
+        if self._stat() != self._loaded_stat and self._load():
+            for op in self._pending:
+                if op[0] == "upsert":
+                    self._apply_upsert(*op[1:])
+                else:
+                    self._apply_delete(*op[1:])
+
+    def save(self):
+        import numpy as np
+        with self._lock:
+            if not self._pending:
+                return
+            os.makedirs(self._dir, exist_ok=True)
+            vec_path, meta_path = self._paths
+            with open(os.path.join(self._dir, f"{self.name}.lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)  # released when the file closes
+                self._refresh()
+                vecs = self._vecs if self._vecs is not None else np.zeros((0, 0), dtype=np.float32)
+                with open(vec_path + ".tmp", "wb") as f:
+                    np.save(f, vecs)
+                with open(meta_path + ".tmp", "w") as f:
+                    json.dump({"ids": self._ids, "documents": self._docs, "metadatas": self._metas}, f)
+                os.replace(vec_path + ".tmp", vec_path)
+                os.replace(meta_path + ".tmp", meta_path)
+                self._loaded_stat = self._stat()
+            self._pending = []
+            self._saved_at = time.monotonic()
+
+    def _touch(self):
+        if time.monotonic() - self._saved_at >= settings.vector_persist_interval:
+            self.save()
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        import numpy as np
+        if not ids:
+            return
+        vecs = np.asarray(embeddings, dtype=np.float32)
+        documents = list(documents) if documents is not None else [None] * len(ids)
+        metadatas = [dict(m or {}) for m in metadatas] if metadatas is not None else [{} for _ in ids]
+        with self._lock:
+            self._refresh()
+            self._apply_upsert(list(ids), vecs, documents, metadatas)
+            self._pending.append(("upsert", list(ids), vecs, documents, metadatas))
+            self._touch()
+
+    def _apply_upsert(self, ids, vecs, documents, metadatas):
+        import numpy as np
+        new_rows = []
+        last = {id_: n for n, id_ in enumerate(ids)}  # later duplicates win, as in Chroma
+        for id_, n in last.items():
+            row = self._index.get(id_)
+            if row is None:
+                new_rows.append(n)
+                continue
+            self._vecs[row] = vecs[n]
+            self._docs[row] = documents[n]
+            self._metas[row] = dict(metadatas[n])
+        if new_rows:
+            start = len(self._ids)
+            for off, n in enumerate(new_rows):
+                self._ids.append(ids[n])
+                self._docs.append(documents[n])
+                self._metas.append(dict(metadatas[n]))
+                self._index[ids[n]] = start + off
+            added = vecs[new_rows]
+            self._vecs = added if self._vecs is None else np.vstack([self._vecs, added])
+
+    def _rows(self, ids=None, where=None) -> List[int]:
+        if ids is not None:
+            rows = [self._index[i] for i in ids if i in self._index]
+        else:
+            rows = range(len(self._ids))
+        return [r for r in rows if matches(self._metas[r], where)]
+
+    def query(self, embedding, k, where=None):
+        import numpy as np
+        with self._lock:
+            self._refresh()
+            if self._vecs is None or k <= 0:
+                return []
+            q = np.asarray(embedding, dtype=np.float32)
+            vecs, rows = self._vecs, None
+            if where:
+                rows = np.asarray(self._rows(where=where), dtype=np.int64)
+                if not len(rows):
+                    return []
+                vecs = vecs[rows]
+            # Squared L2 without materialising (vecs - q)
+            dist = (vecs * vecs).sum(axis=1) - 2 * (vecs @ q) + float(q @ q)
+            k = min(k, len(dist))
+            top = np.argpartition(dist, k - 1)[:k]
+            top = top[np.argsort(dist[top])]
+            out = []
+            for t in top:
+                r = int(rows[t]) if rows is not None else int(t)
+                out.append({"id": self._ids[r], "document": self._docs[r],
+                            "metadata": self._metas[r], "distance": float(dist[t])})
+            return out
+
+    def get(self, ids=None, where=None):
+        with self._lock:
+            self._refresh()
+            return [{"id": self._ids[r], "document": self._docs[r], "metadata": self._metas[r], "distance": None}
+                    for r in self._rows(ids, where)]
+
+    def delete(self, ids=None, where=None):
+        with self._lock:
+            self._refresh()
+            ids = list(ids) if ids is not None else None
+            if self._apply_delete(ids, where):
+                self._pending.append(("delete", ids, where))
+                self._touch()
+
+    def _apply_delete(self, ids, where) -> bool:
+        import numpy as np
+        drop = set(self._rows(ids, where))
+        if not drop:
+            return False
+        keep = [r for r in range(len(self._ids)) if r not in drop]
+        self._ids = [self._ids[r] for r in keep]
+        self._docs = [self._docs[r] for r in keep]
+        self._metas = [self._metas[r] for r in keep]
+        self._index = {i: n for n, i in enumerate(self._ids)}
+        self._vecs = self._vecs[np.asarray(keep, dtype=np.int64)] if keep else None
+        return True
+
+    def count(self):
+        with self._lock:
+            self._refresh()
+            return len(self._ids)
+
+# --- factory --------------------------------------------------------------
+
+_client = None
+_stores: Dict[str, VectorStore] = {}
+_lock = threading.Lock()
+
+def _chroma_client():
+    global _client
+    if _client is None:
+        import chromadb  # heavy; only processes that touch the vector store pay for it
+        if settings.vector_backend == "chroma-embedded":
+            _client = chromadb.PersistentClient(path=settings.vector_dir)
+        else:
+            url = urlparse(settings.chroma_url)
+            _client = chromadb.HttpClient(host=url.hostname, port=url.port or 8000)
+    return _client
+
+def get_store(name: str) -> VectorStore:
+    """Process-wide handle for collection ``name`` on the configured backend (created on first use)."""
+    store = _stores.get(name)
+    if store is not None:
+        return store
+    with _lock:
+        store = _stores.get(name)
+        if store is None:
+            backend = settings.vector_backend
+            if backend in ("chroma", "chroma-embedded"):
+                store = ChromaStore(_chroma_client().get_or_create_collection(name))
+            elif backend == "numpy":
+                store = NumpyStore(name, settings.vector_dir)
+            elif backend == "compact":
+                from .compact_index import CompactStore
+                store = CompactStore(name, settings.vector_dir)
+            else:
+                raise ValueError(f"Unknown vector_backend '{backend}'; expected chroma, chroma-embedded, numpy or compact")
+            _stores[name] = store
+    return store
+
+def list_stores(prefix: str = "") -> List[str]:
+    """Names of existing collections (optionally only those starting with ``prefix``)."""
+    if settings.vector_backend == "numpy":
+        names = set(_stores)
+        if os.path.isdir(settings.vector_dir):
+            names |= {f[:-len(".json")] for f in os.listdir(settings.vector_dir) if f.endswith(".json")}
+    elif settings.vector_backend == "compact":
+        names = set(_stores)
+        if os.path.isdir(settings.vector_dir):
+            names |= {f for f in os.listdir(settings.vector_dir)
+                      if os.path.exists(os.path.join(settings.vector_dir, f, "meta.sqlite"))}
+    else:
+        names = {getattr(c, "name", c) for c in _chroma_client().list_collections()}
+    return sorted(n for n in names if n.startswith(prefix))
+
+def ping():
+    """Raise if the backend is unreachable (used by /readyz)."""
+    if settings.vector_backend in ("chroma", "chroma-embedded"):
+        _chroma_client().heartbeat()
+    else:
+        os.makedirs(settings.vector_dir, exist_ok=True)
+
+@atexit.register
+def save_all():
+    """Persist pending writes (and run maintenance) of in-process stores."""
+    for store in list(_stores.values()):
+        try:
+            store.save()
+        except Exception as e:
+            print(f"⚠️ Warning: could not persist vector store {store.name}: {str(e)}")
@@ -0,0 +1,27 @@
+"""Background ingest + maintenance worker.
+
+Run alongside the API with the same environment (and a shared spool volume):
+
+    python -m app.worker
+    python -m app.worker compact-memory   # one-off compaction of every user (e.g. from cron)
+"""
+import sys
+from rq import SimpleWorker
+from .jobs import _get_redis, get_ingest_queue, get_maintenance_queue, run_compaction
+from .models import get_registry
+from .settings import settings
+
+def main():
+    if sys.argv[1:] == ["compact-memory"]:
+        run_compaction()
+        return
+    # Jobs run in this process (no work horse fork per job), so the models loaded here and
+    # the in-memory embedding cache serve every job instead of being rebuilt for each one
+    preload = [n.strip() for n in settings.worker_preload_models.split(",") if n.strip()]
+    get_registry().preload(preload, settings.preload_warmup)
+    print(f"👷 Starting worker on queues '{settings.ingest_queue}', '{settings.maintenance_queue}'")
+    # The scheduler is needed for Retry intervals between failed attempts
+    SimpleWorker([get_ingest_queue(), get_maintenance_queue()], connection=_get_redis()).work(with_scheduler=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Cold import/startup time per API role, each measured in a fresh interpreter.
+
+Run from ``api/``:
+
+    python -m bench.bench_import_time --repeat 5
+
+For every role it times building the app (imports included) and lists the
+heaviest top-level packages from ``python -X importtime``, so a heavy library
+creeping back into the chat path shows up immediately.
+"""
+import argparse, os, re, statistics, subprocess, sys
+from collections import defaultdict
+
+ROLES = {
+    "chat": "from app.serve import chat_app; chat_app()",
+    "asr": "from app.serve import asr_app; asr_app()",
+    "all": "import app.main",
+    "ingest-worker": "import app.worker",
+}
+
+# Settings has required fields; dummy values are enough to import and build the apps
+ENV = {
+    "OPENAI_BASE_URL": "http://localhost:1234/v1", "OPENAI_CHAT_MODEL": "bench",
+    "CHROMA_URL": "http://localhost:8000", "REDIS_URL": "redis://localhost:6379/0",
+    "MINIO_ENDPOINT": "http://localhost:9000", "MINIO_ACCESS_KEY": "x", "MINIO_SECRET_KEY": "x",
+}
+
+_line = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+def _run(code: str):
+    env = {**ENV, **os.environ}
+    timed = f"import time; t0 = time.perf_counter(); {code}; print('WALL', time.perf_counter() - t0)"
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", timed], env=env,
+                         capture_output=True, text=True, check=True)
+    wall = float(out.stdout.strip().splitlines()[-1].split()[1])
+    top = defaultdict(int)
+    for m in _line.finditer(out.stderr):
+        cumulative, indent, module = int(m.group(2)), len(m.group(3)), m.group(4)
+        if indent <= 1:  # top-level imports only; cumulative already includes children
+            top[module.split(".")[0]] += cumulative
+    return wall, top
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--roles", nargs="+", default=list(ROLES), choices=list(ROLES))
+    ap.add_argument("--top", type=int, default=6)
+    args = ap.parse_args()
+
+    for role in args.roles:
+        runs = [_run(ROLES[role]) for _ in range(args.repeat)]
+        walls = [w for w, _ in runs]
+        heaviest = sorted(runs[-1][1].items(), key=lambda kv: -kv[1])[:args.top]
+        print(f"{role:<14} median {statistics.median(walls) * 1000:8.1f} ms  min {min(walls) * 1000:8.1f} ms")
+        print("               " + ", ".join(f"{mod} {us / 1000:.0f}ms" for mod, us in heaviest))
+
+if __name__ == "__main__":
+    main()
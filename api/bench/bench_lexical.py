@@ -0,0 +1,117 @@
+"""Lexical (BM25) search latency and recall on a synthetic clinical corpus.
+
+Chunks of ~180 tokens are drawn from a Zipf vocabulary whose most frequent words
+are common clinical terms ("patient", "dose", "blood", ...), sprinkled with rare
+codes (``E11.9``-style) and doses (``500 mg``, ``500-mg``). Queries mix rare-term, common-term
+and dose lookups. Quality is measured against the same index read with no cap on
+postings per query term: recall@k, and the share of the reference top-k's BM25
+score that the capped top-k reaches. The share matters for common terms, where
+many chunks tie and recall depends on an arbitrary tie-break. Run from ``api/``:
+
+    python -m bench.bench_lexical --n 1000000 --queries 200
+    python -m bench.bench_lexical --n 1000000 --reuse /tmp/lexical-1m.sqlite   # skip the build next time
+"""
+import argparse, os, random, statistics, tempfile, time
+
+from app.lexical import LexicalIndex
+from app.settings import settings
+
+COMMON = ("patient dose blood pressure renal insulin daily treatment mg risk clinical therapy "
+          "heart failure diabetes kidney glucose infection acute chronic hospital oral").split()
+
+COMMON_QUERIES = ["insulin dose", "patient renal blood pressure", "heart failure treatment",
+                  "chronic kidney disease diabetes", "acute infection oral therapy", "daily dose mg"]
+
+def _vocab(size, rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set(COMMON)
+    while len(words) < size:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(4, 10))))
+    rest = sorted(words - set(COMMON))
+    rng.shuffle(rest)
+    return list(COMMON) + rest
+
+def _corpus(n, rng, vocab, codes):
+    cum, total = [], 0.0
+    for r in range(len(vocab)):
+        total += 1 / (r + 1) ** 1.05
+        cum.append(total)
+    for i in range(n):
+        words = rng.choices(vocab, cum_weights=cum, k=180)
+        if rng.random() < 0.05:
+            words.insert(rng.randrange(len(words)), rng.choice(codes))
+        if rng.random() < 0.2:
+            pos = rng.randrange(len(words))
+            dose = rng.choice((5, 10, 250, 500, 1000))
+            words[pos:pos] = [f"{dose}-mg"] if rng.random() < 0.5 else [str(dose), "mg"]
+        yield f"c{i}", " ".join(words), {"doc_id": f"d{i // 200}", "title": f"Doc {i // 200}", "page": i % 200 + 1}
+
+def _build(path, n, seed, batch=5000):
+    rng = random.Random(seed)
+    vocab = _vocab(60000, rng)
+    codes = [f"{rng.choice('EIJKN')}{rng.randint(10, 99)}.{rng.randint(0, 9)}" for _ in range(2000)]
+    index = LexicalIndex(path)
+    t0, items = time.perf_counter(), []
+    for item in _corpus(n, rng, vocab, codes):
+        items.append(item)
+        if len(items) == batch:
+            index.add(items)
+            items = []
+    index.add(items)
+    print(f"built {index.count()} chunks in {time.perf_counter() - t0:.0f}s, "
+          f"{os.path.getsize(path) / 1e6:.0f} MB on disk")
+    return vocab, codes
+
+def _pct(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))] * 1000
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--n", type=int, default=1_000_000)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--reuse", help="index file to build once and reuse across runs")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    path = args.reuse or os.path.join(tempfile.mkdtemp(), "lexical.sqlite")
+    rng = random.Random(args.seed)
+    vocab = _vocab(60000, rng)
+    codes = [f"{rng.choice('EIJKN')}{rng.randint(10, 99)}.{rng.randint(0, 9)}" for _ in range(2000)]
+    if not (args.reuse and os.path.exists(path)):
+        _build(path, args.n, args.seed)
+    index = LexicalIndex(path)
+
+    qrng = random.Random(args.seed + 1)
+    suites = {
+        "rare code": [qrng.choice(codes) for _ in range(args.queries)],
+        "rare word": [qrng.choice(vocab[5000:]) for _ in range(args.queries)],
+        "common": [qrng.choice(COMMON_QUERIES) for _ in range(args.queries)],
+        "mixed": [f"{qrng.choice(COMMON)} {qrng.choice(vocab[1000:])} {qrng.choice(codes)}" for _ in range(args.queries)],
+        "dose": [f"{qrng.choice(('5', '250', '500'))}-mg {qrng.choice(COMMON)}" for _ in range(args.queries)],
+    }
+    cap = settings.lexical_max_postings
+    print(f"{index.count()} chunks, lexical_max_postings={cap}")
+    print(f"{'queries':<10} {'p50 ms':>8} {'p99 ms':>8} {'recall@k':>9} {'score':>6}")
+    for label, queries in suites.items():
+        for q in queries[:10]:  # warm the page cache
+            index.search(q, args.k)
+        lat, recall, share = [], [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            got = index.search(q, args.k)
+            lat.append(time.perf_counter() - t0)
+            settings.lexical_max_postings = 10 ** 9
+            exact = index.search(q, args.k)
+            settings.lexical_max_postings = cap
+            if exact:
+                ids = {h["chunk_id"] for h in got}
+                recall.append(sum(h["chunk_id"] in ids for h in exact) / len(exact))
+                share.append(min(sum(h["score"] for h in got) / sum(h["score"] for h in exact), 1.0))
+        rec = f"{statistics.mean(recall):.3f}" if recall else "-"
+        sc = f"{statistics.mean(share):.3f}" if share else "-"
+        print(f"{label:<10} {_pct(lat, 50):>8.2f} {_pct(lat, 99):>8.2f} {rec:>9} {sc:>6}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Real-time factor of a long recording: one serial transcribe() vs. the chunked pool.
+
+Runs in-process (no API needed); the model is loaded with ``ASR_WORKERS`` workers:
+
+    ASR_WORKERS=4 ASR_CPU_THREADS=4 python -m bench.bench_long_transcribe consult-1h.m4a
+
+Prints wall time and real-time factor (wall / audio duration, lower is better) for
+both, plus the chunk count and the slowest chunk of the pooled run.
+"""
+import argparse, asyncio, time
+
+from app.asr_pool import decode_audio, get_transcription_pool
+from app.models import get_registry
+from app.settings import settings
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("audio")
+    ap.add_argument("--skip-serial", action="store_true")
+    args = ap.parse_args()
+
+    model = get_registry().get("asr")
+    duration = len(decode_audio(args.audio)) / 16000
+    print(f"{args.audio}: {duration / 60:.1f} min, asr_workers={settings.asr_workers} "
+          f"cpu_threads={settings.asr_cpu_threads or 'default'}")
+
+    if not args.skip_serial:
+        t0 = time.perf_counter()
+        segments, _ = model.transcribe(args.audio)
+        n = len(list(segments))
+        wall = time.perf_counter() - t0
+        print(f"{'serial':<8} {wall:>8.1f}s  RTF {wall / duration:.3f}  segments={n}")
+
+    result = asyncio.run(get_transcription_pool().transcribe_file(args.audio))
+    wall = result["timings"]["total_s"]
+    slowest = max((c["decode_s"] for c in result["chunks"]), default=0.0)
+    print(f"{'pooled':<8} {wall:>8.1f}s  RTF {wall / duration:.3f}  segments={len(result['segments'])} "
+          f"chunks={len(result['chunks'])} slowest chunk {slowest:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""Pages/second of parse_pdf_to_sections, serial vs. process-pool parallel.
+
+Run from ``api/`` with the usual API environment (MinIO is used for image uploads):
+
+    python -m bench.bench_parsing guideline.pdf --workers 1 2 4 8 --repeat 2
+"""
+import argparse, hashlib, time
+
+from app.parsing import parse_pdf_to_sections
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("pdf")
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    ap.add_argument("--repeat", type=int, default=1)
+    args = ap.parse_args()
+
+    with open(args.pdf, "rb") as f:
+        data = f.read()
+    doc_id = hashlib.sha256(data).hexdigest()[:16]
+
+    baseline = None
+    print(f"{'workers':>8} {'pages':>6} {'best s':>8} {'pages/s':>9} {'speedup':>8}")
+    for workers in args.workers:
+        best, pages = float("inf"), 0
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            parsed = parse_pdf_to_sections(args.pdf, args.pdf, doc_id, workers=workers)
+            best = min(best, time.perf_counter() - t0)
+            pages = len(parsed["pages"])
+        rate = pages / best if best else 0.0
+        baseline = baseline or rate
+        print(f"{workers:>8} {pages:>6} {best:>8.2f} {rate:>9.2f} {rate / baseline:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
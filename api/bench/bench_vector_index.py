@@ -0,0 +1,89 @@
+"""Memory, disk, latency and recall@k of the compact int8/fp16 index vs. the float32 stores.
+
+Synthetic clustered unit vectors (bge-m3 sized by default) are loaded into the
+in-process float32 NumPy store (exact, the reference) and the compact backend in
+int8 and fp16; ``--chroma`` also loads them into the configured Chroma server.
+Run from ``api/`` with the usual API environment:
+
+    python -m bench.bench_vector_index --n 200000 --dim 1024 --queries 200 --k 10
+"""
+import argparse, gc, shutil, tempfile, time, uuid
+
+import numpy as np
+
+from app.compact_index import CompactStore
+from app.models import _rss_bytes
+from app.vectorstore import NumpyStore
+
+def _dataset(n, dim, queries, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(n // 1000, 16), dim)).astype(np.float32)
+    x = centers[rng.integers(len(centers), size=n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    q = x[rng.integers(n, size=queries)] + 0.3 * rng.normal(size=(queries, dim)).astype(np.float32)
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    return x, q
+
+def _load(store, x, batch):
+    ids = [f"doc:{i}" for i in range(len(x))]
+    for s in range(0, len(x), batch):
+        store.upsert(ids[s:s + batch], x[s:s + batch], documents=[""] * len(ids[s:s + batch]),
+                     metadatas=[{"type": "text"}] * len(ids[s:s + batch]))
+
+def _run(label, store, x, q, k, batch, truth):
+    gc.collect()
+    rss0 = _rss_bytes()
+    t0 = time.perf_counter()
+    _load(store, x, batch)
+    build_s = time.perf_counter() - t0
+    lat, hits = [], []
+    for vec in q:
+        t0 = time.perf_counter()
+        hits.append([r["id"] for r in store.query(vec, k)])
+        lat.append(time.perf_counter() - t0)
+    rss = max(_rss_bytes() - rss0, 0)
+    recall = float(np.mean([len(set(h) & t) / k for h, t in zip(hits, truth)])) if truth else 1.0
+    disk = sum(store.footprint().values()) if hasattr(store, "footprint") else 0
+    lat_ms = np.array(lat) * 1000
+    print(f"{label:<14} {build_s:>8.1f} {rss / 2**20:>9.1f} {disk / 2**20:>9.1f} "
+          f"{np.percentile(lat_ms, 50):>8.2f} {np.percentile(lat_ms, 99):>8.2f} {recall:>9.3f}")
+    return hits
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--n", type=int, default=100000)
+    ap.add_argument("--dim", type=int, default=1024)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--batch", type=int, default=5000)
+    ap.add_argument("--chroma", action="store_true", help="also measure the Chroma server at CHROMA_URL")
+    args = ap.parse_args()
+
+    x, q = _dataset(args.n, args.dim, args.queries)
+    print(f"{args.n} x {args.dim} vectors: float32 {x.nbytes / 2**20:.1f} MiB, "
+          f"~{len(','.join(f'{v:.8f}' for v in x[0])) * args.n / 2**20:.1f} MiB as JSON float lists")
+    print(f"{'store':<14} {'build s':>8} {'RSS MiB':>9} {'disk MiB':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'recall@' + str(args.k):>9}")
+
+    root = tempfile.mkdtemp(prefix="medran-bench-")
+    try:
+        exact = NumpyStore("bench", root + "/numpy")
+        truth = [set(h) for h in _run("numpy fp32", exact, x, q, args.k, args.batch, None)]
+        del exact
+        for dtype in ("int8", "fp16"):
+            store = CompactStore(f"bench_{dtype}", root, dtype=dtype)
+            _run(f"compact {dtype}", store, x, q, args.k, args.batch, truth)
+            del store
+        if args.chroma:
+            from app.vectorstore import ChromaStore, _chroma_client
+            name = f"bench_{uuid.uuid4().hex[:8]}"
+            client = _chroma_client()
+            try:
+                _run("chroma", ChromaStore(client.get_or_create_collection(name)), x, q, args.k, args.batch, truth)
+            finally:
+                client.delete_collection(name)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
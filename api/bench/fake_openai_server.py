@@ -0,0 +1,54 @@
+"""Minimal OpenAI-compatible chat server for exercising the API without a real LLM.
+
+Streams a canned answer as SSE ``data:`` chunks (or returns it in one body when
+``stream`` is false), with a configurable per-token delay. With
+``FAKE_LLM_FAIL_AFTER=n`` the stream stops after ``n`` tokens with the ``{"error": ...}``
+event lmstudio/mlx-server.py sends when generation fails:
+
+    FAKE_LLM_TOKEN_DELAY=0.05 uvicorn bench.fake_openai_server:app --port 1234
+    OPENAI_BASE_URL=http://localhost:1234/v1 OPENAI_CHAT_MODEL=fake uvicorn app.main:app
+
+Try it with ``curl -N -XPOST localhost:8080/chat/stream -H 'content-type: application/json'
+-d '{"query": "hello", "remember": false}'``.
+"""
+import asyncio, json, os, time, uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+TOKEN_DELAY = float(os.getenv("FAKE_LLM_TOKEN_DELAY", "0.02"))
+ANSWER = os.getenv("FAKE_LLM_ANSWER", "This is a streamed answer from the fake LLM server [Guide p.1].")
+FAIL_AFTER = int(os.getenv("FAKE_LLM_FAIL_AFTER", "0"))  # 0 = never
+
+app = FastAPI(title="Fake OpenAI-compatible server")
+
+@app.get("/v1/models")
+async def models():
+    return {"object": "list", "data": [{"id": "fake", "object": "model", "created": 0, "owned_by": "bench"}]}
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    cid, created = f"chatcmpl-{uuid.uuid4()}", int(time.time())
+    words = ANSWER.split(" ")
+
+    if not body.get("stream"):
+        await asyncio.sleep(TOKEN_DELAY * len(words))
+        return {
+            "id": cid, "object": "chat.completion", "created": created, "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": ANSWER}, "finish_reason": "stop"}],
+        }
+
+    async def events():
+        for i, word in enumerate(words):
+            if FAIL_AFTER and i == FAIL_AFTER:
+                yield f"data: {json.dumps({'error': {'message': 'fake generation failure'}})}\n\n"
+                break
+            await asyncio.sleep(TOKEN_DELAY)
+            delta = {"content": word if i == 0 else " " + word}
+            chunk = {"id": cid, "object": "chat.completion.chunk", "created": created,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
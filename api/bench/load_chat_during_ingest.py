@@ -0,0 +1,80 @@
+"""/chat latency under load, before and while an ingest (and optionally a transcription) runs.
+
+Point it at a running API (the fake LLM from bench/fake_openai_server.py keeps the
+LLM out of the measurement):
+
+    python -m bench.load_chat_during_ingest --api http://localhost:8080 \\
+        --pdf guideline.pdf --audio consult.wav --concurrency 8 --seconds 30
+
+p99 in the "during ingest" phase should stay close to the baseline; /healthz latency
+is reported too since it used to freeze behind blocking work.
+"""
+import argparse, asyncio, statistics, time
+
+import httpx
+
+def _pct(samples, p):
+    if not samples:
+        return float("nan")
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))] * 1000
+
+async def _chat_loop(client, stop_at, latencies, errors, query):
+    while time.monotonic() < stop_at:
+        t0 = time.perf_counter()
+        try:
+            r = await client.post("/chat", json={"query": query, "remember": False, "return_images": False})
+            r.raise_for_status()
+            latencies.append(time.perf_counter() - t0)
+        except Exception:
+            errors.append(time.perf_counter() - t0)
+
+async def _health_loop(client, stop_at, latencies):
+    while time.monotonic() < stop_at:
+        t0 = time.perf_counter()
+        try:
+            await client.get("/healthz")
+            latencies.append(time.perf_counter() - t0)
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+
+async def _background_load(client, pdf, audio):
+    tasks = []
+    if pdf:
+        with open(pdf, "rb") as f:
+            tasks.append(client.post("/ingest", files={"file": (pdf.rsplit("/", 1)[-1], f.read(), "application/pdf")}))
+    if audio:
+        with open(audio, "rb") as f:
+            tasks.append(client.post("/transcribe", files={"audio": (audio.rsplit("/", 1)[-1], f.read())}))
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def _phase(args, label, with_load):
+    async with httpx.AsyncClient(base_url=args.api, timeout=300) as client:
+        stop_at = time.monotonic() + args.seconds
+        chat, health, errors = [], [], []
+        work = [_chat_loop(client, stop_at, chat, errors, args.query) for _ in range(args.concurrency)]
+        work.append(_health_loop(client, stop_at, health))
+        if with_load:
+            work.append(_background_load(client, args.pdf, args.audio))
+        await asyncio.gather(*work)
+    print(f"{label:<16} {len(chat):>6} {len(errors):>6} {_pct(chat, 50):>9.1f} {_pct(chat, 99):>9.1f} "
+          f"{(statistics.mean(chat) * 1000 if chat else float('nan')):>9.1f} {_pct(health, 99):>11.1f}")
+
+async def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--api", default="http://localhost:8080")
+    ap.add_argument("--pdf")
+    ap.add_argument("--audio")
+    ap.add_argument("--query", default="What is the first-line treatment for hypertension?")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--seconds", type=float, default=30)
+    args = ap.parse_args()
+
+    print(f"{'phase':<16} {'ok':>6} {'errors':>6} {'p50 ms':>9} {'p99 ms':>9} {'mean ms':>9} {'health p99':>11}")
+    await _phase(args, "baseline", with_load=False)
+    await _phase(args, "during ingest", with_load=True)
+
+if __name__ == "__main__":
+    asyncio.run(main())
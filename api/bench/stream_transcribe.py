@@ -0,0 +1,74 @@
+"""Live transcription latency: stream a WAV to ws /transcribe/stream at real-time pace.
+
+Run from ``api/`` against a running ASR role; several sessions at once exercise the
+shared scheduler:
+
+    python -m bench.stream_transcribe consult.wav --api ws://localhost:8080 --sessions 4
+
+Reports, per session, the delay from the end of each utterance (as timestamped by the
+server) to its final transcript, and how often partials arrived.
+"""
+import argparse, asyncio, json, statistics, time, wave
+
+import websockets
+
+def _read_wav(path):
+    with wave.open(path, "rb") as w:
+        if w.getsampwidth() != 2 or w.getnchannels() != 1:
+            raise SystemExit("expected 16-bit mono WAV (ffmpeg -i in.m4a -ac 1 -ar 16000 out.wav)")
+        return w.readframes(w.getnframes()), w.getframerate()
+
+async def _session(args, pcm, rate, idx):
+    url = f"{args.api}/transcribe/stream?format=pcm&sample_rate={rate}"
+    frame = int(rate * args.frame_ms / 1000) * 2
+    finals, partials = [], 0
+    async with websockets.connect(url, max_size=None) as ws:
+        ready = json.loads(await ws.recv())
+        if ready.get("type") != "ready":
+            print(f"session {idx}: {ready}")
+            return []
+        t0 = time.monotonic()
+
+        async def sender():
+            for i, off in enumerate(range(0, len(pcm), frame)):
+                await ws.send(pcm[off:off + frame])
+                await asyncio.sleep(max(t0 + (i + 1) * args.frame_ms / 1000 - time.monotonic(), 0))
+            await ws.send(json.dumps({"type": "stop"}))
+
+        send_task = asyncio.create_task(sender())
+        async for raw in ws:
+            msg = json.loads(raw)
+            if msg["type"] == "partial":
+                partials += 1
+            elif msg["type"] == "final":
+                finals.append(time.monotonic() - t0 - msg["end"])
+                if args.verbose:
+                    print(f"[{idx}] {msg['start']:>7.2f}-{msg['end']:>7.2f} {msg['text']}")
+            elif msg["type"] in ("done", "error"):
+                if msg["type"] == "error":
+                    print(f"session {idx}: {msg['error']}")
+                if msg["type"] == "done":
+                    break
+        await send_task
+    print(f"session {idx}: {len(finals)} finals, {partials} partials, final lag "
+          f"median {statistics.median(finals) if finals else float('nan'):.2f}s max {max(finals, default=float('nan')):.2f}s")
+    return finals
+
+async def main_async(args):
+    pcm, rate = _read_wav(args.wav)
+    results = await asyncio.gather(*[_session(args, pcm, rate, i) for i in range(args.sessions)])
+    lags = [lag for r in results for lag in r]
+    if lags:
+        print(f"all sessions: {len(lags)} finals, lag p50 {statistics.median(lags):.2f}s max {max(lags):.2f}s")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("wav")
+    ap.add_argument("--api", default="ws://localhost:8080")
+    ap.add_argument("--sessions", type=int, default=1)
+    ap.add_argument("--frame-ms", type=int, default=100)
+    ap.add_argument("--verbose", action="store_true")
+    asyncio.run(main_async(ap.parse_args()))
+
+if __name__ == "__main__":
+    main()
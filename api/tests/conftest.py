@@ -0,0 +1,15 @@
+import os, sys
+
+# Settings has required fields without defaults; give them dummy values before app imports
+for key, value in {
+    "OPENAI_BASE_URL": "http://localhost:1234/v1",
+    "OPENAI_CHAT_MODEL": "test",
+    "CHROMA_URL": "http://localhost:8000",
+    "REDIS_URL": "redis://localhost:6379/0",
+    "MINIO_ENDPOINT": "http://localhost:9000",
+    "MINIO_ACCESS_KEY": "test",
+    "MINIO_SECRET_KEY": "test",
+}.items():
+    os.environ.setdefault(key, value)
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
@@ -0,0 +1,68 @@
+import asyncio
+import numpy as np
+import pytest
+from app import asr_pool
+from app.asr_pool import TranscriptionPool, split_at_silence
+from app.executors import ExecutorBusy
+from app.settings import settings
+from app.vad import SAMPLE_RATE
+
+def _speech(seconds):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+def _silence(seconds):
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+
+def test_admission_control_rejects_beyond_queue():
+    async def run():
+        pool = TranscriptionPool(max_jobs=1, max_queued=1)
+        release = asyncio.Event()
+
+        async def transcribe(path, queued_s):
+            await release.wait()
+            return {"duration": 1.0, "timings": {"total_s": 0.5}, "path": path}
+
+        pool._transcribe = transcribe
+        first = asyncio.create_task(pool.transcribe_file("a.wav"))
+        second = asyncio.create_task(pool.transcribe_file("b.wav"))
+        await asyncio.sleep(0.01)
+        assert (pool.running, pool.waiting) == (1, 1)
+        with pytest.raises(ExecutorBusy):
+            await pool.transcribe_file("c.wav")
+        release.set()
+        results = await asyncio.gather(first, second)
+        return pool, results
+
+    pool, results = asyncio.run(run())
+    assert [r["path"] for r in results] == ["a.wav", "b.wav"]
+    snap = pool.snapshot()
+    assert snap["rejected"] == 1 and snap["completed"] == 2 and snap["running"] == snap["waiting"] == 0
+
+def test_cuts_land_in_pauses_and_silence_is_skipped(monkeypatch):
+    monkeypatch.setattr(settings, "asr_chunk_s", 10.0)
+    monkeypatch.setattr(settings, "asr_chunk_search_s", 4.0)
+    audio = np.concatenate([_speech(8), _silence(1), _speech(8), _silence(12), _speech(3)])
+    spans = [(a / SAMPLE_RATE, b / SAMPLE_RATE) for a, b in split_at_silence(audio)]
+    # First cut inside the 8-9 s pause; the chunk that is silence throughout is dropped
+    assert 8.0 <= spans[0][1] <= 9.0
+    assert all(b - a <= 10.0 + 1e-6 for a, b in spans)
+    assert len(spans) == 3 and spans[-1][1] == pytest.approx(len(audio) / SAMPLE_RATE)
+
+def test_chunks_stitched_in_order_with_offsets(monkeypatch):
+    monkeypatch.setattr(settings, "asr_chunk_s", 10.0)
+    monkeypatch.setattr(settings, "asr_chunk_search_s", 4.0)
+    audio = np.concatenate([_speech(8), _silence(1), _speech(8)])
+    monkeypatch.setattr(asr_pool, "decode_audio", lambda path: audio)
+
+    def transcribe_chunk(chunk, offset_s):
+        end = offset_s + len(chunk) / SAMPLE_RATE
+        return {"segments": [{"start": offset_s, "end": end, "text": f"at {offset_s:.0f}"}], "decode_s": 0.0}
+
+    monkeypatch.setattr(asr_pool, "transcribe_chunk", transcribe_chunk)
+    result = asyncio.run(TranscriptionPool(1, 0).transcribe_file("rec.wav"))
+    starts = [c["start"] for c in result["chunks"]]
+    assert len(starts) == 2 and 8.0 <= starts[1] <= 9.0
+    # Segment times are shifted by each chunk's offset
+    assert [seg["start"] for seg in result["segments"]] == starts
+    assert result["text"] == f"at 0 at {starts[1]:.0f}" and result["duration"] == 17.0
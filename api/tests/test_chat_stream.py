@@ -0,0 +1,57 @@
+import json
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from bench import fake_openai_server as fake
+from app import llm
+from app.routes import chat
+
+HIT = {"chunk_id": "c1", "doc_id": "d1", "title": "Guide", "page": 1, "section": "", "snippet": "Metformin 500 mg",
+       "score": 0.9}
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(fake, "TOKEN_DELAY", 0.0)
+    monkeypatch.setattr(fake, "ANSWER", "Start metformin at 500 mg [Guide p.1].")
+
+    async def gather(req):
+        return ["Metformin 500 mg"], [HIT], [], False
+
+    remembered = []
+    monkeypatch.setattr(chat, "_gather_context", gather)
+    monkeypatch.setattr(chat, "_remember_exchange", lambda user, query, answer: remembered.append(answer))
+    # The shared LLM client talks to the fake server in-process
+    client = llm.LLMClient()
+    client._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app), base_url="http://fake/v1")
+    monkeypatch.setattr(llm, "_llm_client", client)
+
+    app = FastAPI()
+    app.include_router(chat.router)
+    test_client = TestClient(app)
+    test_client.remembered = remembered
+    return test_client
+
+def _events(client):
+    r = client.post("/chat/stream", json={"query": "metformin dose?"})
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in r.text.splitlines()]
+
+def test_events_in_order(client):
+    events = _events(client)
+    kinds = [e["type"] for e in events]
+    assert kinds[0] == "citations" and kinds[-1] == "done"
+    assert set(kinds[1:-1]) == {"token"} and len(kinds) > 3
+    assert events[0]["citations"][0]["doc_id"] == "d1"
+    answer = "".join(e["text"] for e in events if e["type"] == "token")
+    assert answer == events[-1]["answer"] == fake.ANSWER
+    assert client.remembered == [fake.ANSWER]
+
+def test_backend_error_event_fails_the_stream(client, monkeypatch):
+    monkeypatch.setattr(fake, "FAIL_AFTER", 2)
+    events = _events(client)
+    kinds = [e["type"] for e in events]
+    assert kinds == ["citations", "token", "token", "error"]
+    assert "fake generation failure" in events[-1]["error"]
+    # A truncated answer is not written to memory
+    assert client.remembered == []
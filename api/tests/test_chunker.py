@@ -0,0 +1,74 @@
+from app.chunker import Chunker, is_heading
+
+class WordTokenizer:
+    """One token per whitespace-separated word; enough to exercise the chunk sizing."""
+
+    def __call__(self, texts, add_special_tokens=False):
+        return {"input_ids": [[hash(w) for w in t.split()] for t in texts]}
+
+    def decode(self, ids):
+        return " ".join(f"w{i}" for i in range(len(ids)))
+
+def _chunker(monkeypatch, target=20, overlap=4, max_tokens=40):
+    from app.settings import settings
+    monkeypatch.setattr(settings, "chunk_tokens", target)
+    monkeypatch.setattr(settings, "chunk_overlap", overlap)
+    monkeypatch.setattr(settings, "chunk_max_tokens", max_tokens)
+    return Chunker(WordTokenizer(), max_seq_length=512)
+
+def _text(chunks):
+    return "\n\n".join(c["text"] for c in chunks)
+
+def test_quantities_and_plain_lines_are_not_headings():
+    assert not is_heading("500 mg twice daily")
+    assert not is_heading("Warfarin 5 mg daily, INR target 2-3")
+    assert not is_heading("Metformin")
+    assert not is_heading("2-3 times a day")
+    assert is_heading("2.3 Dosage and administration")
+    assert is_heading("CONTRAINDICATIONS")
+    assert is_heading("Adverse effects", size=14.0, body_size=10.0)
+    assert is_heading("Adverse effects", bold=True)
+
+def test_single_dosage_line_is_kept(monkeypatch):
+    chunks, _ = _chunker(monkeypatch).chunk_page("d", 1, ["Warfarin 5 mg daily, INR target 2-3"])
+    assert [c["text"] for c in chunks] == ["Warfarin 5 mg daily, INR target 2-3"]
+
+def test_table_page_keeps_every_cell(monkeypatch):
+    cells = ["Table 2 Oral agents", "Metformin", "500 mg twice daily", "Gliclazide", "80 mg daily",
+             "Sitagliptin", "100 mg once daily"]
+    chunks, _ = _chunker(monkeypatch).chunk_page("d", 3, cells)
+    text = _text(chunks)
+    assert chunks
+    assert all(cell in text for cell in cells)
+
+def test_heading_only_page_is_emitted(monkeypatch):
+    blocks = ["1. Introduction", "1.1 Scope", "1.2 Definitions"]
+    chunks, section = _chunker(monkeypatch).chunk_page("d", 1, blocks)
+    assert len(chunks) == 1 and all(b in chunks[0]["text"] for b in blocks)
+    assert section == "1.2 Definitions"
+
+def test_list_page_with_font_cues(monkeypatch):
+    blocks = [{"text": "Dosing schedule", "size": 14.0, "bold": True}]
+    blocks += [{"text": f"Day {i}: 10 units insulin glargine at bedtime", "size": 10.0, "bold": False}
+               for i in range(1, 9)]
+    chunks, section = _chunker(monkeypatch).chunk_page("d", 2, blocks)
+    text = _text(chunks)
+    assert section == "Dosing schedule"
+    assert all(b["text"] in text for b in blocks)
+    # Every chunk cut from the list below the heading still carries it
+    assert len(chunks) > 1 and all(c["text"].startswith("Dosing schedule") for c in chunks)
+    assert all(c["section"] == "Dosing schedule" for c in chunks)
+
+def test_heading_kept_when_next_block_does_not_fit(monkeypatch):
+    long_block = " ".join(["word"] * 18)
+    chunks, _ = _chunker(monkeypatch).chunk_page("d", 1, ["4.2 Renal impairment", long_block, long_block + " end"])
+    assert len(chunks) == 2
+    assert all(c["text"].startswith("4.2 Renal impairment") for c in chunks)
+    assert all(c["tokens"] <= 40 for c in chunks)
+
+def test_chunk_ids_are_stable(monkeypatch):
+    chunker = _chunker(monkeypatch)
+    blocks = ["3 Monitoring", "Check potassium and creatinine within 1 week of starting."]
+    first, _ = chunker.chunk_page("d", 5, blocks)
+    again, _ = chunker.chunk_page("d", 5, blocks)
+    assert [c["id"] for c in first] == [c["id"] for c in again]
@@ -0,0 +1,91 @@
+import os, threading, zlib
+import numpy as np
+import pytest
+from app.compact_index import CompactStore
+
+def _vec(i, dim=16):
+    return np.random.default_rng(i).normal(size=dim).astype(np.float32)
+
+def test_upsert_query_delete(tmp_path):
+    store = CompactStore("c", str(tmp_path))
+    store.upsert([f"a{i}" for i in range(20)], [_vec(i) for i in range(20)],
+                 documents=[f"doc {i}" for i in range(20)], metadatas=[{"n": i} for i in range(20)])
+    hit = store.query(_vec(7), k=1)[0]
+    assert hit["id"] == "a7" and hit["distance"] < 1e-6
+    assert [h["id"] for h in store.query(_vec(7), k=3, where={"n": {"$gte": 10}})][0] != "a7"
+    store.delete(ids=["a7"])
+    assert store.query(_vec(7), k=1)[0]["id"] != "a7"
+    assert store.count() == 19
+
+def test_concurrent_writers_on_one_collection(tmp_path):
+    # Separate instances = separate SQLite connections and thread locks, as in two processes
+    writers = [CompactStore("shared", str(tmp_path)) for _ in range(2)]
+    errors = []
+
+    def write(w, store):
+        try:
+            for b in range(25):
+                ids = [f"w{w}-{b}-{i}" for i in range(4)]
+                store.upsert(ids, [_vec(zlib.crc32(x.encode())) for x in ids])
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(w, s)) for w, s in enumerate(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+
+    reader = CompactStore("shared", str(tmp_path))
+    assert reader.count() == 200
+    for w in range(2):
+        for b in (0, 12, 24):
+            id_ = f"w{w}-{b}-1"
+            hit = reader.query(_vec(zlib.crc32(id_.encode())), k=1)[0]
+            assert hit["id"] == id_ and hit["distance"] < 1e-6
+
+def test_vacuum_keeps_live_rows(tmp_path):
+    store = CompactStore("v", str(tmp_path))
+    store.upsert([f"x{i}" for i in range(10)], [_vec(i) for i in range(10)])
+    store.delete(ids=[f"x{i}" for i in range(0, 10, 2)])
+    store.vacuum()
+    assert store.count() == 5
+    assert store.query(_vec(3), k=1)[0]["id"] == "x3"
+
+def test_vacuum_switches_generation_for_other_readers(tmp_path):
+    store = CompactStore("g", str(tmp_path))
+    reader = CompactStore("g", str(tmp_path))
+    store.upsert([f"x{i}" for i in range(10)], [_vec(i) for i in range(10)])
+    assert reader.query(_vec(9), k=1)[0]["id"] == "x9"
+    store.delete(ids=[f"x{i}" for i in range(5)])
+    store.vacuum()
+    # The reader still had the old files mapped; it picks up the new generation and row numbers
+    assert reader.query(_vec(9), k=1)[0]["id"] == "x9"
+    store.vacuum()
+    files = sorted(f for f in os.listdir(tmp_path / "g") if f.endswith(".bin"))
+    assert files == ["codes.2.bin", "norms.2.bin", "scales.2.bin", "vectors.2.bin"]
+
+class _FailingRenumber:
+    """Connection proxy whose row renumbering fails, as a crash would mid-vacuum."""
+
+    def __init__(self, db):
+        self._db = db
+
+    def executemany(self, sql, params):
+        raise RuntimeError("disk full")
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+def test_failed_vacuum_keeps_current_files(tmp_path):
+    store = CompactStore("f", str(tmp_path))
+    store.upsert([f"x{i}" for i in range(10)], [_vec(i) for i in range(10)])
+    store.delete(ids=["x0", "x1"])
+    db, store._db = store._db, _FailingRenumber(store._db)
+    with pytest.raises(RuntimeError):
+        store.vacuum()
+    store._db = db
+    files = sorted(f for f in os.listdir(tmp_path / "f") if f.endswith(".bin"))
+    assert files == ["codes.bin", "norms.bin", "scales.bin", "vectors.bin"]
+    assert store.count() == 8 and store.query(_vec(9), k=1)[0]["id"] == "x9"
@@ -0,0 +1,59 @@
+import threading
+import numpy as np
+import pytest
+from app import embed_cache
+from app.embed_cache import EmbeddingCache, cache_key
+from app.settings import settings
+
+class CountingModel:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, normalize_embeddings=False, batch_size=None):
+        self.encoded.extend(texts)
+        return np.asarray([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+def test_hits_and_misses():
+    cache, model = EmbeddingCache(max_items=10), CountingModel()
+    first = cache.encode(model, "m", ["metformin  dose", "warfarin", "warfarin"])
+    # Whitespace-normalized, and a repeat within one batch is encoded once
+    assert model.encoded == ["metformin dose", "warfarin"]
+    assert cache.stats["misses"] == 3 and cache.stats["hits"] == 0
+    assert cache.encode(model, "m", ["metformin dose"]) == first[:1]
+    assert cache.stats["hits"] == 1 and len(model.encoded) == 2
+    cache.encode(model, "other-model", ["warfarin"])
+    assert cache.stats["misses"] == 4
+
+def test_lru_eviction():
+    cache, model = EmbeddingCache(max_items=2), CountingModel()
+    cache.encode(model, "m", ["a", "b", "c"])
+    assert cache.stats["evictions"] == 1
+    cache.encode(model, "m", ["a"])
+    assert model.encoded == ["a", "b", "c", "a"]
+
+def test_key_covers_encode_options(monkeypatch):
+    normalized = cache_key("m", "text", embed_cache.encode_options())
+    monkeypatch.setitem(embed_cache.ENCODE_KWARGS, "normalize_embeddings", False)
+    assert cache_key("m", "text", embed_cache.encode_options()) != normalized
+
+def test_key_covers_cpu_precision(monkeypatch):
+    monkeypatch.setattr(settings, "torch_cpu_precision", "fp32")
+    full = cache_key("m", "text", embed_cache.encode_options())
+    monkeypatch.setattr(settings, "torch_cpu_precision", "int8")
+    assert cache_key("m", "text", embed_cache.encode_options()) != full
+
+def test_counters_exact_under_threads():
+    cache, model = EmbeddingCache(max_items=100), CountingModel()
+    cache.encode(model, "m", [f"t{i}" for i in range(10)])
+
+    def lookups():
+        for _ in range(200):
+            cache.encode(model, "m", [f"t{i}" for i in range(10)])
+
+    threads = [threading.Thread(target=lookups) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert cache.stats["hits"] == 4 * 200 * 10
+    assert cache.snapshot()["hit_rate"] == pytest.approx(8000 / 8010, abs=1e-4)
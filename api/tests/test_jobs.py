@@ -0,0 +1,52 @@
+import contextlib
+import fitz
+import pytest
+from rq import SimpleWorker
+from app import jobs, manifest, parsing
+from app.settings import settings
+
+fakeredis = pytest.importorskip("fakeredis")
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "_redis", fakeredis.FakeRedis())
+    monkeypatch.setattr(jobs, "_ingest_queue", None)
+    monkeypatch.setattr(settings, "ingest_spool_dir", str(tmp_path / "spool"))
+    monkeypatch.setattr(settings, "ingest_max_retries", 0)
+    # Redis locks run Lua scripts, which fakeredis only supports with lupa installed
+    monkeypatch.setattr(manifest, "manifest_lock", lambda title: contextlib.nullcontext())
+    (tmp_path / "spool").mkdir()
+    return jobs.get_ingest_queue()
+
+def _spooled_pdf(tmp_path, pages=2):
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"Page {i + 1}")
+    path = tmp_path / "upload.pdf"
+    doc.save(str(path))
+    return str(path)
+
+def test_enqueued_job_reports_queued(queue, tmp_path):
+    job_id = jobs.enqueue_ingest(_spooled_pdf(tmp_path), "Renal guide", "d1")
+    status = jobs.get_ingest_status(job_id)
+    assert status["status"] == "queued" and status["stage"] == "queued"
+    assert status["title"] == "Renal guide" and status["pages_parsed"] == 0 and status["failures"] == []
+    assert (tmp_path / "spool" / f"{job_id}.pdf").exists()
+    assert jobs.get_ingest_status("missing") is None
+
+def test_progress_and_failure_are_reported(queue, tmp_path, monkeypatch):
+    def parse(path, name, doc_id, progress=None, **kwargs):
+        progress(1, 2)
+        raise RuntimeError("page 2 is corrupt")
+
+    monkeypatch.setattr(parsing, "parse_pdf_to_sections", parse)
+    job_id = jobs.enqueue_ingest(_spooled_pdf(tmp_path), "Renal guide", "d1")
+    SimpleWorker([queue], connection=queue.connection).work(burst=True)
+
+    status = jobs.get_ingest_status(job_id)
+    assert status["status"] == "failed" and status["stage"] == "parsing"
+    assert (status["pages_changed"], status["pages_parsed"]) == (2, 1)
+    assert status["failures"] == [{"page": None, "stage": "parsing", "error": "page 2 is corrupt", "attempt": 1}]
+    assert "page 2 is corrupt" in status["error"]
+    # No retries left: the spooled file is removed
+    assert not (tmp_path / "spool" / f"{job_id}.pdf").exists()
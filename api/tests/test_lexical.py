@@ -0,0 +1,42 @@
+import pytest
+from app.lexical import LexicalIndex
+from app.settings import settings
+
+def _meta(doc):
+    return {"doc_id": doc, "title": doc.upper(), "page": 1}
+
+@pytest.fixture
+def index(tmp_path):
+    return LexicalIndex(str(tmp_path / "lexical.sqlite"))
+
+def test_rare_code_and_phrase(index):
+    index.add([
+        ("a", "Type 2 diabetes, E11.9, started metformin 500 mg twice daily", _meta("d1")),
+        ("b", "E11 is a chapter; 9 patients were seen", _meta("d1")),
+        ("c", "Metformin 1000 mg; 500 patients in the mg cohort", _meta("d2")),
+    ])
+    hits = index.search("E11.9", 5)
+    # "b" has both tokens, but not adjacent
+    assert [h["chunk_id"] for h in hits] == ["a"]
+    assert set(hits[0]) == {"chunk_id", "doc_id", "title", "page", "section", "snippet", "score"}
+
+def test_upsert_and_delete(index):
+    index.add([("a", "warfarin dose", _meta("d1")), ("b", "warfarin monitoring", _meta("d2"))])
+    index.add([("a", "apixaban dose", _meta("d1"))])
+    assert [h["chunk_id"] for h in index.search("warfarin", 5)] == ["b"]
+    assert [h["chunk_id"] for h in index.search("apixaban", 5)] == ["a"]
+    index.delete(doc_id="d2")
+    assert index.search("warfarin", 5) == []
+    assert index.count() == 1
+    assert index._conn().execute("SELECT COUNT(*) FROM postings").fetchone()[0] == 2
+
+def test_common_terms_read_bounded_postings(index, monkeypatch):
+    monkeypatch.setattr(settings, "lexical_max_postings", 5)
+    monkeypatch.setattr(settings, "lexical_postings_per_term", 20)
+    # "insulin" is in every chunk; the best match repeats it in a short chunk
+    index.add([(f"c{i}", f"insulin glargine titrated on day {i} with patient review notes", _meta("d"))
+               for i in range(100)] + [("best", "insulin insulin insulin", _meta("d"))])
+    assert index.search("insulin", 3)[0]["chunk_id"] == "best"
+    stored = index._conn().execute(
+        "SELECT COUNT(*) FROM postings JOIN terms ON terms.id = term_id WHERE term = 'insulin'").fetchone()[0]
+    assert stored == 20
@@ -0,0 +1,26 @@
+import pytest
+from app import jobs, manifest
+
+def _manifest(*hashes):
+    return {"pages": {str(p): {"hash": h, "chunks": [], "images": []} for p, h in enumerate(hashes, start=1)}}
+
+def test_first_ingest_changes_every_page():
+    assert manifest.diff(None, ["a", "b"]) == {"changed": [1, 2], "removed": []}
+
+def test_revision_reports_changed_new_and_removed_pages():
+    old = _manifest("a", "b", "c", "d")
+    assert manifest.diff(old, ["a", "B", "c"]) == {"changed": [2], "removed": [4]}
+    assert manifest.diff(old, ["a", "b", "c", "d", "e"]) == {"changed": [5], "removed": []}
+    assert manifest.diff(old, ["a", "b", "c", "d"]) == {"changed": [], "removed": []}
+
+def test_doc_id_is_stable_per_title():
+    assert manifest.doc_id_for("Renal guide") == manifest.doc_id_for("Renal guide")
+    assert manifest.doc_id_for("Renal guide") != manifest.doc_id_for("Renal guide v2")
+
+def test_manifest_round_trip(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    monkeypatch.setattr(jobs, "_redis", fakeredis.FakeRedis())
+    assert manifest.get_manifest("Renal guide") is None
+    manifest.save_manifest({"doc_id": "d1", "title": "Renal guide", "file_sha": "f", **_manifest("a")})
+    saved = manifest.get_manifest("Renal guide")
+    assert saved["file_sha"] == "f" and saved["pages"]["1"]["hash"] == "a" and saved["updated"]
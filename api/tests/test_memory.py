@@ -0,0 +1,160 @@
+import asyncio
+import numpy as np
+import pytest
+from app import memory
+from app.settings import settings
+from app.vectorstore import NumpyStore
+
+class _Stores(dict):
+    encode_calls: list
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    """Per-user NumpyStores and a deterministic encoder that counts its calls."""
+    stores, calls = _Stores(), []
+
+    def encode(model, model_name, texts, batch_size=None):
+        calls.append(len(texts))
+        return [np.random.default_rng(abs(hash(t)) % 2**32).normal(size=8).tolist() for t in texts]
+
+    def collection(user):
+        if user not in stores:
+            stores[user] = NumpyStore(f"mem_{user}", str(tmp_path))
+        return stores[user]
+
+    monkeypatch.setattr(memory, "encode_cached", encode)
+    monkeypatch.setattr(memory, "_get_embed_model", lambda: None)
+    monkeypatch.setattr(memory, "_mem_col", collection)
+    monkeypatch.setattr(settings, "vector_persist_interval", 3600.0)
+    monkeypatch.setattr(settings, "memory_spool_path", str(tmp_path / "spool.jsonl"))
+    monkeypatch.setattr(settings, "memory_compact_every", 10_000)
+    stores.encode_calls = calls
+    return stores
+
+def _down(turns):
+    raise ConnectionError("vector store unavailable")
+
+def test_flush_batches_turns_across_users(stores):
+    writer = memory.MemoryWriter()
+    for i in range(3):
+        writer.add(memory._turn("u1", "user", f"question {i}"))
+    writer.add(memory._turn("u2", "user", "hello"))
+    assert writer.flush() == 4
+    # One encode for the whole buffer, one upsert per user
+    assert stores.encode_calls == [4]
+    assert stores["u1"].count() == 3 and stores["u2"].count() == 1
+    assert writer.snapshot()["pending"] == 0 and writer.stats["written"] == 4
+
+def test_failed_flush_keeps_turns_in_order(stores, monkeypatch):
+    writer = memory.MemoryWriter()
+    writer.add(memory._turn("u1", "user", "first"))
+    monkeypatch.setattr(memory, "_write_turns", _down)
+    with pytest.raises(ConnectionError):
+        writer.flush()
+    writer.add(memory._turn("u1", "user", "second"))
+    assert [t["doc"].split("] ")[1] for t in writer._buffer] == ["first", "second"]
+    assert writer.stats["failures"] == 1
+
+def test_background_flush_when_batch_is_full(stores, monkeypatch):
+    monkeypatch.setattr(settings, "memory_batch_size", 3)
+    monkeypatch.setattr(settings, "memory_flush_interval", 60.0)
+
+    async def run():
+        writer = memory.MemoryWriter()
+        await writer.start()
+        for i in range(3):
+            writer.add(memory._turn("u1", "user", f"q{i}"))
+        for _ in range(100):
+            if writer.stats["written"] == 3:
+                break
+            await asyncio.sleep(0.02)
+        await writer.stop()
+        return writer
+
+    writer = asyncio.run(run())
+    assert writer.stats["written"] == 3 and writer.stats["flushes"] == 1
+
+def test_unwritten_turns_spill_at_stop_and_replay_on_start(stores, monkeypatch):
+    write_turns = memory._write_turns
+
+    async def stop_while_down():
+        writer = memory.MemoryWriter()
+        await writer.start()
+        monkeypatch.setattr(memory, "_write_turns", _down)
+        writer.add(memory._turn("u1", "user", "kept across restarts"))
+        await writer.stop()
+        return writer
+
+    assert asyncio.run(stop_while_down()).stats["spilled"] == 1
+    monkeypatch.setattr(memory, "_write_turns", write_turns)
+
+    async def restart():
+        writer = memory.MemoryWriter()
+        await writer.start()
+        await writer.stop()
+        return writer
+
+    writer = asyncio.run(restart())
+    assert writer.stats["restored"] == 1 and writer.stats["written"] == 1
+    assert "kept across restarts" in stores["u1"].get()[0]["document"]
+
+def _seed(store, user, n, ts, kind="turn", **meta):
+    ids = [f"{user}:{kind}:{ts}:{i}" for i in range(n)]
+    store.upsert(ids, [np.ones(8) * (i + 1) for i in range(n)], documents=[f"{kind} {i}" for i in range(n)],
+                 metadatas=[{"user_id": user, "kind": kind, "ts": ts + i, **meta} for i in range(n)])
+
+@pytest.fixture
+def summarized(monkeypatch):
+    calls = []
+
+    async def summarize(docs, label):
+        calls.append((label, len(docs)))
+        return f"note on {len(docs)} entries"
+
+    monkeypatch.setattr(memory, "_summarize", summarize)
+    return calls
+
+def test_compaction_rolls_old_turns_into_daily_summaries(stores, summarized, monkeypatch):
+    monkeypatch.setattr(settings, "memory_raw_ttl_days", 30)
+    store = memory._mem_col("u1")
+    day = 86400
+    old = memory.time.time() - 60 * day
+    _seed(store, "u1", 3, old)
+    _seed(store, "u1", 2, old + day)
+    _seed(store, "u1", 4, memory.time.time() - 60)
+    report = asyncio.run(memory.compact_user("u1"))
+    assert report["rolled_up"] == 5 and report["summaries_created"] == 2
+    assert sorted(n for _, n in summarized) == [2, 3]
+    kinds = sorted(r["metadata"]["kind"] for r in store.get())
+    assert kinds == ["summary"] * 2 + ["turn"] * 4
+    assert report["size_after"] == store.count() == 6
+
+def test_compaction_caps_raw_turns_and_merges_summaries(stores, summarized, monkeypatch):
+    monkeypatch.setattr(settings, "memory_max_raw_turns", 10)
+    monkeypatch.setattr(settings, "memory_keep_recent_turns", 4)
+    monkeypatch.setattr(settings, "memory_max_summaries", 3)
+    store = memory._mem_col("u1")
+    now = memory.time.time()
+    _seed(store, "u1", 12, now - 3600)
+    _seed(store, "u1", 4, now - 7200, kind="summary", period="2026-01-01", turns=5)
+    report = asyncio.run(memory.compact_user("u1"))
+    # 8 oldest raw turns rolled (newest 4 kept), and the oldest 2 of 4 summaries merged into one
+    assert report["rolled_up"] == 8 and report["summaries_merged"] == 2
+    raw = [r for r in store.get() if r["metadata"]["kind"] == "turn"]
+    assert sorted(r["document"] for r in raw) == ["turn 10", "turn 11", "turn 8", "turn 9"]
+    merged = [r for r in store.get() if r["metadata"].get("turns") == 10]
+    assert len(merged) == 1
+
+def test_flush_schedules_compaction_once_per_user(stores, monkeypatch):
+    from app import jobs
+    scheduled = []
+    monkeypatch.setattr(jobs, "enqueue_compaction", scheduled.append)
+    monkeypatch.setattr(settings, "memory_compact_every", 3)
+    writer = memory.MemoryWriter()
+    for i in range(4):
+        writer.add(memory._turn("u1", "user", f"q{i}"))
+    writer.add(memory._turn("u2", "user", "hello"))
+    writer.flush()
+    writer.add(memory._turn("u1", "user", "q4"))
+    writer.flush()
+    assert scheduled == ["u1"]
@@ -0,0 +1,31 @@
+from app import ocr
+
+def _blocks(*texts):
+    return [{"bbox": (0, i * 20, 200, i * 20 + 12), "text": t} for i, t in enumerate(texts)]
+
+def _ocr_returns(monkeypatch, text):
+    monkeypatch.setattr(ocr, "parse_document_page",
+                        lambda image_bytes: {"text": text, "structure_type": "document"})
+
+def test_low_text_page_uses_longer_ocr_text(monkeypatch):
+    ocr_text = "Patient presented with chest pain radiating to the left arm. ECG showed ST elevation."
+    _ocr_returns(monkeypatch, ocr_text)
+    out = ocr.enhance_pdf_text_blocks(_blocks("Patient presented", "ECG"), b"png")
+    assert len(out) == 1
+    assert out[0]["text"] == ocr_text and out[0]["enhanced_with_ocr"]
+
+def test_text_layer_kept_when_ocr_is_not_longer(monkeypatch):
+    _ocr_returns(monkeypatch, "Patient presented")
+    blocks = _blocks("Patient presented with chest pain", "ECG showed ST elevation")
+    out = ocr.enhance_pdf_text_blocks(blocks, b"png")
+    assert [b["text"] for b in out] == [b["text"] for b in blocks]
+    assert not any(b["enhanced_with_ocr"] for b in out)
+
+def test_image_only_page_uses_ocr(monkeypatch):
+    _ocr_returns(monkeypatch, "Scanned discharge summary")
+    out = ocr.enhance_pdf_text_blocks([], b"png")
+    assert [b["text"] for b in out] == ["Scanned discharge summary"]
+
+def test_low_text_page_classified(monkeypatch):
+    assert ocr.classify_page((0, 0, 600, 800), _blocks("Page 3")) == "low_text"
+    assert ocr.classify_page((0, 0, 600, 800), []) == "image_only"
@@ -0,0 +1,73 @@
+import io, random
+from concurrent.futures import Future
+import fitz
+import pytest
+from PIL import Image
+from app import parsing
+from app.settings import settings
+
+def _png(seed):
+    rng = random.Random(seed)
+    img = Image.new("L", (16, 16))
+    img.putdata([rng.randrange(256) for _ in range(256)])
+    img = img.resize((200, 200)).convert("RGB")
+    out = io.BytesIO()
+    img.save(out, format="PNG")
+    return out.getvalue()
+
+@pytest.fixture
+def pdf(tmp_path):
+    # The same figure on every page, plus a distinct figure per page
+    doc = fitz.open()
+    logo = _png("logo")
+    for i in range(4):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {i + 1}")
+        page.insert_image(fitz.Rect(72, 100, 272, 300), stream=logo)
+        page.insert_image(fitz.Rect(72, 320, 272, 520), stream=_png(i))
+    path = tmp_path / "doc.pdf"
+    doc.save(str(path))
+    return str(path)
+
+@pytest.fixture
+def uploads(monkeypatch):
+    submitted = []
+
+    class Store:
+        def submit(self, bucket, key, data, content_type):
+            submitted.append(key)
+            fut = Future()
+            fut.set_result(None)
+            return fut
+
+        def url(self, bucket, key):
+            return f"http://minio/{bucket}/{key}"
+
+        def snapshot(self):
+            return {}
+
+    monkeypatch.setattr(parsing, "get_object_store", lambda: Store())
+    monkeypatch.setattr(settings, "ocr_enabled", False)
+    monkeypatch.setenv("OCR_ENABLED", "false")  # spawned page workers read their own settings
+    return submitted
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_duplicates_dropped_across_page_ranges(pdf, uploads, monkeypatch, workers):
+    monkeypatch.setattr(settings, "parse_pages_per_task", 1)
+    parsed = parsing.parse_pdf_to_sections(pdf, "doc", "d1", workers=workers)
+    # One copy of the shared figure, then the four per-page figures
+    assert len(parsed["images"]) == 5
+    assert sorted(uploads) == sorted(f"d1/page_{i['page']}/{i['sha']}.png" for i in parsed["images"])
+    assert all("png" not in i and i["url"].startswith("http://minio/") for i in parsed["images"])
+
+def test_cap_applied_before_upload(pdf, uploads, monkeypatch):
+    monkeypatch.setattr(settings, "parse_pages_per_task", 1)
+    monkeypatch.setattr(settings, "image_max_per_doc", 2)
+    parsed = parsing.parse_pdf_to_sections(pdf, "doc", "d1", workers=2)
+    assert len(parsed["images"]) == len(uploads) == 2
+
+def test_remaining_budget_overrides_setting(pdf, uploads):
+    # What a revision gets when the unchanged pages already hold the whole image budget
+    parsed = parsing.parse_pdf_to_sections(pdf, "doc", "d1", workers=1, only_pages=[2, 3], max_images=0)
+    assert [p["page"] for p in parsed["pages"]] == [2, 3]
+    assert parsed["images"] == [] and uploads == []
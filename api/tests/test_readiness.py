@@ -0,0 +1,35 @@
+import threading
+from app import models, readiness
+
+def test_model_ready_only_after_warmup(monkeypatch):
+    warming, release = threading.Event(), threading.Event()
+
+    def warm(model):
+        warming.set()
+        release.wait(5)
+
+    monkeypatch.setitem(models.LOADERS, "text", lambda: (object(), "cpu"))
+    monkeypatch.setitem(models.WARMUPS, "text", warm)
+    registry = models.ModelRegistry()
+    monkeypatch.setattr(readiness, "get_registry", lambda: registry)
+
+    preloading = threading.Thread(target=registry.preload, args=(["text"],))
+    preloading.start()
+    assert warming.wait(5)
+    # Loaded into the registry, but still warming up
+    assert registry.is_loaded("text")
+    status = readiness.model_readiness(["text"])["text"]
+    assert not status["ready"] and status["error"] == "warming up"
+    release.set()
+    preloading.join(5)
+    assert readiness.model_readiness(["text"])["text"]["ready"]
+
+def test_failed_preload_reports_error(monkeypatch):
+    def fail():
+        raise RuntimeError("no weights")
+
+    monkeypatch.setitem(models.LOADERS, "ocr", fail)
+    registry = models.ModelRegistry()
+    monkeypatch.setattr(readiness, "get_registry", lambda: registry)
+    registry.preload(["ocr"])
+    assert readiness.model_readiness(["ocr"]) == {"ocr": {"ready": False, "error": "no weights"}}
@@ -0,0 +1,81 @@
+import threading, time
+import pytest
+from app import storage
+from app.settings import settings
+
+class _NotFound(Exception):
+    code = "NoSuchKey"
+
+class StubClient:
+    """Records put_object calls; ``gate`` holds uploads until the test releases it."""
+
+    def __init__(self, fail=()):
+        self.objects, self.fail = {}, set(fail)
+        self.active = self.peak = 0
+        self.gate = threading.Event()
+        self.gate.set()
+        self._lock = threading.Lock()
+
+    def bucket_exists(self, bucket):
+        return True
+
+    def stat_object(self, bucket, key):
+        if key not in self.objects:
+            raise _NotFound(key)
+
+    def put_object(self, bucket, key, data, length, content_type=None):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            self.gate.wait(5)
+            if key in self.fail:
+                raise OSError(f"upload of {key} failed")
+            self.objects[key] = data.read()
+        finally:
+            with self._lock:
+                self.active -= 1
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setattr(settings, "minio_upload_workers", 2)
+    monkeypatch.setattr(settings, "minio_upload_queue", 2)
+    store = storage.ObjectStore()
+    store._client = StubClient()
+    return store
+
+def test_identical_images_upload_once(store):
+    futures = [store.submit("b", "doc/page_1/abc.png", b"png", "image/png") for _ in range(3)]
+    storage.wait_uploads(futures)
+    # A later document carrying the same figure finds it already stored
+    store.submit("b", "doc/page_1/abc.png", b"png", "image/png").result()
+    assert list(store._client.objects) == ["doc/page_1/abc.png"]
+    assert store.stats["uploaded"] == 1 and store.stats["skipped"] == 3
+
+def test_concurrency_and_queue_are_bounded(store):
+    client = store._client
+    client.gate.clear()
+    submitted = []
+
+    def submit_all():
+        for i in range(10):
+            submitted.append(store.submit("b", f"k{i}", b"x", "image/png"))
+
+    producer = threading.Thread(target=submit_all)
+    producer.start()
+    time.sleep(0.2)
+    # Two uploads running, two queued: the producer blocks on the fifth
+    assert len(submitted) == 4 and client.active == 2
+    client.gate.set()
+    producer.join(5)
+    storage.wait_uploads(submitted)
+    assert len(client.objects) == 10 and client.peak == 2
+
+def test_wait_uploads_raises_after_all_finish(store):
+    store._client.fail = {"k1"}
+    futures = [store.submit("b", f"k{i}", b"x", "image/png") for i in range(4)]
+    with pytest.raises(OSError, match="k1"):
+        storage.wait_uploads(futures)
+    assert all(f.done() for f in futures)
+    assert sorted(store._client.objects) == ["k0", "k2", "k3"]
+    assert store.stats["failed"] == 1
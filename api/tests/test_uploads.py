@@ -0,0 +1,58 @@
+import hashlib, os
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from app.uploads import spool_form, BadUpload, UploadTooLarge
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    from app.settings import settings
+    monkeypatch.setattr(settings, "upload_chunk_bytes", 1000)
+    app = FastAPI()
+    seen = {}
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        form = await spool_form(request, "file", str(tmp_path), 10_000)
+        seen["path"] = form.upload.path
+        with open(form.upload.path, "rb") as f:
+            data = f.read()
+        return {"size": form.upload.size, "sha256": form.upload.sha256, "filename": form.filename,
+                "fields": form.fields, "matches": hashlib.sha256(data).hexdigest() == form.upload.sha256}
+
+    @app.exception_handler(UploadTooLarge)
+    async def too_large(request, exc):
+        return JSONResponse({"error": str(exc)}, status_code=413)
+
+    @app.exception_handler(BadUpload)
+    async def bad(request, exc):
+        return JSONResponse({"error": str(exc)}, status_code=400)
+
+    client = TestClient(app)
+    client.spool_dir, client.seen = tmp_path, seen
+    return client
+
+def test_file_and_fields_are_spooled(client):
+    body = os.urandom(5000)
+    r = client.post("/upload", files={"file": ("scan.pdf", body)}, data={"title": "Renal guide"})
+    out = r.json()
+    assert r.status_code == 200
+    assert out == {"size": 5000, "sha256": hashlib.sha256(body).hexdigest(), "filename": "scan.pdf",
+                   "fields": {"title": "Renal guide"}, "matches": True}
+    assert client.seen["path"].endswith(".pdf")
+
+def test_oversized_upload_rejected_and_removed(client):
+    r = client.post("/upload", files={"file": ("big.pdf", b"x" * 20_000)})
+    assert r.status_code == 413
+    assert os.listdir(client.spool_dir) == []
+
+def test_content_length_checked_before_reading(client):
+    r = client.post("/upload", content=b"--x--\r\n",
+                    headers={"content-type": "multipart/form-data; boundary=x", "content-length": "10000000"})
+    assert r.status_code == 413 and "limit" in r.json()["error"]
+
+def test_missing_file_field(client):
+    r = client.post("/upload", data={"title": "no file"}, files={"other": ("a.txt", b"abc")})
+    assert r.status_code == 400
+    assert os.listdir(client.spool_dir) == []
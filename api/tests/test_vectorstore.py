@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from app.settings import settings
+from app.vectorstore import NumpyStore, VectorStore, matches
+
+def _vec(i, dim=8):
+    return np.random.default_rng(i).normal(size=dim).astype(np.float32)
+
+@pytest.fixture(autouse=True)
+def no_autosave(monkeypatch):
+    monkeypatch.setattr(settings, "vector_persist_interval", 3600.0)
+
+def test_vector_store_is_abstract():
+    with pytest.raises(TypeError):
+        VectorStore()
+
+def test_similarity_is_cosine_for_unit_vectors(tmp_path):
+    store = NumpyStore("s", str(tmp_path))
+    a, b = _vec(0), _vec(1)
+    a, b = a / np.linalg.norm(a), b / np.linalg.norm(b)
+    store.upsert(["b"], [b])
+    dist = store.query(a, k=1)[0]["distance"]
+    assert VectorStore.similarity(dist) == pytest.approx(float(a @ b), abs=1e-5)
+
+def test_where_filters():
+    meta = {"user": "u1", "ts": 5, "kind": "turn"}
+    assert matches(meta, {"user": "u1"})
+    assert matches(meta, {"$and": [{"ts": {"$gte": 5}}, {"kind": {"$in": ["turn", "summary"]}}]})
+    assert not matches(meta, {"$or": [{"ts": {"$lt": 5}}, {"user": "u2"}]})
+
+def test_query_and_persistence(tmp_path):
+    store = NumpyStore("c", str(tmp_path))
+    store.upsert(["a", "b", "c"], [_vec(0), _vec(1), _vec(2)], documents=["A", "B", "C"])
+    assert store.query(_vec(1), k=1)[0]["id"] == "b"
+    store.save()
+    assert [r["id"] for r in NumpyStore("c", str(tmp_path)).get()] == ["a", "b", "c"]
+
+def test_two_writers_merge_on_save(tmp_path):
+    api = NumpyStore("mem_u1", str(tmp_path))
+    api.upsert(["t0", "t1", "t2"], [_vec(i) for i in range(3)], metadatas=[{"kind": "turn"}] * 3)
+    api.save()
+
+    # The worker compacts while the API keeps buffering new turns
+    worker = NumpyStore("mem_u1", str(tmp_path))
+    api.upsert(["t3"], [_vec(3)], metadatas=[{"kind": "turn"}])
+    worker.upsert(["s0"], [_vec(10)], metadatas=[{"kind": "summary"}])
+    worker.delete(ids=["t0", "t1"])
+    worker.save()
+    api.save()
+
+    merged = NumpyStore("mem_u1", str(tmp_path))
+    assert sorted(r["id"] for r in merged.get()) == ["s0", "t2", "t3"]
+    assert merged.query(_vec(10), k=1)[0]["id"] == "s0"
+    # The API's live view picks up the worker's changes too
+    assert sorted(r["id"] for r in api.get()) == ["s0", "t2", "t3"]
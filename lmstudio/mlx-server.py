@@ -9,13 +9,15 @@ import time
 import uvicorn
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import uuid
+import json
 
 # MLX imports
 try:
-    from mlx_lm import load, generate
+    from mlx_lm import load, generate, stream_generate
     import mlx.core as mx
     MLX_AVAILABLE = True
 except ImportError:
@@ -160,6 +162,10 @@ async def create_chat_completion(request: ChatCompletionRequest):
     if not MLX_AVAILABLE or model is None or tokenizer is None:
         raise HTTPException(status_code=503, detail="MLX model not available")
     
+    if request.stream:
+        return StreamingResponse(stream_chat_completion(request), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    
     try:
         # Format messages using Gemma chat template
         prompt = apply_chat_template(request.messages)
@@ -216,6 +222,46 @@ async def create_chat_completion(request: ChatCompletionRequest):
         print(f"❌ Error generating response: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Generation error: {str(e)}")
 
+def stream_chat_completion(request: ChatCompletionRequest):
+    """Yield OpenAI-style ``chat.completion.chunk`` SSE events as MLX generates tokens"""
+    completion_id = f"chatcmpl-{str(uuid.uuid4())}"
+    created = int(time.time())
+
+    def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+        body = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": request.model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(body)}\n\n"
+
+    prompt = apply_chat_template(request.messages)
+    print(f"🤖 Streaming response using MLX (Apple Metal GPU)...")
+    start_time = time.time()
+    tokens = 0
+
+    yield chunk({"role": "assistant"})
+    try:
+        for response in stream_generate(model, tokenizer, prompt=prompt, max_tokens=request.max_tokens):
+            # Older mlx_lm yields strings, newer versions yield GenerationResponse objects
+            text = getattr(response, "text", response)
+            if not text:
+                continue
+            text = text.replace("<end_of_turn>", "")
+            if text:
+                tokens += 1
+                yield chunk({"content": text})
+        yield chunk({}, finish_reason="stop")
+    except Exception as e:
+        print(f"❌ Error streaming response: {str(e)}")
+        yield f"data: {json.dumps({'error': {'message': str(e)}})}\n\n"
+    yield "data: [DONE]\n\n"
+
+    generation_time = max(time.time() - start_time, 1e-6)
+    print(f"✅ Streamed {tokens} chunks in {generation_time:.2f}s ({tokens/generation_time:.1f} chunks/s)")
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 1234))
     host = os.getenv("HOST", "0.0.0.0")